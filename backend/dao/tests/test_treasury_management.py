@@ -0,0 +1,652 @@
+"""
+Unit tests untuk Treasury Management System (smart contract multi-sig)
+"""
+
+import asyncio
+import fnmatch
+import heapq
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import orjson
+import pytest
+import pytest_asyncio
+import rlp
+from eth_account import Account
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+from dao.treasury_management import (
+    TreasuryManagementSystem,
+    TreasuryBudget,
+    TreasuryTransaction,
+    TransactionType,
+    TransactionStatus,
+    SpendingCategory,
+)
+
+
+TREASURY_ADDRESS = "0x" + "11" * 20
+MULTI_SIG_ADDRESS = "0x" + "22" * 20
+RECIPIENT_ADDRESS = "0x" + "33" * 20
+
+
+class StubProvider(AsyncJSONBaseProvider):
+    """JSON-RPC provider answering from memory; records batches and every raw transaction sent"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+        self.batches = []
+        self.receipts = {}
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+    def _result(self, method, params):
+        if method == "eth_chainId":
+            return hex(1)
+        if method == "eth_gasPrice":
+            return hex(10**9)
+        if method == "eth_getTransactionCount":
+            return hex(0)
+        if method == "eth_sendRawTransaction":
+            self.sent.append(params[0])
+            return "0x" + f"{len(self.sent):064x}"
+        if method == "eth_getTransactionReceipt":
+            return self.receipts.get(params[0])
+        if method == "eth_call":
+            return "0x" + "00" * 32
+        raise ValueError(f"Unexpected RPC method {method}")
+
+    async def make_request(self, method, params):
+        return {"jsonrpc": "2.0", "id": 1, "result": self._result(method, params)}
+
+    async def make_batch_request(self, requests):
+        self.batches.append([method for method, _ in requests])
+        return [
+            {"jsonrpc": "2.0", "id": i, "result": self._result(method, params)}
+            for i, (method, params) in enumerate(requests)
+        ]
+
+    def set_receipt(self, tx_hash: str, status: int) -> None:
+        """Mine a sent transaction with the given status"""
+        tx_hash = tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash
+        self.receipts[tx_hash] = {
+            "status": hex(status),
+            "transactionHash": tx_hash,
+            "blockHash": "0x" + "ab" * 32,
+            "blockNumber": hex(1),
+            "transactionIndex": hex(0),
+            "from": RECIPIENT_ADDRESS,
+            "to": TREASURY_ADDRESS,
+            "cumulativeGasUsed": hex(21000),
+            "gasUsed": hex(21000),
+            "logs": [],
+            "logsBloom": "0x" + "00" * 256,
+            "contractAddress": None,
+            "effectiveGasPrice": hex(10**9),
+            "type": hex(0),
+        }
+
+
+class StubPipeline:
+    """Queues calls on the stub client and runs them on execute()"""
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        calls, self._calls = self._calls, []
+        return [await method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+def _to_bytes(value):
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class StubRedis:
+    """In-memory subset of redis.asyncio.Redis, returning bytes like the real client"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction: bool = True):
+        return StubPipeline(self)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = _to_bytes(value)
+        return True
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        hash_ = self.data.setdefault(key, {})
+        for name, item in items.items():
+            hash_[_to_bytes(name)] = _to_bytes(item)
+        return len(items)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def hdel(self, key, *fields):
+        hash_ = self.data.get(key, {})
+        return sum(hash_.pop(_to_bytes(name), None) is not None for name in fields)
+
+    async def scan_iter(self, match=None):
+        for key in list(self.data):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key.encode()
+
+    async def close(self):
+        pass
+
+
+def make_treasury(redis_client: StubRedis, provider: StubProvider) -> TreasuryManagementSystem:
+    """Treasury wired to the in-memory Redis and provider, with short receipt waits"""
+    treasury = TreasuryManagementSystem("http://127.0.0.1:8545", TREASURY_ADDRESS, MULTI_SIG_ADDRESS)
+    treasury.web3.provider = provider
+    treasury.redis_client = redis_client
+    treasury.configuration.require_ipfs_documentation = False
+    treasury._receipt_timeout = 0.2
+    treasury._receipt_retry_delay = 0.05
+    return treasury
+
+
+@pytest.fixture
+def signers():
+    return [Account.create() for _ in range(3)]
+
+
+@pytest.fixture
+def redis_client():
+    return StubRedis()
+
+
+@pytest.fixture
+def provider():
+    return StubProvider()
+
+
+@pytest_asyncio.fixture
+async def treasury(redis_client, provider, signers):
+    treasury = make_treasury(redis_client, provider)
+    assert await treasury.initialize_treasury([signer.address for signer in signers])
+    yield treasury
+    await treasury.shutdown()
+
+
+async def propose(treasury, signer, amount=Decimal("50")) -> str:
+    """Propose a transaction that needs two approvals"""
+    proposal = await treasury.propose_transaction(
+        TransactionType.OPERATIONAL, amount, RECIPIENT_ADDRESS, SpendingCategory.TECHNOLOGY,
+        "Server hosting", signer.address, signer.key.hex(), required_approvals=2
+    )
+    assert proposal["success"], proposal
+    return proposal["transaction_id"]
+
+
+async def propose_and_approve(treasury, signers, amount=Decimal("50")) -> str:
+    """Propose a transaction and approve it with two signers concurrently"""
+    transaction_id = await propose(treasury, signers[0], amount)
+
+    results = await asyncio.gather(*(
+        treasury.approve_transaction(transaction_id, signer.address, "approved", "ok", signer.key.hex())
+        for signer in signers[:2]
+    ))
+    assert all(result["success"] for result in results), results
+    return transaction_id
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+class TestIpfsBatching:
+    """Batched IPFS documentation uploads"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_uploads_share_one_batch(self, treasury):
+        """Test documents queued within the batch window go out in one add call"""
+        batches = []
+
+        async def add_ipfs_batch(documents):
+            batches.append(documents)
+            return [f"Qm{i}" for i in range(len(documents))]
+
+        treasury._add_ipfs_batch = add_ipfs_batch
+        hashes = await asyncio.gather(*(treasury._upload_to_ipfs({"n": n}) for n in range(3)))
+
+        assert hashes == ["Qm0", "Qm1", "Qm2"]
+        assert batches == [[{"n": 0}, {"n": 1}, {"n": 2}]]
+
+    @pytest.mark.asyncio
+    async def test_cancel_as_a_document_arrives_stops_the_loop(self, treasury):
+        """Test cancelling the loop while it collects a batch is not lost when a document lands"""
+        loop_task = asyncio.create_task(treasury._ipfs_upload_loop())
+        future = asyncio.get_running_loop().create_future()
+        treasury._ipfs_queue.put_nowait(({"n": 0}, future))
+        await asyncio.sleep(0.01)
+
+        treasury._ipfs_queue.put_nowait(({"n": 1}, future))
+        loop_task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(loop_task, 1)
+
+
+class TestApprovals:
+    """Approval batching and on-chain confirmations"""
+
+    @pytest.mark.asyncio
+    async def test_batched_approvals_tally_per_transaction(self, treasury, signers):
+        """Test approvals queued in one batch window are tallied onto their own transactions"""
+        first = await propose(treasury, signers[0], Decimal("50"))
+        second = await propose(treasury, signers[0], Decimal("60"))
+
+        results = await asyncio.gather(
+            treasury.approve_transaction(first, signers[0].address, "approved", "ok", signers[0].key.hex()),
+            treasury.approve_transaction(first, signers[1].address, "rejected", "no", signers[1].key.hex()),
+            treasury.approve_transaction(second, signers[2].address, "approved", "ok", signers[2].key.hex()),
+        )
+
+        assert all(result["success"] for result in results), results
+        assert (treasury.transactions[first].current_approvals,
+                treasury.transactions[first].current_rejections) == (1, 1)
+        assert (treasury.transactions[second].current_approvals,
+                treasury.transactions[second].current_rejections) == (1, 0)
+        assert treasury._approval_totals == {"approved": 2, "rejected": 1, "total": 3}
+
+    @pytest.mark.asyncio
+    async def test_required_approvals_mark_transaction_approved(self, treasury, signers):
+        """Test the batched tally moves a transaction to APPROVED once enough signers agree"""
+        transaction_id = await propose_and_approve(treasury, signers)
+
+        transaction = treasury.transactions[transaction_id]
+        assert transaction.current_approvals == 2
+        assert transaction.status == TransactionStatus.APPROVED
+        assert transaction_id in treasury.approved_transactions
+        assert transaction_id not in treasury.pending_transactions
+
+    @pytest.mark.asyncio
+    async def test_each_approver_confirms_from_own_account(self, treasury, provider, signers):
+        """Test every approval is confirmed on-chain by a transaction signed by its approver"""
+        transaction_id = await propose_and_approve(treasury, signers)
+
+        # First raw transaction is the proposal, then one confirmTransaction per approver
+        senders = {Account.recover_transaction(raw) for raw in provider.sent[1:]}
+        assert senders == {signer.address for signer in signers[:2]}
+        assert all(approval.transaction_hash for approval in treasury.approvals[transaction_id])
+
+    @pytest.mark.asyncio
+    async def test_proposal_is_stamped_with_the_current_time(self, treasury, signers):
+        """Test proposals read the clock when they are made rather than a periodically refreshed copy"""
+        await asyncio.sleep(0.05)
+        before = datetime.now()
+
+        transaction_id = await propose(treasury, signers[0])
+
+        transaction = treasury.transactions[transaction_id]
+        assert before <= transaction.requested_at <= datetime.now()
+        deadline = transaction.requested_at + timedelta(hours=treasury.configuration.transaction_timeout_hours)
+        assert transaction.execution_deadline == deadline
+
+
+class TestChainReads:
+    """Cached and batched chain reads"""
+
+    @pytest.mark.asyncio
+    async def test_gas_price_is_cached_and_coalesced(self, treasury, provider):
+        """Test concurrent gas price reads share one batch and later reads hit the cache"""
+        treasury._chain_cache.clear()
+        provider.batches.clear()
+
+        prices = await asyncio.gather(*(treasury._get_gas_price() for _ in range(5)))
+        assert prices == [10**9] * 5
+        assert await treasury._get_gas_price() == 10**9
+
+        assert len(provider.batches) == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_cache_entry_is_refetched(self, treasury, provider):
+        """Test a read older than its TTL goes back to the node"""
+        treasury._chain_cache.clear()
+        provider.batches.clear()
+
+        await treasury._get_blockchain_balance()
+        cached_at, value = treasury._chain_cache["chain_state"]
+        treasury._chain_cache["chain_state"] = (cached_at - treasury._balance_ttl, value)
+        await treasury._get_blockchain_balance()
+
+        assert len(provider.batches) == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_read_reaches_every_waiter(self, treasury):
+        """Test a failing fetch raises in the leader and in coalesced followers, then is retried"""
+        calls = []
+
+        async def failing_fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ConnectionError("node down")
+
+        results = await asyncio.gather(
+            *(treasury._cached_chain_read("flaky", 10.0, failing_fetch) for _ in range(3)),
+            return_exceptions=True
+        )
+
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert len(calls) == 1
+        assert "flaky" not in treasury._chain_inflight
+        with pytest.raises(ConnectionError):
+            await treasury._cached_chain_read("flaky", 10.0, failing_fetch)
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_hands_the_read_to_a_follower(self, treasury):
+        """Test followers of a leader cancelled mid-fetch refetch instead of waiting forever"""
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.Event().wait()
+            return 7
+
+        leader = asyncio.create_task(treasury._cached_chain_read("slow", 10.0, fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(treasury._cached_chain_read("slow", 10.0, fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await asyncio.wait_for(asyncio.gather(*followers), 1) == [7, 7]
+        assert leader.cancelled()
+        assert len(calls) == 2
+        assert "slow" not in treasury._chain_inflight
+
+
+class TestExpiry:
+    """Deadline heap expiry"""
+
+    @pytest.mark.asyncio
+    async def test_passed_deadline_expires_only_that_transaction(self, treasury, signers):
+        """Test the expiry loop wakes for the earliest deadline and leaves later ones pending"""
+        expiring = await propose(treasury, signers[0], Decimal("50"))
+        waiting = await propose(treasury, signers[0], Decimal("60"))
+
+        # Move the first deadline into the past and wake the loop, as a new proposal would
+        treasury._deadline_heap.remove(
+            next(entry for entry in treasury._deadline_heap if entry[1] == expiring)
+        )
+        heapq.heappush(treasury._deadline_heap, (datetime.now() - timedelta(seconds=1), expiring))
+        treasury._deadline_event.set()
+
+        await wait_for(lambda: treasury.transactions[expiring].status == TransactionStatus.EXPIRED)
+        assert expiring not in treasury.pending_transactions
+        assert treasury.transactions[waiting].status == TransactionStatus.PENDING
+        assert [entry[1] for entry in treasury._deadline_heap] == [waiting]
+
+    @pytest.mark.asyncio
+    async def test_stale_heap_entry_is_skipped(self, treasury, signers):
+        """Test a heap entry for an already approved transaction does not expire it"""
+        transaction_id = await propose_and_approve(treasury, signers)
+        heapq.heappush(treasury._deadline_heap, (datetime.now() - timedelta(seconds=1), transaction_id))
+
+        await treasury._check_expired_transactions()
+
+        assert treasury.transactions[transaction_id].status == TransactionStatus.APPROVED
+
+    @pytest.mark.asyncio
+    async def test_shutdown_right_after_a_wakeup_stops_the_loop(self, redis_client, provider, signers):
+        """Test a cancel landing just after a new deadline wakes the expiry loop still stops it"""
+        treasury = make_treasury(redis_client, provider)
+        assert await treasury.initialize_treasury([signer.address for signer in signers])
+        await propose(treasury, signers[0], Decimal("50"))
+        await asyncio.sleep(0.01)
+        # The loop now waits with a timeout for the first deadline; this proposal wakes it again
+        await propose(treasury, signers[0], Decimal("60"))
+
+        await asyncio.wait_for(treasury.shutdown(), 2)
+
+
+class TestExecution:
+    """Execution through the send queue and its write-ahead log"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_execute_runs_once(self, treasury, signers):
+        """Test only one of two racing execute calls charges the transaction"""
+        transaction_id = await propose_and_approve(treasury, signers)
+
+        results = await asyncio.gather(*(
+            treasury.execute_transaction(transaction_id, signer.address, signer.key.hex())
+            for signer in signers[:2]
+        ))
+
+        assert sorted(result["success"] for result in results) == [False, True]
+        assert treasury._executed_count == 1
+        assert treasury.transactions[transaction_id].status == TransactionStatus.EXECUTED
+
+    @pytest.mark.asyncio
+    async def test_status_reads_run_alongside_each_other(self, treasury):
+        """Test two readers hold the read side together while a writer waits for both"""
+        lock = treasury._metrics_rwlock
+        order = []
+
+        async def reader(name):
+            async with lock.read():
+                order.append(f"{name} in")
+                await asyncio.sleep(0.02)
+                order.append(f"{name} out")
+
+        async def writer():
+            await asyncio.sleep(0.005)
+            async with lock.write():
+                order.append("writer")
+
+        await asyncio.gather(reader("a"), reader("b"), writer())
+
+        assert order[:2] == ["a in", "b in"]
+        assert order[-1] == "writer"
+
+    @pytest.mark.asyncio
+    async def test_confirmed_receipt_clears_wal(self, treasury, provider, redis_client, signers):
+        """Test a mined receipt settles the send and drops its WAL record"""
+        transaction_id = await propose_and_approve(treasury, signers)
+        sends_before = len(provider.sent)
+
+        result = await treasury.execute_transaction(transaction_id, signers[0].address, signers[0].key.hex())
+        assert result["success"]
+        assert result["status"] == "queued"
+        await wait_for(lambda: treasury.transactions[transaction_id].transaction_hash
+                       and len(provider.sent) > sends_before)
+        provider.set_receipt(treasury.transactions[transaction_id].transaction_hash, 1)
+
+        await wait_for(lambda: not redis_client.data.get(treasury._send_wal_key))
+        assert treasury.transactions[transaction_id].status == TransactionStatus.EXECUTED
+        assert not treasury._pending_sends
+
+    @pytest.mark.asyncio
+    async def test_receipt_timeout_survives_shutdown_and_recovers(self, redis_client, provider, signers):
+        """Test an unmined send stays executed across a restart and a reverted receipt refunds it"""
+        treasury = make_treasury(redis_client, provider)
+        assert await treasury.initialize_treasury([signer.address for signer in signers])
+        now = datetime.now()
+        await treasury.create_budget(
+            SpendingCategory.TECHNOLOGY, now - timedelta(days=1), now + timedelta(days=30), Decimal("1000")
+        )
+        transaction_id = await propose_and_approve(treasury, signers)
+        await treasury.execute_transaction(transaction_id, signers[0].address, signers[0].key.hex())
+
+        # No receipt arrives: the send waits past its timeout without reverting anything
+        await wait_for(lambda: treasury.transactions[transaction_id].transaction_hash)
+        await asyncio.sleep(treasury._receipt_timeout * 2)
+        transaction = treasury.transactions[transaction_id]
+        assert transaction.status == TransactionStatus.EXECUTED
+        budget = next(iter(treasury.budgets.values()))
+        assert budget.spent_amount == Decimal("50")
+
+        tx_hash = transaction.transaction_hash
+        await treasury.shutdown()
+        wal_entry = orjson.loads(redis_client.data[treasury._send_wal_key][transaction_id.encode()])
+        assert wal_entry == {"budget_id": budget.budget_id, "tx_hash": tx_hash}
+
+        # The transaction reverted on chain while the process was down
+        provider.set_receipt(tx_hash, 0)
+        restarted = make_treasury(redis_client, provider)
+        assert await restarted.initialize_treasury([signer.address for signer in signers])
+        try:
+            await wait_for(lambda: not redis_client.data[restarted._send_wal_key])
+            recovered = restarted.transactions[transaction_id]
+            assert recovered.status == TransactionStatus.APPROVED
+            assert recovered.amount_wei == 50 * 10**18
+            assert restarted.budgets[budget.budget_id].spent_amount == Decimal("0")
+            assert restarted._executed_count == 0
+        finally:
+            await restarted.shutdown()
+
+
+class TestBudgetAlerts:
+    """Budget monitoring"""
+
+    @pytest.mark.asyncio
+    async def test_alert_uses_absolute_warning_threshold(self, treasury, caplog):
+        """Test the warning fires once spending reaches the warning amount"""
+        now = datetime.now()
+        await treasury.create_budget(
+            SpendingCategory.MARKETING, now - timedelta(days=1), now + timedelta(days=30),
+            Decimal("1000"), warning_threshold=Decimal("500")
+        )
+        budget = next(iter(treasury.budgets.values()))
+
+        budget.spent_amount = Decimal("400")
+        with caplog.at_level(logging.WARNING, logger="dao.treasury_management"):
+            await treasury._check_budget_alerts()
+        assert "Budget alert" not in caplog.text
+
+        budget.spent_amount = Decimal("600")
+        with caplog.at_level(logging.WARNING, logger="dao.treasury_management"):
+            await treasury._check_budget_alerts()
+        assert "Budget alert: marketing utilization at 60.0%" in caplog.text
+
+    def test_default_thresholds_are_amounts(self):
+        """Test a budget built without thresholds derives them as amounts of its allocation"""
+        now = datetime.now()
+        budget = TreasuryBudget(
+            "budget-1", SpendingCategory.MARKETING, now, now + timedelta(days=30), Decimal("1000")
+        )
+
+        assert budget.approval_threshold == Decimal("100")
+        assert budget.warning_threshold == Decimal("800")
+
+
+class TestPersistence:
+    """Redis state round trips"""
+
+    @pytest.mark.asyncio
+    async def test_save_state_round_trips_wei_amounts(self, redis_client, provider):
+        """Test wei amounts above the 64-bit range survive _save_state and reload"""
+        treasury = make_treasury(redis_client, provider)
+        now = datetime.now()
+        amount = Decimal("1234567.891")
+        treasury.transactions["tx-big"] = TreasuryTransaction(
+            transaction_id="tx-big",
+            transaction_type=TransactionType.INVESTMENT,
+            amount=amount,
+            recipient_address=RECIPIENT_ADDRESS,
+            category=SpendingCategory.RESEARCH,
+            description="Research grant",
+            requested_by=RECIPIENT_ADDRESS,
+            requested_at=now,
+            execution_deadline=now + timedelta(days=1),
+            amount_wei=int(amount * 10**18),
+        )
+        await treasury._save_state()
+
+        restored = make_treasury(redis_client, provider)
+        await restored._load_existing_transactions()
+        transaction = restored.transactions["tx-big"]
+        assert transaction.amount_wei == 1234567891 * 10**15
+        assert transaction.amount == amount
+        assert "tx-big" in restored.pending_transactions
+        treasury._signing_executor.shutdown()
+        restored._signing_executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_reload_restores_open_state_and_counters(self, treasury, redis_client, provider, signers):
+        """Test one pipelined load restores approvals, budgets and the executed aggregates"""
+        now = datetime.now()
+        await treasury.create_budget(
+            SpendingCategory.TECHNOLOGY, now - timedelta(days=1), now + timedelta(days=30), Decimal("1000")
+        )
+        executed = await propose_and_approve(treasury, signers, Decimal("50"))
+        approved = await propose_and_approve(treasury, signers, Decimal("70"))
+        sends_before = len(provider.sent)
+        await treasury.execute_transaction(executed, signers[0].address, signers[0].key.hex())
+        await wait_for(lambda: len(provider.sent) > sends_before)
+        provider.set_receipt(treasury.transactions[executed].transaction_hash, 1)
+        await wait_for(lambda: not redis_client.data.get(treasury._send_wal_key))
+        await treasury._save_state()
+
+        restored = make_treasury(redis_client, provider)
+        await restored._load_existing_transactions()
+        await restored._load_existing_budgets()
+
+        assert set(restored.transactions) == {approved}
+        assert restored.approved_transactions == {approved}
+        assert len(restored.approvals[approved]) == 2
+        assert restored._executed_count == 1
+        assert restored._amount_sum == Decimal("50")
+        assert restored._approval_totals == {"approved": 4, "rejected": 0, "total": 4}
+        budget = next(iter(restored.budgets.values()))
+        assert budget.spent_amount == Decimal("50")
+        assert restored._get_active_budget(SpendingCategory.TECHNOLOGY) is budget
+        await restored._update_treasury_metrics()
+        assert restored.metrics.total_transactions == 2
+        assert restored.metrics.executed_transactions == 1
+        restored._signing_executor.shutdown()
+
+
+class TestNoncePipeline:
+    """Locally pipelined nonces"""
+
+    @pytest.mark.asyncio
+    async def test_sends_from_one_signer_use_consecutive_nonces(self, treasury, provider, signers):
+        """Test the node is asked for a nonce once and later sends count up locally"""
+        await propose(treasury, signers[0], Decimal("50"))
+        await propose(treasury, signers[0], Decimal("60"))
+        await propose(treasury, signers[0], Decimal("70"))
+
+        nonces = [rlp.decode(bytes.fromhex(raw.removeprefix("0x")))[0] for raw in provider.sent]
+        assert [int.from_bytes(nonce, "big") for nonce in nonces] == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_failed_send_drops_the_local_nonce(self, treasury, signers):
+        """Test a failed broadcast makes the next send refetch its nonce"""
+        address = signers[0].address
+        first = await treasury._get_nonce(address)
+        treasury._invalidate_nonce(address)
+
+        assert address not in treasury._nonces
+        assert await treasury._get_nonce(address) == first
@@ -0,0 +1,787 @@
+"""
+Unit tests untuk Smart Contract Voting Engine
+"""
+
+import asyncio
+import fnmatch
+import heapq
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, Mock
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from eth_abi import decode, encode
+from eth_account import Account
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+
+from dao import voting_mechanism
+from dao.voting_mechanism import (
+    BatchingHTTPProvider,
+    SmartContractVotingEngine,
+    VotingSession,
+    VoteDelegation,
+    VoteOption,
+    VoteRecord,
+    VotingMechanism,
+    VoteWeightStrategy,
+    MULTICALL3_ADDRESS,
+    NUMBA_TALLY_MIN_VOTES,
+    WEI_PER_TOKEN,
+    _sign_worker,
+    _tally_columns,
+)
+
+
+GOVERNANCE_ADDRESS = "0x" + "11" * 20
+VOTING_ADDRESS = "0x" + "22" * 20
+TOKEN_ADDRESS = "0x" + "33" * 20
+
+BALANCE_OF = bytes(Web3.keccak(text="balanceOf(address)")[:4])
+GET_STAKED_BALANCE = bytes(Web3.keccak(text="getStakedBalance(address)")[:4])
+
+
+class StubChain(JSONBaseProvider):
+    """Synchronous JSON-RPC provider answering token reads and Multicall3 from memory"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self.block_number = 100
+        self.block_time = 12
+        self.genesis_time = int(time.time()) - self.block_number * self.block_time
+        self.gas_price = 10**9
+        self.values = {}  # (selector, checksum address) -> uint256
+
+    def set_value(self, selector: bytes, address: str, value: int) -> None:
+        self.values[(selector, Web3.to_checksum_address(address))] = value
+
+    def _getter(self, call_data: bytes):
+        return self.values.get((call_data[:4], Web3.to_checksum_address(call_data[16:36])))
+
+    def _result(self, method, params):
+        if method == "eth_chainId":
+            return hex(1)
+        if method == "eth_blockNumber":
+            return hex(self.block_number)
+        if method == "eth_getBlockByNumber":
+            number = self.block_number if params[0] == "latest" else int(params[0], 16)
+            return {
+                "number": hex(number),
+                "hash": "0x" + number.to_bytes(32, "big").hex(),
+                "timestamp": hex(self.genesis_time + number * self.block_time),
+            }
+        if method == "eth_gasPrice":
+            return hex(self.gas_price)
+        if method == "eth_getLogs":
+            return []
+        if method == "eth_call":
+            call_data = bytes.fromhex(params[0]["data"][2:])
+            if params[0]["to"].lower() == MULTICALL3_ADDRESS.lower():
+                _, calls = decode(["bool", "(address,bytes)[]"], call_data[4:])
+                results = []
+                for _, inner in calls:
+                    value = self._getter(inner)
+                    results.append((False, b"") if value is None else (True, value.to_bytes(32, "big")))
+                return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+            return "0x" + (self._getter(call_data) or 0).to_bytes(32, "big").hex()
+        raise ValueError(f"Unexpected RPC method {method}")
+
+    def make_request(self, method, params):
+        self.requests.append((method, params))
+        return {"jsonrpc": "2.0", "id": 1, "result": self._result(method, params)}
+
+
+class StubPipeline:
+    """Queues calls on the stub client and runs them on execute()"""
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        calls, self._calls = self._calls, []
+        return [await method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+def _to_bytes(value):
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+def _key(key):
+    return key.decode() if isinstance(key, bytes) else key
+
+
+class StubRedis:
+    """In-memory subset of redis.asyncio.Redis, returning bytes like the real client"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction: bool = True):
+        return StubPipeline(self)
+
+    async def get(self, key):
+        return self.data.get(_key(key))
+
+    async def set(self, key, value, ex=None):
+        self.data[_key(key)] = _to_bytes(value)
+        return True
+
+    async def exists(self, *keys):
+        return sum(_key(key) in self.data for key in keys)
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(_key(key), None) is not None for key in keys)
+
+    async def rpush(self, key, *values):
+        items = self.data.setdefault(_key(key), [])
+        items.extend(_to_bytes(value) for value in values)
+        return len(items)
+
+    async def lrange(self, key, start, end):
+        items = self.data.get(_key(key), [])
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        hash_ = self.data.setdefault(_key(key), {})
+        for name, item in items.items():
+            hash_[_to_bytes(name)] = _to_bytes(item)
+        return len(items)
+
+    async def hmget(self, key, fields):
+        hash_ = self.data.get(_key(key), {})
+        return [hash_.get(_to_bytes(name)) for name in fields]
+
+    async def scan_iter(self, match=None):
+        for key in list(self.data):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key.encode()
+
+    async def close(self):
+        pass
+
+
+def make_engine(redis_client: StubRedis, chain: StubChain) -> SmartContractVotingEngine:
+    """Voting engine wired to the in-memory Redis and chain, with broadcasts stubbed out"""
+    engine = SmartContractVotingEngine(
+        "http://127.0.0.1:8545", GOVERNANCE_ADDRESS, VOTING_ADDRESS, TOKEN_ADDRESS, token_deploy_block=10
+    )
+    engine.web3.provider = chain
+    engine.redis_client = redis_client
+    engine._broadcast_vote_to_blockchain = AsyncMock(return_value="ab" * 32)
+    return engine
+
+
+@pytest.fixture
+def redis_client():
+    return StubRedis()
+
+
+@pytest.fixture
+def chain():
+    return StubChain()
+
+
+@pytest_asyncio.fixture
+async def engine(redis_client, chain):
+    engine = make_engine(redis_client, chain)
+    yield engine
+    await engine.shutdown()
+
+
+def make_session(
+    mechanism: VotingMechanism = VotingMechanism.SIMPLE_MAJORITY, session_id: str = "session-1", **kwargs
+) -> VotingSession:
+    now = datetime.now()
+    return VotingSession(
+        proposal_id="prop-1",
+        session_id=session_id,
+        start_time=kwargs.pop("start_time", now - timedelta(minutes=1)),
+        end_time=kwargs.pop("end_time", now + timedelta(days=1)),
+        vote_options=[VoteOption("yes", "Yes", ""), VoteOption("no", "No", "")],
+        voting_mechanism=mechanism,
+        vote_weight_strategy=VoteWeightStrategy.TOKEN_BALANCE,
+        **kwargs
+    )
+
+
+def add_votes(engine, session, powers_by_option):
+    """Record votes directly, bypassing balance lookups"""
+    votes = []
+    for i, (option_id, power) in enumerate(powers_by_option):
+        vote = VoteRecord(f"0x{i:040x}", session.proposal_id, session.session_id, option_id, power)
+        engine.vote_records.setdefault(session.session_id, []).append(vote)
+        engine._append_vote_column(session, vote)
+        votes.append(vote)
+    return votes
+
+
+def delegate(engine, delegator: str, delegate_to: str, percentage: float = 1.0) -> VoteDelegation:
+    """Register an active delegation without going on chain"""
+    now = datetime.now()
+    delegation = VoteDelegation(
+        delegator, delegate_to, ["general"], percentage, now, now + timedelta(days=1)
+    )
+    engine.delegations.setdefault(delegator, []).append(delegation)
+    engine.delegations_by_delegate.setdefault(delegate_to.lower(), []).append(delegation)
+    engine._delegation_version += 1
+    return delegation
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+class RecordingRPCHandler(BaseHTTPRequestHandler):
+    """Answers eth_echo with its first parameter and records every payload and client port"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.payloads.append(payload)
+        self.server.client_ports.add(self.client_address[1])
+        if isinstance(payload, list) and self.server.reject_batches:
+            self.send_response(400)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        requests = payload if isinstance(payload, list) else [payload]
+        responses = [{"jsonrpc": "2.0", "id": request["id"], "result": request["params"][0]} for request in requests]
+        body = json.dumps(responses if isinstance(payload, list) else responses[0]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def rpc_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingRPCHandler)
+    server.payloads = []
+    server.client_ports = set()
+    server.reject_batches = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def concurrent_requests(provider, values):
+    """Issue eth_echo requests from worker threads at once and return their results"""
+    barrier = threading.Barrier(len(values))
+
+    def request(value):
+        barrier.wait()
+        return provider.make_request("eth_echo", [value])["result"]
+
+    with ThreadPoolExecutor(max_workers=len(values)) as pool:
+        return list(pool.map(request, values))
+
+
+class TestTallies:
+    """Vote tallies"""
+
+    @pytest.mark.asyncio
+    async def test_super_majority_uses_simple_tally(self, engine):
+        """Test super majority sessions tally like simple majority"""
+        session = make_session(VotingMechanism.SUPER_MAJORITY)
+        add_votes(engine, session, [("yes", 7 * WEI_PER_TOKEN), ("no", 3 * WEI_PER_TOKEN)])
+
+        result = await engine._calculate_voting_results(session, engine.vote_records[session.session_id])
+
+        assert result.option_voting_power("yes") == 7.0
+        assert result.winning_option == "yes"
+
+    def test_unimplemented_mechanisms_are_rejected(self, engine):
+        """Test mechanisms without a tally strategy fail instead of tallying silently"""
+        session = make_session(VotingMechanism.CONVICTION_VOTING)
+
+        with pytest.raises(Exception, match="Unknown voting mechanism"):
+            engine._make_tally_fn(session)
+
+    @pytest.mark.asyncio
+    async def test_vote_columns_grow_and_skip_unknown_options(self, engine):
+        """Test the columnar store grows past its capacity and leaves unknown options out of the tally"""
+        session = make_session()
+        add_votes(engine, session, [("yes", WEI_PER_TOKEN)] * 100 + [("maybe", 10**30)])
+
+        result = await engine._calculate_voting_results(session, engine.vote_records[session.session_id])
+
+        assert result.option_table["votes"].tolist() == [100, 0]
+        assert result.option_table["power"][0] == 100 * WEI_PER_TOKEN
+
+    def test_numba_and_bincount_tallies_agree(self):
+        """Test the JIT kernel and the bincount path give the same quadratic tally"""
+        rng = np.random.default_rng(7)
+        n_votes = NUMBA_TALLY_MIN_VOTES + 500
+        options = rng.integers(0, 3, n_votes).astype(np.int32)
+        powers = np.array([int(p) * 10**15 for p in rng.integers(1, 10**6, n_votes)], dtype=object)
+
+        counts, totals, qtotals = _tally_columns(options, powers, 3, quadratic=True)
+        small_counts, small_totals, _ = _tally_columns(options[:999], powers[:999], 3, quadratic=True)
+
+        for option in range(3):
+            mask = options == option
+            assert counts[option] == mask.sum()
+            assert totals[option] == sum(powers[mask])
+            assert small_totals[option] == sum(powers[:999][options[:999] == option])
+        assert qtotals == pytest.approx(np.bincount(
+            options, weights=np.sqrt(powers.astype(np.float64) / WEI_PER_TOKEN), minlength=3
+        ))
+        assert small_counts.sum() == 999
+
+    @pytest.mark.asyncio
+    async def test_simple_majority_totals_are_exact_wei(self, engine):
+        """Test option totals keep every wei and convert to tokens only when reported"""
+        session = make_session()
+        add_votes(engine, session, [("yes", 10**27), ("yes", 1), ("no", 3 * 10**26)])
+
+        result = await engine._calculate_voting_results(session, engine.vote_records[session.session_id])
+
+        assert result.option_table["power"][0] == 10**27 + 1
+        assert result.winning_option == "yes"
+        assert result.total_voting_power == (13 * 10**26 + 1) / WEI_PER_TOKEN
+        options = result.option_results()
+        assert options["yes"]["votes"] == 2
+        assert options["yes"]["voting_power"] == 10**9
+        assert options["no"]["percentage"] == pytest.approx(3 / 13)
+
+
+class TestChainReads:
+    """Batched chain reads"""
+
+    def test_batch_balances_reads_every_address_in_one_multicall(self, engine, chain):
+        """Test one tryAggregate call at the given block returns balances and skips failed sub-calls"""
+        holders = [Account.create().address for _ in range(3)]
+        chain.set_value(BALANCE_OF, holders[0], 5 * WEI_PER_TOKEN)
+        chain.set_value(BALANCE_OF, holders[1], 0)
+
+        balances = engine._batch_balances(holders, "balanceOf", block_identifier=42)
+
+        assert balances == {holders[0]: 5 * WEI_PER_TOKEN, holders[1]: 0}
+        calls = [params for method, params in chain.requests if method == "eth_call"]
+        assert len(calls) == 1
+        assert calls[0][0]["to"].lower() == MULTICALL3_ADDRESS.lower()
+        assert calls[0][1] == hex(42)
+
+    @pytest.mark.asyncio
+    async def test_voting_power_prefetches_both_balances_by_multicall(self, engine, chain):
+        """Test a power calculation reads balances through two multicalls, not per-address calls"""
+        voter = Account.create().address
+        chain.set_value(BALANCE_OF, voter, 7 * WEI_PER_TOKEN)
+        chain.set_value(GET_STAKED_BALANCE, voter, 2 * WEI_PER_TOKEN)
+
+        power = await engine._calculate_voting_power(voter, VoteWeightStrategy.STAKED_TOKENS, "session-1")
+
+        assert power == 3 * WEI_PER_TOKEN
+        targets = [params[0]["to"].lower() for method, params in chain.requests if method == "eth_call"]
+        assert targets == [MULTICALL3_ADDRESS.lower()] * 2
+
+    @pytest.mark.asyncio
+    async def test_gas_price_is_read_once_per_ttl(self, engine, chain):
+        """Test broadcasts within the TTL share one gas price read"""
+        prices = [await engine._cached_gas_price() for _ in range(3)]
+        fetched_at, price = engine._gas_price_cache
+        engine._gas_price_cache = (fetched_at - engine._gas_price_ttl, price)
+        chain.gas_price = 2 * 10**9
+        refreshed = await engine._cached_gas_price()
+
+        assert prices == [10**9] * 3
+        assert refreshed == 2 * 10**9
+        assert [method for method, _ in chain.requests].count("eth_gasPrice") == 2
+
+
+class TestBatchingProvider:
+    """JSON-RPC batch window provider"""
+
+    def test_concurrent_requests_share_one_batch(self, rpc_server):
+        """Test calls made within one wait window leave as a single JSON-RPC batch"""
+        provider = BatchingHTTPProvider(f"http://127.0.0.1:{rpc_server.server_port}", wait_ms=100)
+        try:
+            assert concurrent_requests(provider, ["a", "b", "c", "d"]) == ["a", "b", "c", "d"]
+        finally:
+            provider.close()
+
+        assert len(rpc_server.payloads) == 1
+        assert sorted(request["params"][0] for request in rpc_server.payloads[0]) == ["a", "b", "c", "d"]
+
+    def test_rejected_batch_falls_back_to_single_requests(self, rpc_server):
+        """Test an endpoint answering batches with 400 still gets every call, then only single ones"""
+        rpc_server.reject_batches = True
+        provider = BatchingHTTPProvider(f"http://127.0.0.1:{rpc_server.server_port}", wait_ms=100)
+        try:
+            assert concurrent_requests(provider, ["a", "b"]) == ["a", "b"]
+            assert concurrent_requests(provider, ["c", "d"]) == ["c", "d"]
+        finally:
+            provider.close()
+
+        assert sum(isinstance(payload, list) for payload in rpc_server.payloads) == 1
+        assert len(rpc_server.payloads) == 5
+
+    def test_requests_reuse_one_keep_alive_connection(self, rpc_server):
+        """Test sequential calls go over the pooled connection instead of reconnecting"""
+        provider = BatchingHTTPProvider(f"http://127.0.0.1:{rpc_server.server_port}", wait_ms=0)
+        try:
+            for value in ("a", "b", "c"):
+                assert provider.make_request("eth_echo", [value])["result"] == value
+        finally:
+            provider.close()
+
+        assert len(rpc_server.client_ports) == 1
+
+
+class TestSigning:
+    """Transaction signing and submission"""
+
+    def test_sign_worker_returns_raw_transaction(self):
+        """Test the worker returns raw bytes recoverable to the signer"""
+        account = Account.create()
+        tx = {"to": TOKEN_ADDRESS, "value": 0, "gas": 21000, "gasPrice": 10**9, "nonce": 0, "chainId": 1}
+
+        raw = _sign_worker(tx, account.key.hex())
+
+        assert Account.recover_transaction(raw) == account.address
+
+    @pytest.mark.asyncio
+    async def test_send_tx_submits_the_pool_signed_transaction(self, engine, chain):
+        """Test _send_tx builds with the fetched nonce and gas price and sends the signed bytes"""
+        account = Account.create()
+        sent = []
+        engine._fetch_nonce_and_gas = AsyncMock(return_value=(7, 3 * 10**9))
+        engine._sign_tx = AsyncMock(side_effect=lambda tx, key: _sign_worker(tx, key))
+        engine.web3.eth.send_raw_transaction = lambda raw: sent.append(raw) or bytes.fromhex("cd" * 32)
+        call = Mock()
+        call.build_transaction = lambda params: dict(
+            params, to=VOTING_ADDRESS, value=0, data="0x", chainId=1
+        )
+
+        tx_hash = await engine._send_tx(call, 100000, account.key.hex())
+
+        assert tx_hash == "cd" * 32
+        tx = engine._sign_tx.call_args.args[0]
+        assert (tx["nonce"], tx["gasPrice"], tx["gas"]) == (7, 3 * 10**9, 100000)
+        assert Account.recover_transaction(sent[0]) == account.address
+
+
+class TestCastVote:
+    """Vote casting"""
+
+    @pytest.mark.asyncio
+    async def test_second_vote_is_rejected_by_the_voter_index(self, engine, chain):
+        """Test a voter who already voted is turned away without another balance read"""
+        session = make_session()
+        engine.active_sessions[session.session_id] = session
+        voter = Account.create()
+        chain.set_value(BALANCE_OF, voter.address, WEI_PER_TOKEN)
+
+        first = await engine.cast_vote(voter.address, session.session_id, "yes", voter.key.hex())
+        requests_after_first = len(chain.requests)
+        second = await engine.cast_vote(voter.address.lower(), session.session_id, "no", voter.key.hex())
+
+        assert first["success"]
+        assert second == {"success": False, "error": "Already voted"}
+        assert len(chain.requests) == requests_after_first
+
+    @pytest.mark.asyncio
+    async def test_changed_vote_replaces_the_earlier_one(self, engine, chain):
+        """Test only the latest vote of a voter counts when vote changes are allowed"""
+        session = make_session(allow_vote_change=True)
+        engine.active_sessions[session.session_id] = session
+        voter = Account.create()
+        chain.set_value(BALANCE_OF, voter.address, WEI_PER_TOKEN)
+
+        for option in ("yes", "no"):
+            assert (await engine.cast_vote(voter.address, session.session_id, option, voter.key.hex()))["success"]
+        results = await engine.get_voting_results(session.session_id)
+
+        assert results["results"]["total_votes"] == 1
+        assert results["results"]["winning_option"] == "no"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_votes_use_their_own_balance_snapshot(self, engine):
+        """Test interleaved cast_vote calls don't read or clear each other's prefetched balances"""
+        session = make_session()
+        engine.active_sessions[session.session_id] = session
+        voters = [Account.create() for _ in range(5)]
+        balances = {voter.address: (i + 1) * 10**21 + i for i, voter in enumerate(voters)}
+
+        def batch_balances(addresses, fn_name, block_identifier="latest"):
+            # Later voters answer first so every prefetch overlaps another calculation
+            time.sleep(0.05 * (len(voters) - list(balances).index(addresses[0])))
+            return {address: balances[address] if fn_name == "balanceOf" else 0 for address in addresses}
+
+        engine._batch_balances = batch_balances
+        engine._call_uint256 = Mock(return_value=0)
+        token_balance_weight = engine._token_balance_weight
+
+        async def yielding_weight(address):
+            # Like hybrid weighting's gather, suspend between the prefetch and the snapshot read
+            await asyncio.sleep(0.08)
+            return await token_balance_weight(address)
+
+        engine.weight_strategies[VoteWeightStrategy.TOKEN_BALANCE] = yielding_weight
+
+        results = await asyncio.gather(*(
+            engine.cast_vote(voter.address, session.session_id, "yes", voter.key.hex()) for voter in voters
+        ))
+
+        assert all(result["success"] for result in results), results
+        recorded = {vote.voter_address: vote.voting_power for vote in engine.vote_records[session.session_id]}
+        assert recorded == balances
+        engine._call_uint256.assert_not_called()
+        assert voting_mechanism._BALANCE_SNAPSHOT.get() is None
+
+
+class TestPersistence:
+    """Redis state round trips"""
+
+    @pytest.mark.asyncio
+    async def test_sessions_and_votes_reload_in_pipelined_reads(self, engine, redis_client, chain):
+        """Test persisted sessions and their votes come back with index, columns and expiry"""
+        session = make_session()
+        await engine._persist_session(session)
+        vote = VoteRecord(Account.create().address, session.proposal_id, session.session_id, "yes", 123 * WEI_PER_TOKEN + 1)
+        await engine._persist_vote(vote)
+
+        restored = make_engine(redis_client, chain)
+        try:
+            await restored._load_active_sessions()
+
+            assert restored.active_sessions[session.session_id] == session
+            assert restored.vote_records[session.session_id] == [vote]
+            assert restored.vote_index[session.session_id] == {vote.voter_address.lower(): vote}
+            assert restored._expiry_heap == [(session.end_time.timestamp(), session.session_id)]
+            result = await restored._calculate_voting_results(session, restored.vote_records[session.session_id])
+            assert result.option_table["power"][0] == 123 * WEI_PER_TOKEN + 1
+        finally:
+            await restored.shutdown()
+
+    def test_vote_json_keeps_wei_above_64_bits(self):
+        """Test votes serialize with orjson and keep voting power beyond the 64-bit range"""
+        vote = VoteRecord("0x" + "44" * 20, "prop-1", "session-1", "yes", 10**30 + 7, conviction_multiplier=1.5)
+
+        assert SmartContractVotingEngine._vote_from_json(SmartContractVotingEngine._vote_to_json(vote)) == vote
+
+    def test_session_json_round_trips(self):
+        """Test sessions serialize with their enums, options and datetimes"""
+        session = make_session(VotingMechanism.QUADRATIC_VOTING, metadata={"title": "Budget"})
+
+        assert SmartContractVotingEngine._session_from_json(SmartContractVotingEngine._session_to_json(session)) == session
+
+
+class TestPowerSnapshot:
+    """Voting power snapshots"""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_freezes_balances_for_the_session(self, engine, redis_client, chain):
+        """Test balances read at the snapshot block keep counting after later transfers"""
+        session = make_session()
+        holders = [Account.create().address for _ in range(2)]
+        outsider = Account.create().address
+        chain.set_value(BALANCE_OF, holders[0], 4 * WEI_PER_TOKEN)
+        chain.set_value(GET_STAKED_BALANCE, holders[1], 2 * WEI_PER_TOKEN)
+        engine._scan_token_holders = Mock(return_value=set(holders))
+
+        await engine._snapshot_voting_power(session)
+        chain.set_value(BALANCE_OF, holders[0], 0)
+
+        # The session started a minute (five 12 s blocks) before the chain head
+        assert redis_client.data[f"power_snapshot:{session.session_id}"] == b"95"
+        engine._scan_token_holders.assert_called_once_with(95)
+        snapshot = await engine._read_power_snapshot(session.session_id, holders + [outsider])
+        assert snapshot["balanceOf"] == {holders[0]: 4 * WEI_PER_TOKEN, holders[1]: 0, outsider: 0}
+        assert snapshot["getStakedBalance"][holders[1]] == 2 * WEI_PER_TOKEN
+        power = await engine._calculate_voting_power(holders[0], VoteWeightStrategy.TOKEN_BALANCE, session.session_id)
+        assert power == 4 * WEI_PER_TOKEN
+
+    @pytest.mark.asyncio
+    async def test_no_snapshot_reads_live_balances(self, engine):
+        """Test a session without a snapshot yet is served from the chain"""
+        assert await engine._read_power_snapshot("session-1", [TOKEN_ADDRESS]) is None
+
+    @pytest.mark.asyncio
+    async def test_finalize_drops_session_state(self, engine, redis_client):
+        """Test finalizing a session cancels its pending snapshot and drops its votes and power from memory and Redis"""
+        session = make_session(start_time=datetime.now() + timedelta(hours=1))
+        engine.active_sessions[session.session_id] = session
+        await engine._persist_session(session)
+        engine._schedule_power_snapshot(session)
+        snapshot_task = engine._snapshot_tasks[session.session_id]
+        await asyncio.sleep(0.01)  # let the snapshot start waiting for the session start
+        for vote in add_votes(engine, session, [("yes", 10), ("no", 5)]):
+            engine.vote_index.setdefault(session.session_id, {})[vote.voter_address.lower()] = vote
+            await engine._persist_vote(vote)
+        await redis_client.hset("power:session-1", mapping={"0x" + "00" * 20: "1"})
+        await redis_client.hset("staked_power:session-1", mapping={"0x" + "00" * 20: "1"})
+        await redis_client.set("power_snapshot:session-1", 100)
+        await redis_client.set("eligible_power:session-1", 15)
+        engine._power_snapshot_sessions.add(session.session_id)
+
+        await engine._finalize_voting_session(session.session_id)
+        await asyncio.sleep(0)
+
+        assert snapshot_task.cancelled()
+        assert redis_client.data == {}
+        for state in (engine.vote_records, engine.vote_index, engine.vote_columns, engine._snapshot_tasks):
+            assert session.session_id not in state
+        assert session.session_id not in engine._power_snapshot_sessions
+
+    @pytest.mark.asyncio
+    async def test_block_at_finds_the_last_block_before_a_time(self, engine, chain):
+        """Test the block search returns the last block at or before the time, bounded by deploy block and head"""
+        block_time = lambda number: chain.genesis_time + number * chain.block_time
+
+        blocks = [
+            await asyncio.to_thread(engine._block_at, timestamp)
+            for timestamp in (block_time(40), block_time(40) + 11, block_time(5), block_time(100) + 60)
+        ]
+
+        assert blocks == [40, 40, 10, 100]
+
+
+class TestExpiry:
+    """Session expiry heap"""
+
+    @pytest.mark.asyncio
+    async def test_monitor_finalizes_sessions_as_they_end(self, engine, redis_client):
+        """Test the monitor sleeps until the earliest end time and finalizes only ended sessions"""
+        now = datetime.now()
+        ending = make_session(session_id="ending", end_time=now + timedelta(milliseconds=100))
+        running = make_session(session_id="running", end_time=now + timedelta(days=1))
+        for session in (running, ending):
+            engine.active_sessions[session.session_id] = session
+            await engine._persist_session(session)
+            engine._schedule_expiry(session.session_id, session.end_time.timestamp())
+        engine._monitoring_task = asyncio.create_task(engine._voting_monitoring_loop())
+
+        await wait_for(lambda: "ending" not in engine.active_sessions)
+
+        assert "voting_session:ending" not in redis_client.data
+        assert "running" in engine.active_sessions
+        assert [session_id for _, session_id in engine._expiry_heap] == ["running"]
+
+    @pytest.mark.asyncio
+    async def test_cancel_as_a_deadline_is_scheduled_stops_the_monitor(self, engine):
+        """Test a cancel landing just after an earlier deadline wakes the monitor still stops it"""
+        running = make_session(session_id="running")
+        engine.active_sessions[running.session_id] = running
+        engine._schedule_expiry(running.session_id, running.end_time.timestamp())
+        engine._monitoring_task = asyncio.create_task(engine._voting_monitoring_loop())
+        await asyncio.sleep(0.01)
+
+        engine._schedule_expiry("earlier", time.time() + 3600)
+        engine._monitoring_task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(engine._monitoring_task, 1)
+
+
+class TestDelegation:
+    """Delegation graph"""
+
+    @pytest.mark.asyncio
+    async def test_expired_delegation_leaves_the_delegate_index(self, engine, chain):
+        """Test a delegation popped from the expiry heap stops counting and leaves the delegate index"""
+        delegator, delegate_to = (Account.create().address for _ in range(2))
+        chain.set_value(BALANCE_OF, delegator, 10 * WEI_PER_TOKEN)
+        delegation = delegate(engine, delegator, delegate_to)
+        delegation.end_ts = int(time.time()) - 1
+        heapq.heappush(engine._delegation_expiry_heap, (delegation.end_ts, id(delegation), delegation))
+
+        power = await engine._calculate_voting_power(delegate_to, VoteWeightStrategy.TOKEN_BALANCE, "session-1")
+
+        assert power == 0
+        assert not delegation.is_active
+        assert engine.delegations_by_delegate[delegate_to.lower()] == []
+
+    @pytest.mark.asyncio
+    async def test_delegates_receive_power_along_the_chain(self, engine, chain):
+        """Test each hop passes its share of the delegator's own and received power"""
+        a, b, c = (Account.create().address for _ in range(3))
+        chain.set_value(BALANCE_OF, a, 10 * WEI_PER_TOKEN)
+        chain.set_value(BALANCE_OF, b, 10 * WEI_PER_TOKEN)
+        delegate(engine, a, b)
+        delegate(engine, b, c, 0.5)
+
+        powers = [
+            await engine._calculate_voting_power(address, VoteWeightStrategy.TOKEN_BALANCE, "session-1")
+            for address in (a, b, c)
+        ]
+
+        # Hybrid power is 40% of the balance: a passes 4 to b, b passes half of its 4 + 4 to c
+        assert powers == [6 * WEI_PER_TOKEN, 10 * WEI_PER_TOKEN, 4 * WEI_PER_TOKEN]
+
+    @pytest.mark.asyncio
+    async def test_alpha_damps_power_per_hop(self, engine, chain):
+        """Test viscous democracy scales what each delegate receives by alpha"""
+        a, b, c = (Account.create().address for _ in range(3))
+        chain.set_value(BALANCE_OF, a, 10 * WEI_PER_TOKEN)
+        chain.set_value(BALANCE_OF, b, 10 * WEI_PER_TOKEN)
+        delegate(engine, a, b)
+        delegate(engine, b, c, 0.5)
+        engine._delegation_alpha = 0.5
+
+        received, passed_on = await engine._compute_all_delegated_power("session-1")
+
+        assert received == {b.lower(): 2 * WEI_PER_TOKEN, c.lower(): 3 * WEI_PER_TOKEN // 2}
+        assert passed_on == {a.lower(): 4 * WEI_PER_TOKEN, b.lower(): 3 * WEI_PER_TOKEN}
+
+    @pytest.mark.asyncio
+    async def test_cycle_passes_nothing_on(self, engine, chain):
+        """Test addresses delegating to each other keep their own power"""
+        a, b = (Account.create().address for _ in range(2))
+        chain.set_value(BALANCE_OF, a, 10 * WEI_PER_TOKEN)
+        delegate(engine, a, b)
+        delegate(engine, b, a)
+
+        assert await engine._compute_all_delegated_power("session-1") == ({}, {})
+        power = await engine._calculate_voting_power(a, VoteWeightStrategy.TOKEN_BALANCE, "session-1")
+        assert power == 10 * WEI_PER_TOKEN
+
+    @pytest.mark.asyncio
+    async def test_explicit_alpha_bypasses_the_cache(self, engine, chain):
+        """Test an explicit alpha neither reads nor overwrites the cached graph for the session"""
+        a, b = (Account.create().address for _ in range(2))
+        chain.set_value(BALANCE_OF, a, 10 * WEI_PER_TOKEN)
+        delegate(engine, a, b)
+
+        undamped = await engine._compute_all_delegated_power("session-1")
+        damped = await engine._compute_all_delegated_power("session-1", alpha=0.5)
+
+        assert undamped[0] == {b.lower(): 4 * WEI_PER_TOKEN}
+        assert damped[0] == {b.lower(): 2 * WEI_PER_TOKEN}
+        assert await engine._compute_all_delegated_power("session-1") == undamped
@@ -4,22 +4,32 @@ Sistem manajemen treasury terdesentralisasi untuk DAO dengan multi-signature dan
 """
 
 import asyncio
-import json
+import contextlib
+import functools
 import time
 import hashlib
-from typing import Dict, List, Optional, Any, Tuple
+import heapq
+import logging
+import random
+from typing import Dict, List, Optional, Any, Tuple, Set
 from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime, timedelta
 from decimal import Decimal
-from web3 import Web3
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import orjson
+from web3 import Web3, AsyncWeb3, AsyncHTTPProvider
 from eth_account import Account
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 import redis.asyncio as redis
+import aiohttp
 import aiofiles
-import ipfshttpclient
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 class TransactionType(Enum):
     """Jenis transaksi treasury"""
@@ -53,7 +63,37 @@ class SpendingCategory(Enum):
     EMERGENCY = "emergency"
 
 
-@dataclass
+# Pre-encoded category lookups for hot aggregations
+_CAT2INT: Dict[SpendingCategory, int] = {c: i for i, c in enumerate(SpendingCategory)}
+_INT2CAT_NAME: Tuple[str, ...] = tuple(c.value for c in SpendingCategory)
+
+WEI_PER_ETHER = Decimal(10**18)
+
+
+def _json_default(obj: Any) -> Any:
+    """orjson fallback for types it does not serialize natively"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _multiaddr_to_api_url(multiaddr: str) -> str:
+    """Convert an IPFS API multiaddr (e.g. /ip4/127.0.0.1/tcp/5001/http) to its HTTP API base URL"""
+    if multiaddr.startswith(("http://", "https://")):
+        return multiaddr.rstrip("/") + "/api/v0"
+    
+    parts = multiaddr.strip("/").split("/")
+    host = parts[1] if len(parts) > 1 else "127.0.0.1"
+    if parts[0] == "ip6":
+        host = f"[{host}]"
+    port = parts[3] if len(parts) > 3 else "5001"
+    scheme = "https" if "https" in parts else "http"
+    return f"{scheme}://{host}:{port}/api/v0"
+
+
+@dataclass(slots=True)
 class TreasuryTransaction:
     """Transaksi dalam sistem treasury"""
     transaction_id: str
@@ -73,9 +113,10 @@ class TreasuryTransaction:
     metadata: Dict[str, Any] = field(default_factory=dict)
     ipfs_hash: Optional[str] = None
     transaction_hash: Optional[str] = None
+    amount_wei: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class TreasuryApproval:
     """Approval untuk transaksi treasury"""
     transaction_id: str
@@ -87,7 +128,7 @@ class TreasuryApproval:
     transaction_hash: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class TreasuryBudget:
     """Budget untuk periode tertentu"""
     budget_id: str
@@ -97,16 +138,22 @@ class TreasuryBudget:
     allocated_amount: Decimal
     spent_amount: Decimal = Decimal('0')
     remaining_amount: Decimal = field(init=False)
-    approval_threshold: Decimal = Decimal('0.1')  # 10% of budget
-    warning_threshold: Decimal = Decimal('0.8')  # 80% of budget
+    category_int: int = field(init=False)
+    approval_threshold: Optional[Decimal] = None  # Amount; defaults to 10% of allocated_amount
+    warning_threshold: Optional[Decimal] = None  # Amount; defaults to 80% of allocated_amount
     is_active: bool = True
     metadata: Dict[str, Any] = field(default_factory=dict)
 
     def __post_init__(self):
         self.remaining_amount = self.allocated_amount - self.spent_amount
+        self.category_int = _CAT2INT[self.category]
+        if self.approval_threshold is None:
+            self.approval_threshold = self.allocated_amount * Decimal('0.1')
+        if self.warning_threshold is None:
+            self.warning_threshold = self.allocated_amount * Decimal('0.8')
 
 
-@dataclass
+@dataclass(slots=True)
 class TreasuryMetrics:
     """Metrik treasury untuk monitoring"""
     total_balance: Decimal
@@ -126,7 +173,7 @@ class TreasuryMetrics:
     last_updated: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class TreasuryConfiguration:
     """Konfigurasi sistem treasury"""
     minimum_approvers: int = 3
@@ -143,6 +190,51 @@ class TreasuryConfiguration:
     enable_emergency_mode: bool = True
 
 
+class AsyncReadWriteLock:
+    """Read-write lock untuk asyncio: banyak reader bersamaan, writer eksklusif"""
+    
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer_active = False
+        self._writers_waiting = 0
+    
+    @contextlib.asynccontextmanager
+    async def read(self):
+        """Acquire shared read access; waiting writers take priority"""
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self._writer_active and self._writers_waiting == 0
+            )
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+    
+    @contextlib.asynccontextmanager
+    async def write(self):
+        """Acquire exclusive write access"""
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: not self._writer_active and self._readers == 0
+                )
+            finally:
+                self._writers_waiting -= 1
+            self._writer_active = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer_active = False
+                self._condition.notify_all()
+
+
 class TreasuryManagementSystem:
     """Sistem manajemen treasury terdesentralisasi SANGKURIANG"""
     
@@ -154,10 +246,12 @@ class TreasuryManagementSystem:
         ipfs_node: str = "/ip4/127.0.0.1/tcp/5001/http",
         redis_url: str = "redis://localhost:6379"
     ):
-        self.web3 = Web3(Web3.HTTPProvider(web3_provider))
+        self.web3_provider = AsyncHTTPProvider(web3_provider, request_kwargs={"timeout": 10})
+        self.web3 = AsyncWeb3(self.web3_provider)
+        self.http_session: Optional[aiohttp.ClientSession] = None
         self.treasury_contract_address = treasury_contract_address
         self.multi_sig_wallet_address = multi_sig_wallet_address
-        self.ipfs_client = ipfshttpclient.connect(ipfs_node)
+        self.ipfs_api_url = _multiaddr_to_api_url(ipfs_node)
         self.redis_client = redis.from_url(redis_url)
         
         # Contract ABIs
@@ -179,6 +273,7 @@ class TreasuryManagementSystem:
         self.transactions: Dict[str, TreasuryTransaction] = {}
         self.approvals: Dict[str, List[TreasuryApproval]] = {}
         self.budgets: Dict[str, TreasuryBudget] = {}
+        self._active_budget_by_category: Dict[SpendingCategory, TreasuryBudget] = {}
         self.approved_signers: List[str] = []
         self.emergency_mode: bool = False
         
@@ -186,8 +281,74 @@ class TreasuryManagementSystem:
         self.configuration = TreasuryConfiguration()
         
         # Transaction queues
-        self.pending_transactions: List[str] = []
-        self.approved_transactions: List[str] = []
+        self.pending_transactions: Set[str] = set()
+        self.approved_transactions: Set[str] = set()
+        self._deadline_heap: List[Tuple[datetime, str]] = []
+        
+        # Wake-ups for event-driven monitoring tasks
+        self._deadline_event = asyncio.Event()
+        self._execution_ready_event = asyncio.Event()
+        
+        # Monitoring loop error backoff (seconds)
+        self._error_backoff_initial: float = 60.0
+        self._error_backoff_max: float = 900.0
+        
+        # Approval batching: (transaction_id, status_bit, future) tuples applied in one tally
+        self._pending_approvals: asyncio.Queue = asyncio.Queue()
+        self._approval_batch_window: float = 0.01  # 10ms
+        self._background_tasks: List[asyncio.Task] = []
+        self._approval_applier_task: Optional[asyncio.Task] = None
+        
+        # Post-commit on-chain execution: (transaction_id, private_key, tx_hash) items. Every queued
+        # send has a WAL record (charged budget id, broadcast hash) mirrored in a Redis hash until
+        # its receipt confirms it or it definitely failed
+        self._send_queue: asyncio.Queue = asyncio.Queue()
+        self._send_task: Optional[asyncio.Task] = None
+        self._send_wal_key: str = "treasury:send_wal"
+        self._pending_sends: Dict[str, Dict[str, Optional[str]]] = {}
+        self._receipt_timeout: float = 300.0
+        self._receipt_retry_delay: float = 30.0
+        
+        # Redis hashes holding persisted treasury state
+        self._transactions_key: str = "treasury:transactions"
+        self._approvals_key: str = "treasury:approvals"
+        self._budgets_key: str = "treasury:budgets"
+        
+        # IPFS upload batching: (document, future) pairs flushed as one multipart /add call
+        self._ipfs_queue: asyncio.Queue = asyncio.Queue()
+        self._ipfs_batch_size: int = 16
+        self._ipfs_batch_window: float = 0.5
+        self._ipfs_upload_task: Optional[asyncio.Task] = None
+        
+        # Shortest sleep of the expiry loop, so a deadline due now cannot spin it
+        self._expiry_min_wait: float = 0.01
+        
+        # Chain read caches: key -> (monotonic timestamp, value), with single-flight futures
+        self._chain_cache: Dict[str, Tuple[float, Any]] = {}
+        self._chain_inflight: Dict[str, asyncio.Future] = {}
+        
+        # Shared chain state refreshed by one JSON-RPC batch per tick
+        self._chain_state: Dict[str, Any] = {"balance_wei": 0, "gas_price": 0, "nonces": {}}
+        self._balance_ttl: float = 30.0
+        self._gas_price_ttl: float = 10.0
+        
+        # Locally pipelined nonces per sender; RPC is consulted on first use or after a failed send
+        self._nonces: Dict[str, int] = {}
+        self._nonce_locks: Dict[str, asyncio.Lock] = {}
+        
+        # Bounded executor for CPU-bound signing; RPCs go through the async provider
+        self._signing_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="treasury-sign")
+        
+        # Incremental metric aggregates, updated at state transitions
+        self._executed_count: int = 0
+        self._unloaded_count: int = 0  # Persisted transactions kept out of memory, see _load_existing_transactions
+        self._amount_sum: Decimal = Decimal('0')
+        self._amount_min_heap: List[Decimal] = []
+        self._amount_max: Decimal = Decimal('0')
+        self._approval_totals: Dict[str, int] = {"approved": 0, "rejected": 0, "total": 0}
+        
+        # Guards treasury state: status/report reads share, mutators and metric updates exclude
+        self._metrics_rwlock = AsyncReadWriteLock()
         
         # Metrics
         self.metrics = TreasuryMetrics(
@@ -283,8 +444,11 @@ class TreasuryManagementSystem:
     async def initialize_treasury(self, approved_signers: List[str]) -> bool:
         """Inisialisasi sistem treasury"""
         try:
+            # Pooled keep-alive session shared by all RPCs
+            await self.web3_provider.cache_async_session(self._get_http_session())
+            
             # Validate Web3 connection
-            if not self.web3.is_connected():
+            if not await self.web3.is_connected():
                 raise Exception("Web3 connection failed")
             
             # Set approved signers
@@ -293,19 +457,45 @@ class TreasuryManagementSystem:
             # Load existing data
             await self._load_existing_transactions()
             await self._load_existing_budgets()
+            await self._recover_send_queue()
             await self._update_treasury_metrics()
             
             # Start monitoring loops
-            asyncio.create_task(self._treasury_monitoring_loop())
-            asyncio.create_task(self._budget_monitoring_loop())
+            self._background_tasks.append(asyncio.create_task(self._metrics_refresh_loop()))
+            self._background_tasks.append(asyncio.create_task(self._expiry_loop()))
+            self._background_tasks.append(asyncio.create_task(self._pending_processor_loop()))
+            self._background_tasks.append(asyncio.create_task(self._budget_monitoring_loop()))
             
-            print(f"✅ Treasury system initialized with {len(approved_signers)} signers")
+            logger.info(f"Treasury system initialized with {len(approved_signers)} signers")
             return True
             
         except Exception as e:
-            print(f"❌ Failed to initialize treasury: {e}")
+            logger.error(f"Failed to initialize treasury: {e}")
             return False
     
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Get the pooled keep-alive session, creating it on first use"""
+        if self.http_session is None or self.http_session.closed:
+            self.http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+            )
+        return self.http_session
+    
+    async def shutdown(self) -> None:
+        """Stop background tasks and release connections"""
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks.clear()
+        
+        try:
+            await self._save_state()
+        finally:
+            if self.http_session:
+                await self.http_session.close()
+                self.http_session = None
+            self._signing_executor.shutdown(wait=False)
+    
     async def propose_transaction(
         self,
         transaction_type: TransactionType,
@@ -348,7 +538,8 @@ class TreasuryManagementSystem:
                 required_approvals = self._calculate_required_approvals(amount)
             
             # Set execution deadline
-            execution_deadline = datetime.now() + timedelta(
+            now = datetime.now()
+            execution_deadline = now + timedelta(
                 hours=self.configuration.transaction_timeout_hours
             )
             
@@ -361,11 +552,12 @@ class TreasuryManagementSystem:
                 category=category,
                 description=description,
                 requested_by=requested_by,
-                requested_at=datetime.now(),
+                requested_at=now,
                 required_approvals=required_approvals,
                 budget_period=budget_period,
                 execution_deadline=execution_deadline,
-                metadata=metadata or {}
+                metadata=metadata or {},
+                amount_wei=int(amount * WEI_PER_ETHER)
             )
             
             # Upload documentation to IPFS
@@ -387,11 +579,14 @@ class TreasuryManagementSystem:
             transaction.transaction_hash = tx_hash
             
             # Store transaction
-            self.transactions[transaction_id] = transaction
-            self.approvals[transaction_id] = []
-            self.pending_transactions.append(transaction_id)
+            async with self._metrics_rwlock.write():
+                self.transactions[transaction_id] = transaction
+                self.approvals[transaction_id] = []
+                self.pending_transactions.add(transaction_id)
+                heapq.heappush(self._deadline_heap, (execution_deadline, transaction_id))
+            self._deadline_event.set()
             
-            print(f"✅ Transaction proposed: {transaction_id}")
+            logger.info(f"Transaction proposed: {transaction_id}")
             return {
                 "success": True,
                 "transaction_id": transaction_id,
@@ -401,7 +596,7 @@ class TreasuryManagementSystem:
             }
             
         except Exception as e:
-            print(f"❌ Failed to propose transaction: {e}")
+            logger.error(f"Failed to propose transaction: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -435,7 +630,8 @@ class TreasuryManagementSystem:
                     return {"success": False, "error": "Already voted on this transaction"}
             
             # Check deadline
-            if datetime.now() > transaction.execution_deadline:
+            now = datetime.now()
+            if now > transaction.execution_deadline:
                 transaction.status = TransactionStatus.EXPIRED
                 return {"success": False, "error": "Transaction has expired"}
             
@@ -445,29 +641,29 @@ class TreasuryManagementSystem:
                 approver_address=approver_address,
                 approval_status=approval_status,
                 approval_reason=approval_reason,
-                approval_timestamp=datetime.now(),
+                approval_timestamp=now,
                 signature=signature or ""
             )
             
-            # Create on-chain approval
-            tx_hash = await self._create_on_chain_approval(transaction_id, approval_status, private_key)
-            approval.transaction_hash = tx_hash
+            # Each approver confirms from their own account, so the multi-sig sees them as msg.sender
+            approval.transaction_hash = await self._create_on_chain_approval(
+                transaction_id, approval_status, private_key
+            )
             
             # Store approval
             if transaction_id not in self.approvals:
                 self.approvals[transaction_id] = []
             self.approvals[transaction_id].append(approval)
             
-            # Update transaction status
-            if approval_status.lower() == "approved":
-                transaction.current_approvals += 1
-            else:
-                transaction.current_rejections += 1
+            # Update transaction status (batched with concurrent approvals)
+            await self._enqueue_approval(transaction_id, approval_status)
             
             # Check if transaction can be executed
             execution_result = await self._check_execution_eligibility(transaction_id)
+            if execution_result["can_execute"]:
+                self._execution_ready_event.set()
             
-            print(f"✅ Transaction {approval_status}: {transaction_id} by {approver_address}")
+            logger.info(f"Transaction {approval_status}: {transaction_id} by {approver_address}")
             return {
                 "success": True,
                 "transaction_id": transaction_id,
@@ -475,11 +671,11 @@ class TreasuryManagementSystem:
                 "current_approvals": transaction.current_approvals,
                 "current_rejections": transaction.current_rejections,
                 "can_execute": execution_result["can_execute"],
-                "transaction_hash": tx_hash
+                "transaction_hash": approval.transaction_hash
             }
             
         except Exception as e:
-            print(f"❌ Failed to approve transaction: {e}")
+            logger.error(f"Failed to approve transaction: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -506,42 +702,38 @@ class TreasuryManagementSystem:
             if executor_address not in self.approved_signers:
                 return {"success": False, "error": "Unauthorized executor"}
             
-            # Execute on-chain transaction
-            tx_hash = await self._execute_on_chain_transaction(transaction_id, private_key)
+            async with self._metrics_rwlock.write():
+                # A concurrent execute call may have won the race since the check above
+                if transaction.status != TransactionStatus.APPROVED:
+                    return {"success": False, "error": "Transaction not approved"}
+                budget_id = await self._apply_execution(transaction)
+            
+            # Hand on-chain execution to the send queue; the WAL survives restarts
+            self._pending_sends[transaction_id] = {"budget_id": budget_id, "tx_hash": None}
+            try:
+                await self._write_send_wal(transaction_id)
+            except Exception:
+                # Without a WAL record the send could be lost on restart, so do not queue it
+                self._pending_sends.pop(transaction_id, None)
+                await self._revert_execution(transaction, budget_id)
+                raise
+            self._start_send_loop()
+            await self._send_queue.put((transaction_id, private_key, None))
+            
+            # Update metrics
+            await self._update_treasury_metrics()
+            
+            logger.info(f"Transaction queued for execution: {transaction_id}")
+            return {
+                "success": True,
+                "status": "queued",
+                "transaction_id": transaction_id,
+                "amount": str(transaction.amount),
+                "recipient": transaction.recipient_address
+            }
             
-            if tx_hash:
-                # Update transaction status
-                transaction.status = TransactionStatus.EXECUTED
-                transaction.transaction_hash = tx_hash
-                
-                # Update budget
-                await self._update_budget_spending(transaction)
-                
-                # Update metrics
-                await self._update_treasury_metrics()
-                
-                # Remove from queues
-                if transaction_id in self.pending_transactions:
-                    self.pending_transactions.remove(transaction_id)
-                if transaction_id in self.approved_transactions:
-                    self.approved_transactions.remove(transaction_id)
-                
-                print(f"✅ Transaction executed: {transaction_id}")
-                return {
-                    "success": True,
-                    "transaction_id": transaction_id,
-                    "transaction_hash": tx_hash,
-                    "amount": str(transaction.amount),
-                    "recipient": transaction.recipient_address
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": "Failed to execute on-chain transaction"
-                }
-                
         except Exception as e:
-            print(f"❌ Failed to execute transaction: {e}")
+            logger.error(f"Failed to execute transaction: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -568,14 +760,7 @@ class TreasuryManagementSystem:
             # Generate budget ID
             budget_id = self._generate_budget_id(category, period_start)
             
-            # Set thresholds
-            if approval_threshold is None:
-                approval_threshold = allocated_amount * Decimal('0.1')
-            
-            if warning_threshold is None:
-                warning_threshold = allocated_amount * Decimal('0.8')
-            
-            # Create budget
+            # Create budget; thresholds left as None are derived from allocated_amount
             budget = TreasuryBudget(
                 budget_id=budget_id,
                 category=category,
@@ -587,19 +772,23 @@ class TreasuryManagementSystem:
             )
             
             # Store budget
-            self.budgets[budget_id] = budget
+            async with self._metrics_rwlock.write():
+                self.budgets[budget_id] = budget
+                current = self._active_budget_by_category.get(category)
+                if current is None or period_start <= datetime.now() <= period_end:
+                    self._active_budget_by_category[category] = budget
             
-            print(f"✅ Budget created: {budget_id}")
+            logger.info(f"Budget created: {budget_id}")
             return {
                 "success": True,
                 "budget_id": budget_id,
-                "category": category.value,
+                "category": _INT2CAT_NAME[budget.category_int],
                 "allocated_amount": str(allocated_amount),
                 "period": f"{period_start.date()} to {period_end.date()}"
             }
             
         except Exception as e:
-            print(f"❌ Failed to create budget: {e}")
+            logger.error(f"Failed to create budget: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -614,41 +803,42 @@ class TreasuryManagementSystem:
             # Get current balance from blockchain
             blockchain_balance = await self._get_blockchain_balance()
             
-            # Calculate pending amounts
-            pending_amount = sum(
-                self.transactions[tx_id].amount
-                for tx_id in self.pending_transactions
-            )
-            
-            approved_amount = sum(
-                self.transactions[tx_id].amount
-                for tx_id in self.approved_transactions
-            )
-            
-            return {
-                "success": True,
-                "treasury_status": {
-                    "blockchain_balance": str(blockchain_balance),
-                    "available_balance": str(blockchain_balance - pending_amount - approved_amount),
-                    "pending_amount": str(pending_amount),
-                    "approved_amount": str(approved_amount),
-                    "total_transactions": self.metrics.total_transactions,
-                    "pending_transactions": len(self.pending_transactions),
-                    "approved_transactions": len(self.approved_transactions),
-                    "emergency_mode": self.emergency_mode,
-                    "approved_signers": len(self.approved_signers)
-                },
-                "metrics": {
-                    "monthly_spending": str(self.metrics.monthly_spending),
-                    "quarterly_spending": str(self.metrics.quarterly_spending),
-                    "yearly_spending": str(self.metrics.yearly_spending),
-                    "approval_rate": self.metrics.approval_rate,
-                    "rejection_rate": self.metrics.rejection_rate
+            async with self._metrics_rwlock.read():
+                # Calculate pending amounts
+                pending_amount = sum(
+                    self.transactions[tx_id].amount
+                    for tx_id in self.pending_transactions
+                )
+                
+                approved_amount = sum(
+                    self.transactions[tx_id].amount
+                    for tx_id in self.approved_transactions
+                )
+                
+                return {
+                    "success": True,
+                    "treasury_status": {
+                        "blockchain_balance": str(blockchain_balance),
+                        "available_balance": str(blockchain_balance - pending_amount - approved_amount),
+                        "pending_amount": str(pending_amount),
+                        "approved_amount": str(approved_amount),
+                        "total_transactions": self.metrics.total_transactions,
+                        "pending_transactions": len(self.pending_transactions),
+                        "approved_transactions": len(self.approved_transactions),
+                        "emergency_mode": self.emergency_mode,
+                        "approved_signers": len(self.approved_signers)
+                    },
+                    "metrics": {
+                        "monthly_spending": str(self.metrics.monthly_spending),
+                        "quarterly_spending": str(self.metrics.quarterly_spending),
+                        "yearly_spending": str(self.metrics.yearly_spending),
+                        "approval_rate": self.metrics.approval_rate,
+                        "rejection_rate": self.metrics.rejection_rate
+                    }
                 }
-            }
             
         except Exception as e:
-            print(f"❌ Failed to get treasury status: {e}")
+            logger.error(f"Failed to get treasury status: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -657,49 +847,54 @@ class TreasuryManagementSystem:
     async def get_budget_report(self, category: Optional[SpendingCategory] = None) -> Dict[str, Any]:
         """Dapatkan laporan budget"""
         try:
-            budgets_to_report = []
-            
-            if category:
-                # Filter by category
-                budgets_to_report = [
-                    budget for budget in self.budgets.values()
-                    if budget.category == category
-                ]
-            else:
-                # All active budgets
-                budgets_to_report = [
-                    budget for budget in self.budgets.values()
-                    if budget.is_active
-                ]
-            
-            budget_report = []
-            for budget in budgets_to_report:
-                utilization_rate = float(budget.spent_amount / budget.allocated_amount) if budget.allocated_amount > 0 else 0
+            async with self._metrics_rwlock.read():
+                budgets_to_report = []
                 
-                budget_report.append({
-                    "budget_id": budget.budget_id,
-                    "category": budget.category.value,
-                    "allocated_amount": str(budget.allocated_amount),
-                    "spent_amount": str(budget.spent_amount),
-                    "remaining_amount": str(budget.remaining_amount),
-                    "utilization_rate": utilization_rate,
-                    "period": f"{budget.period_start.date()} to {budget.period_end.date()}",
-                    "is_active": budget.is_active
-                })
-            
-            return {
-                "success": True,
-                "budgets": budget_report,
-                "summary": {
-                    "total_budgets": len(budget_report),
-                    "total_allocated": str(sum(budget.allocated_amount for budget in budgets_to_report)),
-                    "total_spent": str(sum(budget.spent_amount for budget in budgets_to_report)),
-                    "total_remaining": str(sum(budget.remaining_amount for budget in budgets_to_report))
+                if category:
+                    # Filter by category
+                    budgets_to_report = [
+                        budget for budget in self.budgets.values()
+                        if budget.category == category
+                    ]
+                else:
+                    # All active budgets
+                    budgets_to_report = [
+                        budget for budget in self.budgets.values()
+                        if budget.is_active
+                    ]
+                
+                budget_report = []
+                total_allocated = total_spent = total_remaining = Decimal('0')
+                for budget in budgets_to_report:
+                    total_allocated += budget.allocated_amount
+                    total_spent += budget.spent_amount
+                    total_remaining += budget.remaining_amount
+                    utilization_rate = float(budget.spent_amount / budget.allocated_amount) if budget.allocated_amount > 0 else 0
+                
+                    budget_report.append({
+                        "budget_id": budget.budget_id,
+                        "category": _INT2CAT_NAME[budget.category_int],
+                        "allocated_amount": str(budget.allocated_amount),
+                        "spent_amount": str(budget.spent_amount),
+                        "remaining_amount": str(budget.remaining_amount),
+                        "utilization_rate": utilization_rate,
+                        "period": f"{budget.period_start.date()} to {budget.period_end.date()}",
+                        "is_active": budget.is_active
+                    })
+                
+                return {
+                    "success": True,
+                    "budgets": budget_report,
+                    "summary": {
+                        "total_budgets": len(budget_report),
+                        "total_allocated": str(total_allocated),
+                        "total_spent": str(total_spent),
+                        "total_remaining": str(total_remaining)
+                    }
                 }
-            }
             
         except Exception as e:
-            print(f"❌ Failed to get budget report: {e}")
+            logger.error(f"Failed to get budget report: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -713,7 +908,7 @@ class TreasuryManagementSystem:
     
     def _generate_budget_id(self, category: SpendingCategory, period_start: datetime) -> str:
         """Generate unique budget ID"""
-        content = f"{category.value}:{period_start.isoformat()}"
+        content = f"{_CAT2INT[category]}:{period_start.isoformat()}"
         return hashlib.sha256(content.encode()).hexdigest()
     
     def _calculate_required_approvals(self, amount: Decimal) -> int:
@@ -762,15 +957,7 @@ class TreasuryManagementSystem:
     async def _check_budget_availability(self, amount: Decimal, category: SpendingCategory, period: str) -> Dict[str, Any]:
         """Check if budget has sufficient funds"""
         # Find applicable budget
-        applicable_budget = None
-        now = datetime.now()
-        
-        for budget in self.budgets.values():
-            if (budget.category == category and 
-                budget.is_active and 
-                budget.period_start <= now <= budget.period_end):
-                applicable_budget = budget
-                break
+        applicable_budget = self._get_active_budget(category)
         
         if not applicable_budget:
             return {
@@ -805,11 +992,13 @@ class TreasuryManagementSystem:
         )
         
         if can_execute:
-            transaction.status = TransactionStatus.APPROVED
-            if transaction_id in self.pending_transactions:
-                self.pending_transactions.remove(transaction_id)
-            if transaction_id not in self.approved_transactions:
-                self.approved_transactions.append(transaction_id)
+            async with self._metrics_rwlock.write():
+                # Expiry may have moved the transaction on while waiting for the lock
+                can_execute = transaction.status == TransactionStatus.PENDING
+                if can_execute:
+                    transaction.status = TransactionStatus.APPROVED
+                    self.pending_transactions.discard(transaction_id)
+                    self.approved_transactions.add(transaction_id)
         
         return {
             "can_execute": can_execute,
@@ -818,109 +1007,391 @@ class TreasuryManagementSystem:
             "required_approvals": transaction.required_approvals
         }
     
-    async def _update_budget_spending(self, transaction: TreasuryTransaction) -> None:
-        """Update budget spending after transaction execution"""
-        # Find applicable budget
-        applicable_budget = None
+    async def _enqueue_approval(self, transaction_id: str, approval_status: str) -> Tuple[int, int]:
+        """Queue approval count update and wait for batched tally"""
+        if self._approval_applier_task is None or self._approval_applier_task.done():
+            self._approval_applier_task = asyncio.create_task(self._approval_applier_loop())
+            self._background_tasks.append(self._approval_applier_task)
         
-        for budget in self.budgets.values():
-            if (budget.category == transaction.category and 
-                budget.is_active and 
-                budget.period_start <= datetime.now() <= budget.period_end):
-                applicable_budget = budget
-                break
+        future = asyncio.get_running_loop().create_future()
+        status_bit = 1 if approval_status.lower() == "approved" else 0
+        await self._pending_approvals.put((transaction_id, status_bit, future))
+        return await future
+    
+    async def _approval_applier_loop(self) -> None:
+        """Drain queued approvals every batch window and apply one vectorized tally"""
+        while True:
+            batch = [await self._pending_approvals.get()]
+            await asyncio.sleep(self._approval_batch_window)
+            while not self._pending_approvals.empty():
+                batch.append(self._pending_approvals.get_nowait())
+            
+            try:
+                tx_ids = list(dict.fromkeys(item[0] for item in batch))
+                tx_index = {tx_id: i for i, tx_id in enumerate(tx_ids)}
+                indices = np.fromiter((tx_index[item[0]] for item in batch), dtype=np.intp, count=len(batch))
+                status_bits = np.fromiter((item[1] for item in batch), dtype=np.int64, count=len(batch))
+                
+                totals = np.bincount(indices, minlength=len(tx_ids))
+                approvals = np.bincount(indices, weights=status_bits, minlength=len(tx_ids)).astype(np.int64)
+                rejections = totals - approvals
+                
+                # Plain counters updated without awaiting, so no lock is needed
+                for i, tx_id in enumerate(tx_ids):
+                    transaction = self.transactions[tx_id]
+                    transaction.current_approvals += int(approvals[i])
+                    transaction.current_rejections += int(rejections[i])
+                
+                approved_total = int(approvals.sum())
+                self._approval_totals["approved"] += approved_total
+                self._approval_totals["rejected"] += len(batch) - approved_total
+                self._approval_totals["total"] += len(batch)
+                
+                for tx_id, _, future in batch:
+                    if not future.done():
+                        transaction = self.transactions[tx_id]
+                        future.set_result((transaction.current_approvals, transaction.current_rejections))
+            
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def _get_active_budget(self, category: SpendingCategory) -> Optional[TreasuryBudget]:
+        """Get the active budget covering now for a category"""
+        budget = self._active_budget_by_category.get(category)
+        if (budget is not None and
+            budget.is_active and
+            budget.period_start <= datetime.now() <= budget.period_end):
+            return budget
+        return None
+    
+    async def _update_budget_spending(self, transaction: TreasuryTransaction) -> Optional[str]:
+        """Update budget spending after transaction execution; returns the charged budget id"""
+        # Find applicable budget
+        applicable_budget = self._get_active_budget(transaction.category)
         
         if applicable_budget:
             applicable_budget.spent_amount += transaction.amount
             applicable_budget.remaining_amount = (
                 applicable_budget.allocated_amount - applicable_budget.spent_amount
             )
+            return applicable_budget.budget_id
+        return None
+    
+    async def _apply_execution(self, transaction: TreasuryTransaction) -> Optional[str]:
+        """Mark transaction executed locally and charge its budget; caller holds the write lock"""
+        transaction.status = TransactionStatus.EXECUTED
+        self._record_executed_amount(transaction.amount)
+        
+        # Update budget
+        budget_id = await self._update_budget_spending(transaction)
+        
+        # Remove from queues
+        self.pending_transactions.discard(transaction.transaction_id)
+        self.approved_transactions.discard(transaction.transaction_id)
+        return budget_id
+    
+    def _start_send_loop(self) -> None:
+        """Start the send loop unless it is already running"""
+        if self._send_task is None or self._send_task.done():
+            self._send_task = asyncio.create_task(self._send_loop())
+            self._background_tasks.append(self._send_task)
+    
+    async def _write_send_wal(self, transaction_id: str) -> None:
+        """Mirror the pending send record of a transaction into the Redis WAL"""
+        await self.redis_client.hset(
+            self._send_wal_key, transaction_id, orjson.dumps(self._pending_sends[transaction_id])
+        )
+    
+    async def _send_loop(self) -> None:
+        """Submit queued executions on-chain and confirm their receipts"""
+        while True:
+            transaction_id, private_key, tx_hash = await self._send_queue.get()
+            try:
+                await self._process_send(transaction_id, private_key, tx_hash)
+            except Exception:
+                # The WAL record stays, so the send is reconciled on the next start
+                logger.exception(f"Send loop error for transaction {transaction_id}")
+    
+    async def _process_send(self, transaction_id: str, private_key: Optional[str], tx_hash: Optional[str]) -> None:
+        """Broadcast one execution unless already broadcast, then settle it by its receipt"""
+        transaction = self.transactions[transaction_id]
+        
+        if tx_hash is None:
+            tx_hash = await self._execute_on_chain_transaction(transaction_id, private_key)
+            if not tx_hash:
+                # Nothing was broadcast, so the execution definitely did not happen
+                logger.error(f"Failed to execute transaction {transaction_id}: not submitted")
+                await self._finish_send(transaction, confirmed=False)
+                return
+            transaction.transaction_hash = tx_hash
+            self._pending_sends[transaction_id]["tx_hash"] = tx_hash
+        
+        try:
+            # Record the hash first: from here on only the receipt decides the outcome
+            await self._write_send_wal(transaction_id)
+            receipt = await self.web3.eth.wait_for_transaction_receipt(
+                tx_hash, timeout=self._receipt_timeout
+            )
+        except Exception as e:
+            # Timed out or the node is unreachable; the transaction may still be mined,
+            # so it stays executed and pending until a receipt shows up
+            logger.warning(f"Execution of {transaction_id} not confirmed yet ({tx_hash}): {e}")
+            asyncio.get_running_loop().call_later(
+                self._receipt_retry_delay, self._send_queue.put_nowait, (transaction_id, None, tx_hash)
+            )
+            return
+        
+        if receipt["status"] == 1:
+            logger.info(f"Transaction executed: {transaction_id}")
+            await self._finish_send(transaction, confirmed=True)
+        else:
+            logger.error(f"Failed to execute transaction {transaction_id}: reverted on-chain ({tx_hash})")
+            await self._finish_send(transaction, confirmed=False)
+    
+    async def _finish_send(self, transaction: TreasuryTransaction, confirmed: bool) -> None:
+        """Settle a send with a known outcome and drop its WAL record"""
+        entry = self._pending_sends.pop(transaction.transaction_id, None) or {}
+        if not confirmed:
+            await self._revert_execution(transaction, entry.get("budget_id"))
+        await self.redis_client.hdel(self._send_wal_key, transaction.transaction_id)
+    
+    async def _revert_execution(self, transaction: TreasuryTransaction, budget_id: Optional[str]) -> None:
+        """Roll local state back to APPROVED after a failed on-chain execution"""
+        async with self._metrics_rwlock.write():
+            transaction.status = TransactionStatus.APPROVED
+            self.approved_transactions.add(transaction.transaction_id)
+            
+            if budget_id in self.budgets:
+                budget = self.budgets[budget_id]
+                budget.spent_amount -= transaction.amount
+                budget.remaining_amount = budget.allocated_amount - budget.spent_amount
+            
+            amount = transaction.amount
+            self._executed_count -= 1
+            self._amount_sum -= amount
+            self._amount_min_heap.remove(amount)
+            heapq.heapify(self._amount_min_heap)
+            if amount == self._amount_max:
+                self._amount_max = max(self._amount_min_heap, default=Decimal('0'))
+    
+    async def _recover_send_queue(self) -> None:
+        """Reconcile sends left in the WAL by a restart or shutdown"""
+        wal_rows = await self.redis_client.hgetall(self._send_wal_key)
+        for raw_id, raw_entry in wal_rows.items():
+            transaction_id = raw_id.decode() if isinstance(raw_id, bytes) else raw_id
+            entry = orjson.loads(raw_entry)
+            transaction = self.transactions.get(transaction_id)
+            
+            if transaction is None or transaction.status != TransactionStatus.EXECUTED:
+                # The local execution never reached persisted state, so no budget was charged there
+                if transaction is None or not entry.get("tx_hash"):
+                    if transaction is None:
+                        logger.warning(f"Dropping send WAL record of unknown transaction {transaction_id}")
+                    await self.redis_client.hdel(self._send_wal_key, transaction_id)
+                    continue
+                # Broadcast though: redo the local execution and let the receipt settle it
+                async with self._metrics_rwlock.write():
+                    entry["budget_id"] = await self._apply_execution(transaction)
+            
+            self._pending_sends[transaction_id] = entry
+            if entry.get("tx_hash"):
+                self._start_send_loop()
+                self._send_queue.put_nowait((transaction_id, None, entry["tx_hash"]))
+            else:
+                # Never broadcast; signing keys are not persisted, so it needs a new execute call
+                await self._finish_send(transaction, confirmed=False)
+    
+    def _record_executed_amount(self, amount: Decimal) -> None:
+        """Fold an executed transaction into the incremental metric aggregates"""
+        self._executed_count += 1
+        self._amount_sum += amount
+        heapq.heappush(self._amount_min_heap, amount)
+        if amount > self._amount_max:
+            self._amount_max = amount
     
     async def _update_treasury_metrics(self) -> None:
         """Update treasury metrics"""
         try:
             # Get blockchain balance
             blockchain_balance = await self._get_blockchain_balance()
-            self.metrics.total_balance = blockchain_balance
-            
-            # Update transaction counts
-            self.metrics.total_transactions = len(self.transactions)
-            self.metrics.pending_transactions = len(self.pending_transactions)
-            self.metrics.approved_transactions = len(self.approved_transactions)
-            self.metrics.executed_transactions = len([
-                tx for tx in self.transactions.values()
-                if tx.status == TransactionStatus.EXECUTED
-            ])
-            
-            # Calculate spending metrics
-            executed_transactions = [
-                tx for tx in self.transactions.values()
-                if tx.status == TransactionStatus.EXECUTED
-            ]
-            
-            if executed_transactions:
-                amounts = [tx.amount for tx in executed_transactions]
-                self.metrics.average_transaction_size = sum(amounts) / len(amounts)
-                self.metrics.largest_transaction = max(amounts)
-                self.metrics.smallest_transaction = min(amounts)
+            
+            # Only reads the aggregates; the read side keeps writers from changing them mid-snapshot
+            async with self._metrics_rwlock.read():
+                self.metrics.total_balance = blockchain_balance
                 
-                # Calculate approval rates
-                total_approvals = sum(len(self.approvals.get(tx_id, [])) for tx_id in self.transactions)
-                approved_approvals = sum(
-                    sum(1 for a in self.approvals.get(tx_id, []) if a.approval_status.lower() == "approved")
-                    for tx_id in self.transactions
-                )
+                # Update transaction counts
+                self.metrics.total_transactions = len(self.transactions) + self._unloaded_count
+                self.metrics.pending_transactions = len(self.pending_transactions)
+                self.metrics.approved_transactions = len(self.approved_transactions)
+                self.metrics.executed_transactions = self._executed_count
                 
-                if total_approvals > 0:
-                    self.metrics.approval_rate = approved_approvals / total_approvals
-                    self.metrics.rejection_rate = 1 - self.metrics.approval_rate
-            
-            # Update budget utilization
-            for budget in self.budgets.values():
-                if budget.allocated_amount > 0:
-                    utilization = float(budget.spent_amount / budget.allocated_amount)
-                    self.metrics.budget_utilization[budget.category.value] = utilization
-            
-            self.metrics.last_updated = datetime.now()
+                # Calculate spending metrics
+                if self._executed_count:
+                    self.metrics.average_transaction_size = self._amount_sum / self._executed_count
+                    self.metrics.largest_transaction = self._amount_max
+                    self.metrics.smallest_transaction = self._amount_min_heap[0]
+                    
+                    # Calculate approval rates
+                    total_approvals = self._approval_totals["total"]
+                    if total_approvals > 0:
+                        self.metrics.approval_rate = self._approval_totals["approved"] / total_approvals
+                        self.metrics.rejection_rate = 1 - self.metrics.approval_rate
+                
+                # Update budget utilization
+                for budget in self.budgets.values():
+                    if budget.allocated_amount > 0:
+                        utilization = float(budget.spent_amount / budget.allocated_amount)
+                        self.metrics.budget_utilization[_INT2CAT_NAME[budget.category_int]] = utilization
+                
+                self.metrics.last_updated = datetime.now()
             
         except Exception as e:
-            print(f"Error updating treasury metrics: {e}")
+            logger.error(f"Error updating treasury metrics: {e}")
     
     async def _get_blockchain_balance(self) -> Decimal:
         """Get treasury balance from blockchain"""
         try:
-            balance_wei = self.treasury_contract.functions.getTreasuryBalance().call()
-            return Decimal(self.web3.from_wei(balance_wei, 'ether'))
+            chain_state = await self._refresh_chain_state(self._balance_ttl)
+            return Decimal(chain_state["balance_wei"]).scaleb(-18)
         except Exception as e:
-            print(f"Error getting blockchain balance: {e}")
+            logger.error(f"Error getting blockchain balance: {e}")
             return Decimal('0')
     
+    async def _get_gas_price(self) -> int:
+        """Get gas price, cached for a short TTL across on-chain senders"""
+        chain_state = await self._refresh_chain_state(self._gas_price_ttl)
+        return chain_state["gas_price"]
+    
+    async def _get_nonce(self, address: str) -> int:
+        """Reserve next nonce for sender from the local pipeline"""
+        lock = self._nonce_locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            nonce = self._nonces.get(address)
+            if nonce is None:
+                # Seed from the batched chain state, falling back to a direct RPC
+                chain_state = await self._refresh_chain_state(self._gas_price_ttl)
+                nonce = chain_state["nonces"].get(address)
+                if nonce is None:
+                    nonce = await self.web3.eth.get_transaction_count(address, 'pending')
+            self._nonces[address] = nonce + 1
+            return nonce
+    
+    def _invalidate_nonce(self, address: str) -> None:
+        """Drop cached nonce so the next send refetches it from the node"""
+        self._nonces.pop(address, None)
+        self._chain_state["nonces"].pop(address, None)
+    
+    async def _send_transaction(self, tx: Dict[str, Any], private_key: str) -> Any:
+        """Sign and send transaction, retrying once with a fresh nonce if it was too low"""
+        address = tx['from']
+        try:
+            signed_tx = await self._sign_transaction(tx, private_key)
+            return await self.web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            # A failed send leaves a gap in the local pipeline either way
+            self._invalidate_nonce(address)
+            if "nonce too low" not in str(e).lower():
+                raise
+        
+        tx['nonce'] = await self._get_nonce(address)
+        try:
+            signed_tx = await self._sign_transaction(tx, private_key)
+            return await self.web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception:
+            self._invalidate_nonce(address)
+            raise
+    
+    async def _refresh_chain_state(self, ttl: float) -> Dict[str, Any]:
+        """Refresh balance, gas price and signer nonces if older than ttl"""
+        self._chain_state = await self._cached_chain_read("chain_state", ttl, self._fetch_chain_state)
+        return self._chain_state
+    
+    async def _fetch_chain_state(self) -> Dict[str, Any]:
+        """Fetch balance, gas price and signer nonces in one JSON-RPC batch"""
+        signers = list(self.approved_signers)
+        async with self.web3.batch_requests() as batch:
+            batch.add(self.treasury_contract.functions.getTreasuryBalance())
+            batch.add(self.web3.eth.gas_price)
+            for signer in signers:
+                batch.add(self.web3.eth.get_transaction_count(signer, 'pending'))
+            results = await batch.async_execute()
+        
+        return {
+            "balance_wei": results[0],
+            "gas_price": results[1],
+            "nonces": dict(zip(signers, results[2:]))
+        }
+    
+    async def _sign_transaction(self, tx: Dict[str, Any], private_key: str) -> Any:
+        """Sign transaction on the signing executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._signing_executor,
+            functools.partial(self.web3.eth.account.sign_transaction, tx, private_key)
+        )
+    
+    async def _cached_chain_read(self, key: str, ttl: float, fetch) -> Any:
+        """Return cached chain value or coalesce concurrent refreshes into one RPC"""
+        cached = self._chain_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        
+        inflight = self._chain_inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            # The leader was cancelled before its fetch finished; take over the refresh
+            return await self._cached_chain_read(key, ttl, fetch)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._chain_inflight[key] = future
+        try:
+            value = await fetch()
+            self._chain_cache[key] = (time.monotonic(), value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            # A cancelled leader leaves the future pending; cancel it so followers do not hang
+            if not future.done():
+                future.cancel()
+            del self._chain_inflight[key]
+    
     async def _create_on_chain_proposal(self, transaction: TreasuryTransaction, private_key: str) -> str:
         """Create proposal on blockchain"""
         try:
             account = Account.from_key(private_key)
+            gas_price = await self._get_gas_price()
+            nonce = await self._get_nonce(account.address)
             
             # Prepare transaction
-            tx = self.treasury_contract.functions.proposeTransaction(
+            tx = await self.treasury_contract.functions.proposeTransaction(
                 transaction.recipient_address,
-                int(transaction.amount * 10**18),  # Convert to wei
-                list(SpendingCategory).index(transaction.category),
+                transaction.amount_wei,
+                _CAT2INT[transaction.category],
                 transaction.description
             ).build_transaction({
                 'from': account.address,
-                'nonce': self.web3.eth.get_transaction_count(account.address),
+                'nonce': nonce,
                 'gas': 200000,
-                'gasPrice': self.web3.eth.gas_price
+                'gasPrice': gas_price
             })
             
             # Sign and send
-            signed_tx = self.web3.eth.account.sign_transaction(tx, private_key)
-            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            tx_hash = await self._send_transaction(tx, private_key)
             
             return tx_hash.hex()
             
         except Exception as e:
-            print(f"Error creating on-chain proposal: {e}")
+            logger.error(f"Error creating on-chain proposal: {e}")
             return ""
     
     async def _create_on_chain_approval(self, transaction_id: str, status: str, private_key: str) -> str:
@@ -931,31 +1402,28 @@ class TreasuryManagementSystem:
             # Get transaction ID from contract
             # This is simplified - in real implementation, you'd get the contract transaction ID
             contract_tx_id = 0
+            gas_price = await self._get_gas_price()
+            nonce = await self._get_nonce(account.address)
             
             # Prepare transaction
             if status.lower() == "approved":
-                tx = self.multi_sig_contract.functions.confirmTransaction(contract_tx_id).build_transaction({
-                    'from': account.address,
-                    'nonce': self.web3.eth.get_transaction_count(account.address),
-                    'gas': 100000,
-                    'gasPrice': self.web3.eth.gas_price
-                })
+                contract_call = self.multi_sig_contract.functions.confirmTransaction(contract_tx_id)
             else:
-                tx = self.multi_sig_contract.functions.revokeConfirmation(contract_tx_id).build_transaction({
-                    'from': account.address,
-                    'nonce': self.web3.eth.get_transaction_count(account.address),
-                    'gas': 100000,
-                    'gasPrice': self.web3.eth.gas_price
-                })
+                contract_call = self.multi_sig_contract.functions.revokeConfirmation(contract_tx_id)
+            tx = await contract_call.build_transaction({
+                'from': account.address,
+                'nonce': nonce,
+                'gas': 100000,
+                'gasPrice': gas_price
+            })
             
             # Sign and send
-            signed_tx = self.web3.eth.account.sign_transaction(tx, private_key)
-            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            tx_hash = await self._send_transaction(tx, private_key)
             
             return tx_hash.hex()
             
         except Exception as e:
-            print(f"Error creating on-chain approval: {e}")
+            logger.error(f"Error creating on-chain approval: {e}")
             return ""
     
     async def _execute_on_chain_transaction(self, transaction_id: str, private_key: str) -> str:
@@ -966,44 +1434,224 @@ class TreasuryManagementSystem:
             # Get transaction from contract
             # This is simplified - in real implementation, you'd get the contract transaction ID
             contract_tx_id = 0
+            gas_price = await self._get_gas_price()
+            nonce = await self._get_nonce(account.address)
             
             # Prepare transaction
-            tx = self.treasury_contract.functions.executeTransaction(contract_tx_id).build_transaction({
+            tx = await self.treasury_contract.functions.executeTransaction(contract_tx_id).build_transaction({
                 'from': account.address,
-                'nonce': self.web3.eth.get_transaction_count(account.address),
+                'nonce': nonce,
                 'gas': 200000,
-                'gasPrice': self.web3.eth.gas_price
+                'gasPrice': gas_price
             })
             
             # Sign and send
-            signed_tx = self.web3.eth.account.sign_transaction(tx, private_key)
-            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            tx_hash = await self._send_transaction(tx, private_key)
             
             return tx_hash.hex()
             
         except Exception as e:
-            print(f"Error executing on-chain transaction: {e}")
+            logger.error(f"Error executing on-chain transaction: {e}")
             return ""
     
     async def _upload_to_ipfs(self, data: Dict[str, Any]) -> str:
         """Upload data to IPFS"""
         try:
-            json_data = json.dumps(data, ensure_ascii=False)
-            result = self.ipfs_client.add_json(json_data)
-            return result
+            if self._ipfs_upload_task is None or self._ipfs_upload_task.done():
+                self._ipfs_upload_task = asyncio.create_task(self._ipfs_upload_loop())
+                self._background_tasks.append(self._ipfs_upload_task)
+            
+            future = asyncio.get_running_loop().create_future()
+            await self._ipfs_queue.put((data, future))
+            return await future
         except Exception as e:
-            print(f"IPFS upload error: {e}")
+            logger.error(f"IPFS upload error: {e}")
             return ""
     
+    async def _ipfs_upload_loop(self) -> None:
+        """Flush queued IPFS documents in batches of up to 16 or every 500ms"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._ipfs_queue.get()]
+            deadline = loop.time() + self._ipfs_batch_window
+            while len(batch) < self._ipfs_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                # asyncio.timeout keeps a cancel that lands as a document arrives (wait_for drops it)
+                try:
+                    async with asyncio.timeout(timeout):
+                        batch.append(await self._ipfs_queue.get())
+                except TimeoutError:
+                    break
+            
+            try:
+                hashes = await self._add_ipfs_batch([data for data, _ in batch])
+                for (_, future), ipfs_hash in zip(batch, hashes):
+                    if not future.done():
+                        future.set_result(ipfs_hash)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    async def _add_ipfs_batch(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """Add documents to IPFS with one multipart /api/v0/add request"""
+        form_data = aiohttp.FormData()
+        for i, document in enumerate(documents):
+            form_data.add_field(
+                'file',
+                orjson.dumps(document, default=_json_default),
+                filename=f"{i}.json",
+                content_type='application/json'
+            )
+        
+        async with self._get_http_session().post(
+            f"{self.ipfs_api_url}/add",
+            params={"pin": "true", "cid-version": "1", "wrap-with-directory": "false"},
+            data=form_data,
+            timeout=aiohttp.ClientTimeout(total=60)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"IPFS upload failed: {response.status} - {error_text}")
+            
+            # Response is one JSON object per added file
+            hashes_by_name = {}
+            async for line in response.content:
+                if line.strip():
+                    entry = orjson.loads(line)
+                    hashes_by_name[entry["Name"]] = entry["Hash"]
+        
+        return [hashes_by_name.get(f"{i}.json", "") for i in range(len(documents))]
+    
     async def _load_existing_transactions(self) -> None:
         """Load existing transactions"""
-        # Implementation depends on storage mechanism
-        pass
+        # Transactions, their approvals and the send WAL come back in one round trip
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._transactions_key)
+            pipe.hgetall(self._approvals_key)
+            pipe.hgetall(self._send_wal_key)
+            transaction_rows, approval_rows, send_wal_rows = await pipe.execute()
+        in_flight = {
+            transaction_id.decode() if isinstance(transaction_id, bytes) else transaction_id
+            for transaction_id in send_wal_rows
+        }
+        
+        # Single pass: restore open transactions and seed the incremental metric counters
+        for row in transaction_rows.values():
+            transaction = self._hydrate_transaction(orjson.loads(row))
+            transaction_id = transaction.transaction_id
+            raw_approvals = approval_rows.get(transaction_id.encode())
+            approvals = [
+                self._hydrate_approval(approval_row) for approval_row in orjson.loads(raw_approvals)
+            ] if raw_approvals else []
+            
+            for approval in approvals:
+                if approval.approval_status.lower() == "approved":
+                    self._approval_totals["approved"] += 1
+                else:
+                    self._approval_totals["rejected"] += 1
+            self._approval_totals["total"] += len(approvals)
+            
+            if transaction.status == TransactionStatus.EXECUTED:
+                self._record_executed_amount(transaction.amount)
+                # Settled executions stay in Redis only; in-flight sends are reconciled by _recover_send_queue
+                if transaction_id in in_flight:
+                    self.transactions[transaction_id] = transaction
+                    self.approvals[transaction_id] = approvals
+                else:
+                    self._unloaded_count += 1
+                continue
+            if transaction.status not in (TransactionStatus.PENDING, TransactionStatus.APPROVED):
+                self._unloaded_count += 1
+                continue
+            
+            self.transactions[transaction_id] = transaction
+            self.approvals[transaction_id] = approvals
+            
+            if transaction.status == TransactionStatus.PENDING:
+                self.pending_transactions.add(transaction_id)
+                heapq.heappush(self._deadline_heap, (transaction.execution_deadline, transaction_id))
+            else:
+                self.approved_transactions.add(transaction_id)
     
     async def _load_existing_budgets(self) -> None:
         """Load existing budgets"""
-        # Implementation depends on storage mechanism
-        pass
+        budget_rows = await self.redis_client.hgetall(self._budgets_key)
+        budgets = [self._hydrate_budget(orjson.loads(row)) for row in budget_rows.values()]
+        
+        now = datetime.now()
+        for budget in budgets:
+            self.budgets[budget.budget_id] = budget
+            if budget.is_active and budget.period_start <= now <= budget.period_end:
+                self._active_budget_by_category[budget.category] = budget
+    
+    async def _save_state(self) -> None:
+        """Persist transactions, approvals and budgets in one pipelined write"""
+        async with self._metrics_rwlock.read():
+            transaction_rows = {
+                tx_id: self._transaction_to_json(tx)
+                for tx_id, tx in self.transactions.items()
+            }
+            approval_rows = {
+                tx_id: orjson.dumps(approvals, default=_json_default)
+                for tx_id, approvals in self.approvals.items()
+            }
+            budget_rows = {
+                budget_id: orjson.dumps(budget, default=_json_default)
+                for budget_id, budget in self.budgets.items()
+            }
+        
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key, rows in (
+                (self._transactions_key, transaction_rows),
+                (self._approvals_key, approval_rows),
+                (self._budgets_key, budget_rows)
+            ):
+                if rows:
+                    pipe.hset(key, mapping=rows)
+            await pipe.execute()
+    
+    @staticmethod
+    def _transaction_to_json(transaction: TreasuryTransaction) -> bytes:
+        """Serialize a TreasuryTransaction for Redis"""
+        row = {name: getattr(transaction, name) for name in TreasuryTransaction.__slots__}
+        # Wei amounts overflow orjson's 64-bit integers above ~18.4 tokens, so store them as a string
+        row["amount_wei"] = str(transaction.amount_wei)
+        return orjson.dumps(row, default=_json_default)
+    
+    @staticmethod
+    def _hydrate_transaction(row: Dict[str, Any]) -> TreasuryTransaction:
+        """Build a TreasuryTransaction from its persisted JSON record"""
+        row["amount_wei"] = int(row.get("amount_wei", 0))
+        row["transaction_type"] = TransactionType(row["transaction_type"])
+        row["amount"] = Decimal(row["amount"])
+        row["category"] = SpendingCategory(row["category"])
+        row["requested_at"] = datetime.fromisoformat(row["requested_at"])
+        row["status"] = TransactionStatus(row["status"])
+        if row.get("execution_deadline"):
+            row["execution_deadline"] = datetime.fromisoformat(row["execution_deadline"])
+        return TreasuryTransaction(**row)
+    
+    @staticmethod
+    def _hydrate_approval(row: Dict[str, Any]) -> TreasuryApproval:
+        """Build a TreasuryApproval from its persisted JSON record"""
+        row["approval_timestamp"] = datetime.fromisoformat(row["approval_timestamp"])
+        return TreasuryApproval(**row)
+    
+    @staticmethod
+    def _hydrate_budget(row: Dict[str, Any]) -> TreasuryBudget:
+        """Build a TreasuryBudget from its persisted JSON record"""
+        # Derived fields are recomputed in __post_init__
+        row.pop("remaining_amount", None)
+        row.pop("category_int", None)
+        row["category"] = SpendingCategory(row["category"])
+        row["period_start"] = datetime.fromisoformat(row["period_start"])
+        row["period_end"] = datetime.fromisoformat(row["period_end"])
+        for name in ("allocated_amount", "spent_amount", "approval_threshold", "warning_threshold"):
+            row[name] = Decimal(row[name])
+        return TreasuryBudget(**row)
     
     async def _get_daily_spending(self, date: datetime.date) -> Decimal:
         """Get daily spending amount"""
@@ -1020,27 +1668,73 @@ class TreasuryManagementSystem:
         # Implementation depends on transaction history
         return Decimal('0')
     
-    async def _treasury_monitoring_loop(self) -> None:
-        """Monitoring loop for treasury"""
+    async def _metrics_refresh_loop(self) -> None:
+        """Monitoring loop for treasury metrics"""
+        backoff = self._error_backoff_initial
         while True:
             try:
-                await self._process_pending_transactions()
-                await self._check_expired_transactions()
+                await asyncio.sleep(300)  # Refresh every 5 minutes
                 await self._update_treasury_metrics()
-                await asyncio.sleep(300)  # Check every 5 minutes
-            except Exception as e:
-                print(f"Treasury monitoring error: {e}")
-                await asyncio.sleep(60)
+                await self._save_state()
+                backoff = self._error_backoff_initial
+            except Exception:
+                logger.exception("Treasury metrics monitoring error")
+                backoff = await self._sleep_with_backoff(backoff)
+    
+    async def _expiry_loop(self) -> None:
+        """Expire transactions when the earliest deadline passes"""
+        backoff = self._error_backoff_initial
+        while True:
+            try:
+                await self._check_expired_transactions()
+                backoff = self._error_backoff_initial
+                
+                # Sleep until the next deadline or until a new proposal arrives
+                self._deadline_event.clear()
+                timeout = None
+                if self._deadline_heap:
+                    remaining = (self._deadline_heap[0][0] - datetime.now()).total_seconds()
+                    timeout = max(remaining, self._expiry_min_wait)
+                # asyncio.timeout rather than wait_for: on 3.11 wait_for drops a cancel that lands
+                # just after the event is set, which left shutdown waiting on this loop forever
+                try:
+                    async with asyncio.timeout(timeout):
+                        await self._deadline_event.wait()
+                except TimeoutError:
+                    pass
+            except Exception:
+                logger.exception("Treasury expiry monitoring error")
+                backoff = await self._sleep_with_backoff(backoff)
+    
+    async def _pending_processor_loop(self) -> None:
+        """Process pending transactions when an approval makes one executable"""
+        backoff = self._error_backoff_initial
+        while True:
+            try:
+                await self._execution_ready_event.wait()
+                self._execution_ready_event.clear()
+                await self._process_pending_transactions()
+                backoff = self._error_backoff_initial
+            except Exception:
+                logger.exception("Treasury pending processor error")
+                backoff = await self._sleep_with_backoff(backoff)
     
     async def _budget_monitoring_loop(self) -> None:
         """Monitoring loop for budgets"""
+        backoff = self._error_backoff_initial
         while True:
             try:
                 await self._check_budget_alerts()
+                backoff = self._error_backoff_initial
                 await asyncio.sleep(3600)  # Check every hour
-            except Exception as e:
-                print(f"Budget monitoring error: {e}")
-                await asyncio.sleep(300)
+            except Exception:
+                logger.exception("Budget monitoring error")
+                backoff = await self._sleep_with_backoff(backoff)
+    
+    async def _sleep_with_backoff(self, backoff: float) -> float:
+        """Sleep for backoff plus up to 20% jitter and return the next, doubled backoff"""
+        await asyncio.sleep(backoff + random.random() * backoff * 0.2)
+        return min(backoff * 2, self._error_backoff_max)
     
     async def _process_pending_transactions(self) -> None:
         """Process pending transactions"""
@@ -1050,24 +1744,40 @@ class TreasuryManagementSystem:
     async def _check_expired_transactions(self) -> None:
         """Check and handle expired transactions"""
         now = datetime.now()
-        for transaction_id in list(self.pending_transactions):
-            if transaction_id in self.transactions:
-                transaction = self.transactions[transaction_id]
-                if now > transaction.execution_deadline:
-                    transaction.status = TransactionStatus.EXPIRED
-                    self.pending_transactions.remove(transaction_id)
+        heap = self._deadline_heap
+        if not heap or heap[0][0] >= now:
+            return
+        
+        async with self._metrics_rwlock.write():
+            while heap and heap[0][0] < now:
+                _, transaction_id = heapq.heappop(heap)
+                # Entries for transactions that already left the pending queue are skipped
+                if transaction_id in self.pending_transactions:
+                    self.transactions[transaction_id].status = TransactionStatus.EXPIRED
+                    self.pending_transactions.discard(transaction_id)
     
     async def _check_budget_alerts(self) -> None:
         """Check budget utilization and send alerts"""
+        # Re-resolve categories whose indexed budget ended or was deactivated
+        now = datetime.now()
+        for category, budget in list(self._active_budget_by_category.items()):
+            if not budget.is_active or now > budget.period_end:
+                self._active_budget_by_category.pop(category)
+                for candidate in self.budgets.values():
+                    if (candidate.category == category and
+                        candidate.is_active and
+                        candidate.period_start <= now <= candidate.period_end):
+                        self._active_budget_by_category[category] = candidate
+                        break
+        
         for budget in self.budgets.values():
             if budget.is_active and budget.allocated_amount > 0:
-                utilization_rate = float(budget.spent_amount / budget.allocated_amount)
-                
-                if utilization_rate >= float(budget.warning_threshold):
-                    print(f"⚠️ Budget alert: {budget.category.value} utilization at {utilization_rate:.1%}")
+                if budget.spent_amount >= budget.warning_threshold:
+                    utilization_rate = budget.spent_amount / budget.allocated_amount
+                    logger.warning(f"Budget alert: {_INT2CAT_NAME[budget.category_int]} utilization at {utilization_rate:.1%}")
                 
-                if utilization_rate >= 1.0:
-                    print(f"🚨 Budget exceeded: {budget.category.value}")
+                if budget.spent_amount >= budget.allocated_amount:
+                    logger.error(f"Budget exceeded: {_INT2CAT_NAME[budget.category_int]}")
 
 
 # Example usage and testing
@@ -1174,13 +1884,14 @@ async def test_treasury_management():
     # Get treasury status
     status_result = await treasury.get_treasury_status()
     if status_result["success"]:
-        print(f"📊 Treasury Status: {json.dumps(status_result['treasury_status'], indent=2)}")
+        print(f"📊 Treasury Status: {orjson.dumps(status_result['treasury_status'], option=orjson.OPT_INDENT_2).decode()}")
     
     # Get budget report
     budget_report = await treasury.get_budget_report()
     if budget_report["success"]:
-        print(f"📈 Budget Report: {json.dumps(budget_report['summary'], indent=2)}")
+        print(f"📈 Budget Report: {orjson.dumps(budget_report['summary'], option=orjson.OPT_INDENT_2).decode()}")
     
+    await treasury.shutdown()
     print("\n🎉 Treasury management test completed!")
 
 
@@ -3,22 +3,205 @@ SANGKURIANG Voting Mechanism with Smart Contracts
 Implementasi mekanisme voting menggunakan smart contracts untuk keamanan dan transparansi
 """
 
+import contextvars
+import functools
 import json
+import logging
+import os
 import time
 import hashlib
-from typing import Dict, List, Optional, Any, Tuple
+import heapq
+import threading
+from typing import Dict, List, Optional, Any, Tuple, Set, Callable, Awaitable
 from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime, timedelta
+from decimal import Decimal
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
 from web3 import Web3
+from web3.providers import HTTPProvider
+from web3.types import RPCEndpoint, RPCResponse
 from eth_account import Account
 from eth_account.messages import encode_defunct
+from eth_account.signers.local import LocalAccount
 from web3.contract import Contract
 import asyncio
 import aiohttp
+import requests
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 import redis.asyncio as redis
+import numpy as np
+import orjson
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)")
+WEI_PER_TOKEN = 10**18
+
+# On-chain uint8 codes of the standard vote options; anything else maps to 0
+_VOTE_OPTION_UINT = {"yes": 1, "no": 2, "abstain": 3, "veto": 4}
+
+# On-chain uint8 codes of the governance proposal types; unknown types map to 0
+_PROPOSAL_TYPE_UINT = {"general": 1, "parameter_change": 2, "treasury_spend": 3, "upgrade_contract": 4}
+# Raw token balances prefetched through Multicall3 for the calculation running in the current
+# task: function name -> address -> balance in wei. Concurrent cast_vote calls each get their own.
+_BALANCE_SNAPSHOT: contextvars.ContextVar[Optional[Dict[str, Dict[str, int]]]] = contextvars.ContextVar(
+    "balance_snapshot", default=None
+)
+# "power" holds exact wei totals as Python ints; "qpower" is the square-root tally in token units
+OPTION_RESULT_DTYPE = np.dtype([
+    ("votes", np.int32), ("power", object), ("qpower", np.float64), ("pct", np.float64)
+])
+
+
+def _scale_wei(amount: int, factor: float) -> int:
+    """Scale integer wei amount by a fractional factor without going through float"""
+    return int(Decimal(amount) * Decimal(str(factor)))
+
+# Small sessions stay on np.bincount; the JIT kernel pays off from about a thousand votes
+NUMBA_TALLY_MIN_VOTES = 1_000
+
+
+def _tally_kernel_py(options: np.ndarray, token_powers: np.ndarray, n_opts: int):
+    """Vote counts and square-root token power totals per option in one scan"""
+    counts = np.zeros(n_opts, dtype=np.int64)
+    qtotals = np.zeros(n_opts, dtype=np.float64)
+    for i in range(len(options)):
+        option = options[i]
+        counts[option] += 1
+        qtotals[option] += np.sqrt(token_powers[i])
+    return counts, qtotals
+
+
+# prange would race on the shared per-option accumulators, so the kernel is a single serial pass
+_tally_kernel = numba.njit(cache=True)(_tally_kernel_py) if NUMBA_AVAILABLE else None
+
+
+def _tally_columns(options: np.ndarray, powers: np.ndarray, n_opts: int, quadratic: bool = False):
+    """Per-option counts, exact wei totals and (quadratic only) square-root token totals"""
+    # Wei amounts pass the int64 range at about 9.2 tokens, so totals accumulate Python ints
+    totals = np.zeros(n_opts, dtype=object)
+    np.add.at(totals, options, powers)
+    if not quadratic:
+        return np.bincount(options, minlength=n_opts), totals, None
+    
+    token_powers = powers.astype(np.float64) / WEI_PER_TOKEN
+    if _tally_kernel is not None and len(options) >= NUMBA_TALLY_MIN_VOTES:
+        counts, qtotals = _tally_kernel(options, token_powers, n_opts)
+    else:
+        counts = np.bincount(options, minlength=n_opts)
+        qtotals = np.bincount(options, weights=np.sqrt(token_powers), minlength=n_opts)
+    return counts, totals, qtotals
+
+
+@functools.lru_cache(maxsize=1024)
+def _account_from_key(private_key: str) -> LocalAccount:
+    """Local account for a private key; the secp256k1 public key derivation runs once per key"""
+    return Account.from_key(private_key)
+
+
+def _sign_worker(tx_dict: Dict[str, Any], private_key: str) -> bytes:
+    """Sign transaction in a worker process and return the raw transaction"""
+    return _account_from_key(private_key).sign_transaction(tx_dict).raw_transaction
+
+
+class BatchingHTTPProvider(HTTPProvider):
+    """HTTP provider yang menggabungkan request dalam satu window menjadi satu JSON-RPC batch"""
+    
+    def __init__(self, endpoint_uri: Optional[str] = None, wait_ms: float = 10, **kwargs: Any):
+        super().__init__(endpoint_uri, **kwargs)
+        self.wait_ms = wait_ms
+        self._batch_lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        # One keep-alive session for every RPC, so TCP/TLS handshakes happen once per connection
+        self._http_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        self._http_session.mount("http://", adapter)
+        self._http_session.mount("https://", adapter)
+        self._batch_supported = True  # cleared if the endpoint rejects JSON-RPC batches
+    
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        slot = {
+            "request": {"jsonrpc": "2.0", "method": method, "params": params, "id": next(self.request_counter)},
+            "done": threading.Event(),
+            "response": None
+        }
+        with self._batch_lock:
+            self._pending.append(slot)
+            is_leader = len(self._pending) == 1
+        
+        if is_leader:
+            # The first caller of a window flushes it. Calls made directly on the event loop
+            # thread are flushed immediately, since nothing else can join while it blocks.
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                time.sleep(self.wait_ms / 1000)
+            self._flush()
+        
+        slot["done"].wait()
+        if isinstance(slot["response"], Exception):
+            raise slot["response"]
+        return slot["response"]
+    
+    def _flush(self) -> None:
+        """Send all queued requests as one POST and resolve them by id"""
+        with self._batch_lock:
+            batch, self._pending = self._pending, []
+        
+        try:
+            payload = [slot["request"] for slot in batch]
+            responses = None
+            if len(payload) > 1 and self._batch_supported:
+                try:
+                    responses = self._post(payload)
+                except requests.HTTPError as e:
+                    # Some providers disable batching; fall back to one request per call from now on
+                    if e.response is None or e.response.status_code != 400:
+                        raise
+                    self._batch_supported = False
+            if responses is None:
+                responses = [self._post(request) for request in payload]
+            if isinstance(responses, dict):
+                responses = [responses]
+            
+            responses_by_id = {response.get("id"): response for response in responses}
+            for slot in batch:
+                request_id = slot["request"]["id"]
+                slot["response"] = responses_by_id.get(request_id) or {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {"code": -32603, "message": "Missing response in batch"}
+                }
+        except Exception as e:
+            for slot in batch:
+                slot["response"] = e
+        finally:
+            for slot in batch:
+                slot["done"].set()
+    
+    def close(self) -> None:
+        """Close pooled HTTP connections"""
+        self._http_session.close()
+    
+    def _post(self, payload: Any) -> Any:
+        """POST one JSON-RPC request or batch and return the decoded response"""
+        response = self._http_session.post(
+            self.endpoint_uri, data=json.dumps(payload), **dict(self.get_request_kwargs())
+        )
+        response.raise_for_status()
+        return response.json()
 
 
 class VoteWeightStrategy(Enum):
@@ -66,6 +249,14 @@ class VotingSession:
     allow_abstention: bool = True
     allow_veto: bool = True
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # createProposal arguments, derived once per session
+    voting_period_seconds: int = 0
+    vote_option_labels: Tuple[str, ...] = ()
+    
+    def __post_init__(self):
+        if not self.voting_period_seconds:
+            self.voting_period_seconds = int((self.end_time - self.start_time).total_seconds())
+        self.vote_option_labels = tuple(option.label for option in self.vote_options)
 
 
 @dataclass
@@ -75,7 +266,7 @@ class VoteRecord:
     proposal_id: str
     session_id: str
     vote_option_id: str
-    voting_power: float
+    voting_power: int  # wei
     conviction_multiplier: float = 1.0
     timestamp: datetime = field(default_factory=datetime.now)
     transaction_hash: Optional[str] = None
@@ -94,6 +285,13 @@ class VoteDelegation:
     end_time: Optional[datetime] = None
     is_active: bool = True
     transaction_hash: Optional[str] = None
+    end_ts: int = 0  # end_time as unix seconds, for integer comparisons in tally loops
+    
+    def __post_init__(self):
+        if self.end_time is not None and not self.end_ts:
+            self.end_ts = int(self.end_time.timestamp())
+        # delegateVote argument, mapped once at creation
+        self._proposal_types_uint = tuple(_PROPOSAL_TYPE_UINT.get(t, 0) for t in self.proposal_types)
 
 
 @dataclass
@@ -109,6 +307,83 @@ class VotingResult:
     is_passed: bool = False
     execution_ready: bool = False
     finalization_time: Optional[datetime] = None
+    # Tallies fill a structured array (OPTION_RESULT_DTYPE) by option index; the per-option dicts
+    # are only built by option_results() at the API boundary
+    option_ids: List[str] = field(default_factory=list)
+    option_table: Optional[np.ndarray] = None
+    quadratic: bool = False
+    
+    def option_results(self) -> Dict[str, Dict[str, float]]:
+        """Hasil per opsi dalam bentuk dict"""
+        if self.option_table is None:
+            return self.results_by_option
+        
+        table = self.option_table
+        results = {}
+        for i, option_id in enumerate(self.option_ids):
+            row = {"votes": int(table["votes"][i]), "voting_power": table["power"][i] / WEI_PER_TOKEN}
+            if self.quadratic:
+                row["quadratic_power"] = float(table["qpower"][i])
+            row["percentage"] = float(table["pct"][i])
+            results[option_id] = row
+        return results
+    
+    def option_voting_power(self, option_id: str) -> float:
+        """Voting power untuk satu opsi"""
+        if self.option_table is None:
+            return self.results_by_option[option_id]["voting_power"]
+        return self.option_table["power"][self.option_ids.index(option_id)] / WEI_PER_TOKEN
+
+
+class VoteColumns:
+    """Penyimpanan vote kolumnar (SoA) per sesi untuk tally"""
+    
+    def __init__(self, capacity: int = 64):
+        self.size = 0
+        self.powers = np.zeros(capacity, dtype=object)  # wei as Python ints
+        self.options = np.zeros(capacity, dtype=np.int32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.addresses: List[str] = []
+        self.latest_row: Dict[str, int] = {}  # lowercased voter -> row of latest vote
+    
+    def append(self, address: str, option_idx: int, power: int, timestamp: float) -> int:
+        """Append a vote row, superseding the voter's previous row"""
+        if self.size == len(self.powers):
+            self._grow()
+        
+        row = self.size
+        self.powers[row] = power
+        self.options[row] = option_idx
+        self.timestamps[row] = timestamp
+        self.active[row] = True
+        self.addresses.append(address)
+        
+        voter_key = address.lower()
+        previous_row = self.latest_row.get(voter_key)
+        if previous_row is not None:
+            self.active[previous_row] = False
+        self.latest_row[voter_key] = row
+        
+        self.size += 1
+        return row
+    
+    def deactivate(self, row: int) -> None:
+        """Exclude a row from tallies"""
+        self.active[row] = False
+    
+    def tally_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Option index and voting power arrays of active rows"""
+        mask = self.active[:self.size]
+        return self.options[:self.size][mask], self.powers[:self.size][mask]
+    
+    def _grow(self) -> None:
+        capacity = len(self.powers) * 2
+        for name in ("powers", "options", "timestamps", "active"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
 
 
 class SmartContractVotingEngine:
@@ -120,9 +395,10 @@ class SmartContractVotingEngine:
         governance_contract_address: str,
         voting_contract_address: str,
         token_contract_address: str,
+        token_deploy_block: int,
         redis_url: str = "redis://localhost:6379"
     ):
-        self.web3 = Web3(Web3.HTTPProvider(web3_provider))
+        self.web3 = Web3(BatchingHTTPProvider(web3_provider, wait_ms=10))
         self.governance_contract_address = governance_contract_address
         self.voting_contract_address = voting_contract_address
         self.token_contract_address = token_contract_address
@@ -132,6 +408,7 @@ class SmartContractVotingEngine:
         self.governance_abi = self._load_governance_abi()
         self.voting_abi = self._load_voting_abi()
         self.token_abi = self._load_token_abi()
+        self.multicall_abi = self._load_multicall_abi()
         
         # Initialize contracts
         self.governance_contract = self.web3.eth.contract(
@@ -149,19 +426,72 @@ class SmartContractVotingEngine:
             abi=self.token_abi
         )
         
+        self.multicall_contract = self.web3.eth.contract(
+            address=MULTICALL3_ADDRESS,
+            abi=self.multicall_abi
+        )
+        
+        # Write functions resolved against their ABI entries once; calls skip overload resolution
+        self._create_proposal_fn = self.governance_contract.get_function_by_signature(
+            "createProposal(bytes32,string,uint256,string[])"
+        )
+        self._cast_vote_fn = self.voting_contract.get_function_by_signature("castVote(bytes32,uint8,uint256)")
+        self._delegate_vote_fn = self.voting_contract.get_function_by_signature("delegateVote(address,address,uint8[])")
+        
+        # 4-byte selectors of the hot (address) -> uint256 token getters
+        self._selectors: Dict[str, bytes] = {
+            fn_name: bytes(Web3.keccak(text=f"{fn_name}(address)")[:4])
+            for fn_name in ("balanceOf", "getStakedBalance")
+        }
+        
         # Active voting sessions
         self.active_sessions: Dict[str, VotingSession] = {}
         self.vote_records: Dict[str, List[VoteRecord]] = {}
+        self.vote_index: Dict[str, Dict[str, VoteRecord]] = {}  # session -> lowercased voter -> latest vote
+        self.vote_columns: Dict[str, VoteColumns] = {}  # session -> columnar copy of vote_records for tallies
+        self._tally_fns: Dict[str, Callable[[List[VoteRecord]], Awaitable[VotingResult]]] = {}
+        self._session_keys: Dict[str, bytes] = {}  # session id -> on-chain proposal id bytes
         self.delegations: Dict[str, List[VoteDelegation]] = {}
+        self.delegations_by_delegate: Dict[str, List[VoteDelegation]] = {}  # lowercased delegate -> delegations
+        self._delegation_expiry_heap: List[Tuple[int, int, VoteDelegation]] = []
+        # Delegated power per session for the whole delegation graph, as (delegation version,
+        # computed at, lowercased address -> wei received, lowercased address -> wei passed on);
+        # rebuilt when delegations change
+        self._delegation_version = 0
+        self._delegated_power: Dict[str, Tuple[int, float, Dict[str, int], Dict[str, int]]] = {}
+        self._delegated_power_ttl = 300
+        self._delegation_alpha = 1.0  # per-hop decay (viscous democracy); 1.0 passes power on undamped
+        self._expiry_heap: List[Tuple[float, str]] = []  # (end_time timestamp, session_id)
+        self._expiry_wakeup = asyncio.Event()
+        self._finalize_retry_delay = 60.0
+        self._monitoring_task: Optional[asyncio.Task] = None
+        self._finalize_semaphore = asyncio.Semaphore(16)  # bound concurrent finalizations hitting the RPC
+        
+        # secp256k1 signing is CPU-bound pure Python; keep it off the event loop
+        self._sign_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        
+        # Gas price barely moves within a block; bursts of broadcasts share one read
+        self._gas_price_cache: Tuple[float, int] = (0.0, 0)  # (monotonic time, wei)
+        self._gas_price_ttl = 6.0
+        
+        # Eligible voting power only moves with token transfers; cache it between result queries
+        self._eligible_power_ttl = 300
+        
+        # Token balances are snapshotted at session start into power:{sid} / staked_power:{sid}
+        self._power_snapshot_sessions: Set[str] = set()
+        self._snapshot_tasks: Dict[str, asyncio.Task] = {}
+        self._known_holders: Set[str] = set()
+        self._holders_scanned_to: int = -1
+        self._token_deploy_block = token_deploy_block  # holder scans and block searches start here
+        self._log_chunk_size: int = 10_000
+        self._snapshot_batch_size: int = 500
         
-        # Voting strategies configuration
+        # Voting strategies configuration; super majority tallies like simple majority and only
+        # differs in the approval threshold _evaluate_proposal_outcome applies
         self.voting_strategies = {
             VotingMechanism.SIMPLE_MAJORITY: self._simple_majority_calculation,
-            VotingMechanism.SUPER_MAJORITY: self._super_majority_calculation,
-            VotingMechanism.QUADRATIC_VOTING: self._quadratic_voting_calculation,
-            VotingMechanism.LIQUID_DEMOCRACY: self._liquid_democracy_calculation,
-            VotingMechanism.TIME_WEIGHTED_VOTING: self._time_weighted_calculation,
-            VotingMechanism.CONVICTION_VOTING: self._conviction_voting_calculation
+            VotingMechanism.SUPER_MAJORITY: self._simple_majority_calculation,
+            VotingMechanism.QUADRATIC_VOTING: self._quadratic_voting_calculation
         }
         
         self.weight_strategies = {
@@ -258,6 +588,37 @@ class SmartContractVotingEngine:
             }
         ]
     
+    def _load_multicall_abi(self) -> List[Dict[str, Any]]:
+        """Load Multicall3 tryAggregate ABI"""
+        return [
+            {
+                "inputs": [
+                    {"name": "requireSuccess", "type": "bool"},
+                    {
+                        "components": [
+                            {"name": "target", "type": "address"},
+                            {"name": "callData", "type": "bytes"}
+                        ],
+                        "name": "calls",
+                        "type": "tuple[]"
+                    }
+                ],
+                "name": "tryAggregate",
+                "outputs": [
+                    {
+                        "components": [
+                            {"name": "success", "type": "bool"},
+                            {"name": "returnData", "type": "bytes"}
+                        ],
+                        "name": "returnData",
+                        "type": "tuple[]"
+                    }
+                ],
+                "stateMutability": "payable",
+                "type": "function"
+            }
+        ]
+    
     async def initialize_voting_system(self) -> bool:
         """Inisialisasi sistem voting"""
         try:
@@ -267,21 +628,35 @@ class SmartContractVotingEngine:
             
             # Test contract calls
             block_number = self.web3.eth.block_number
-            print(f"✅ Connected to blockchain at block {block_number}")
+            logger.info("Connected to blockchain at block %s", block_number)
             
             # Load existing voting sessions
             await self._load_active_sessions()
             
             # Start voting monitoring loop
-            asyncio.create_task(self._voting_monitoring_loop())
+            self._monitoring_task = asyncio.create_task(self._voting_monitoring_loop())
             
-            print("✅ Smart contract voting system initialized")
+            logger.info("Smart contract voting system initialized")
             return True
             
         except Exception as e:
-            print(f"❌ Failed to initialize voting system: {e}")
+            logger.error("Failed to initialize voting system: %s", e)
             return False
     
+    async def shutdown(self) -> None:
+        """Stop background tasks and release connections"""
+        tasks = [task for task in (self._monitoring_task, *self._snapshot_tasks.values()) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._monitoring_task = None
+        self._snapshot_tasks.clear()
+        
+        if isinstance(self.web3.provider, BatchingHTTPProvider):
+            self.web3.provider.close()
+        self._sign_pool.shutdown(wait=False)
+        await self.redis_client.close()
+    
     async def create_voting_session(
         self,
         proposal_id: str,
@@ -322,6 +697,10 @@ class SmartContractVotingEngine:
             # Store session
             self.active_sessions[session_id] = session
             self.vote_records[session_id] = []
+            self.vote_index[session_id] = {}
+            self.vote_columns[session_id] = VoteColumns()
+            self._tally_fns[session_id] = self._make_tally_fn(session)
+            self._schedule_expiry(session_id, session.end_time.timestamp())
             
             # Create on-chain proposal if private key provided
             if private_key:
@@ -330,7 +709,10 @@ class SmartContractVotingEngine:
                 )
                 session.metadata["transaction_hash"] = tx_hash
             
-            print(f"✅ Voting session created: {session_id}")
+            await self._persist_session(session)
+            self._schedule_power_snapshot(session)
+            
+            logger.info("Voting session created: %s", session_id)
             return {
                 "success": True,
                 "session_id": session_id,
@@ -346,7 +728,7 @@ class SmartContractVotingEngine:
             }
             
         except Exception as e:
-            print(f"❌ Failed to create voting session: {e}")
+            logger.error("Failed to create voting session: %s", e)
             return {
                 "success": False,
                 "error": str(e)
@@ -381,11 +763,10 @@ class SmartContractVotingEngine:
                 return {"success": False, "error": "Invalid vote option"}
             
             # Check if already voted (if vote change not allowed)
-            if not session.allow_vote_change:
-                existing_votes = self.vote_records.get(session_id, [])
-                for vote in existing_votes:
-                    if vote.voter_address.lower() == voter_address.lower():
-                        return {"success": False, "error": "Already voted"}
+            voter_key = voter_address.lower()
+            idx = self.vote_index.setdefault(session_id, {})
+            if not session.allow_vote_change and voter_key in idx:
+                return {"success": False, "error": "Already voted"}
             
             # Calculate voting power
             voting_power = await self._calculate_voting_power(
@@ -396,7 +777,7 @@ class SmartContractVotingEngine:
                 return {"success": False, "error": "No voting power available"}
             
             # Apply conviction multiplier
-            final_voting_power = voting_power * conviction_multiplier
+            final_voting_power = _scale_wei(voting_power, conviction_multiplier)
             
             # Create vote record
             vote_record = VoteRecord(
@@ -415,25 +796,30 @@ class SmartContractVotingEngine:
             )
             vote_record.transaction_hash = tx_hash
             
-            # Store vote record
+            # Store vote record; rows in vote_columns follow the order of vote_records
             if session_id not in self.vote_records:
                 self.vote_records[session_id] = []
             self.vote_records[session_id].append(vote_record)
+            idx[voter_key] = vote_record
+            self._append_vote_column(session, vote_record)
+            await self._persist_vote(vote_record)
             
-            print(f"✅ Vote cast: {voter_address} -> {vote_option_id} (power: {final_voting_power})")
+            logger.info(
+                "Vote cast: %s -> %s (power: %s)", voter_address, vote_option_id, final_voting_power / WEI_PER_TOKEN
+            )
             return {
                 "success": True,
                 "vote_record": {
                     "voter": voter_address,
                     "option": vote_option_id,
-                    "power": final_voting_power,
+                    "power": final_voting_power / WEI_PER_TOKEN,
                     "conviction": conviction_multiplier,
                     "tx_hash": tx_hash
                 }
             }
             
         except Exception as e:
-            print(f"❌ Failed to cast vote: {e}")
+            logger.error("Failed to cast vote: %s", e)
             return {
                 "success": False,
                 "error": str(e)
@@ -479,8 +865,12 @@ class SmartContractVotingEngine:
             if delegator_address not in self.delegations:
                 self.delegations[delegator_address] = []
             self.delegations[delegator_address].append(delegation)
+            self.delegations_by_delegate.setdefault(delegate_address.lower(), []).append(delegation)
+            if delegation.end_time is not None:
+                heapq.heappush(self._delegation_expiry_heap, (delegation.end_ts, id(delegation), delegation))
+            self._delegation_version += 1
             
-            print(f"✅ Voting power delegated: {delegator_address} -> {delegate_address}")
+            logger.info("Voting power delegated: %s -> %s", delegator_address, delegate_address)
             return {
                 "success": True,
                 "delegation": {
@@ -493,7 +883,7 @@ class SmartContractVotingEngine:
             }
             
         except Exception as e:
-            print(f"❌ Failed to delegate voting power: {e}")
+            logger.error("Failed to delegate voting power: %s", e)
             return {
                 "success": False,
                 "error": str(e)
@@ -507,6 +897,10 @@ class SmartContractVotingEngine:
             
             session = self.active_sessions[session_id]
             votes = self.vote_records.get(session_id, [])
+            if session.allow_vote_change:
+                # Only each voter's latest vote counts
+                idx = self.vote_index.get(session_id, {})
+                votes = [vote for vote in votes if idx.get(vote.voter_address.lower()) is vote]
             
             # Calculate results based on voting mechanism
             voting_result = await self._calculate_voting_results(session, votes)
@@ -533,13 +927,13 @@ class SmartContractVotingEngine:
                     "participation_rate": voting_result.participation_rate,
                     "is_passed": voting_result.is_passed,
                     "execution_ready": voting_result.execution_ready,
-                    "results_by_option": voting_result.results_by_option,
+                    "results_by_option": voting_result.option_results(),
                     "winning_option": voting_result.winning_option
                 }
             }
             
         except Exception as e:
-            print(f"❌ Failed to get voting results: {e}")
+            logger.error("Failed to get voting results: %s", e)
             return {
                 "success": False,
                 "error": str(e)
@@ -547,37 +941,27 @@ class SmartContractVotingEngine:
     
     # Voting strategy implementations
     async def _simple_majority_calculation(
-        self, session: VotingSession, votes: List[VoteRecord]
+        self,
+        session: VotingSession,
+        votes: List[VoteRecord],
+        option_layout: Optional[Tuple[List[str], Dict[str, int]]] = None
     ) -> VotingResult:
         """Hitung hasil dengan simple majority"""
-        results_by_option = {}
-        total_power = 0.0
-        
-        # Initialize results for each option
-        for option in session.vote_options:
-            results_by_option[option.id] = {
-                "votes": 0,
-                "voting_power": 0.0,
-                "percentage": 0.0
-            }
+        option_ids, opts, powers = self._vote_arrays(session, votes, option_layout)
         
         # Aggregate votes
-        for vote in votes:
-            if vote.vote_option_id in results_by_option:
-                results_by_option[vote.vote_option_id]["votes"] += 1
-                results_by_option[vote.vote_option_id]["voting_power"] += vote.voting_power
-                total_power += vote.voting_power
+        counts, totals, _ = _tally_columns(opts, powers, len(option_ids))
+        total_wei = int(totals.sum())
+        total_power = total_wei / WEI_PER_TOKEN
         
         # Calculate percentages and find winner
-        winning_option = None
-        max_power = 0.0
+        table = self._option_table(counts, totals)
+        if total_wei > 0:
+            table["pct"] = totals / total_wei
         
-        for option_id, result in results_by_option.items():
-            if total_power > 0:
-                result["percentage"] = result["voting_power"] / total_power
-            if result["voting_power"] > max_power:
-                max_power = result["voting_power"]
-                winning_option = option_id
+        winning_option = None
+        if len(option_ids) and totals.max() > 0:
+            winning_option = option_ids[int(totals.argmax())]
         
         # Calculate participation rate
         total_eligible_power = await self._get_total_eligible_voting_power(session)
@@ -588,46 +972,34 @@ class SmartContractVotingEngine:
             session_id=session.session_id,
             total_votes=len(votes),
             total_voting_power=total_power,
-            results_by_option=results_by_option,
+            results_by_option={},
             participation_rate=participation_rate,
-            winning_option=winning_option
+            winning_option=winning_option,
+            option_ids=option_ids,
+            option_table=table
         )
     
     async def _quadratic_voting_calculation(
-        self, session: VotingSession, votes: List[VoteRecord]
+        self,
+        session: VotingSession,
+        votes: List[VoteRecord],
+        option_layout: Optional[Tuple[List[str], Dict[str, int]]] = None
     ) -> VotingResult:
         """Hitung hasil dengan quadratic voting"""
-        results_by_option = {}
-        total_power = 0.0
-        
-        # Initialize results for each option
-        for option in session.vote_options:
-            results_by_option[option.id] = {
-                "votes": 0,
-                "voting_power": 0.0,
-                "quadratic_power": 0.0,
-                "percentage": 0.0
-            }
+        option_ids, opts, powers = self._vote_arrays(session, votes, option_layout)
         
         # Aggregate votes with quadratic weighting
-        for vote in votes:
-            if vote.vote_option_id in results_by_option:
-                quadratic_power = vote.voting_power ** 0.5  # Square root
-                results_by_option[vote.vote_option_id]["votes"] += 1
-                results_by_option[vote.vote_option_id]["voting_power"] += vote.voting_power
-                results_by_option[vote.vote_option_id]["quadratic_power"] += quadratic_power
-                total_power += quadratic_power
+        counts, totals, qtotals = _tally_columns(opts, powers, len(option_ids), quadratic=True)
+        total_power = float(qtotals.sum())
         
         # Calculate percentages and find winner
-        winning_option = None
-        max_quadratic_power = 0.0
+        table = self._option_table(counts, totals, qtotals)
+        if total_power > 0:
+            table["pct"] = qtotals / total_power
         
-        for option_id, result in results_by_option.items():
-            if total_power > 0:
-                result["percentage"] = result["quadratic_power"] / total_power
-            if result["quadratic_power"] > max_quadratic_power:
-                max_quadratic_power = result["quadratic_power"]
-                winning_option = option_id
+        winning_option = None
+        if len(option_ids) and qtotals.max() > 0:
+            winning_option = option_ids[int(qtotals.argmax())]
         
         # Calculate participation rate
         total_eligible_power = await self._get_total_eligible_voting_power(session)
@@ -638,115 +1010,442 @@ class SmartContractVotingEngine:
             session_id=session.session_id,
             total_votes=len(votes),
             total_voting_power=total_power,
-            results_by_option=results_by_option,
+            results_by_option={},
             participation_rate=participation_rate,
-            winning_option=winning_option
+            winning_option=winning_option,
+            option_ids=option_ids,
+            option_table=table,
+            quadratic=True
+        )
+    
+    @staticmethod
+    def _option_table(
+        counts: np.ndarray, totals: np.ndarray, qtotals: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Structured per-option result array filled from tally columns"""
+        table = np.zeros(len(counts), dtype=OPTION_RESULT_DTYPE)
+        table["votes"] = counts
+        table["power"] = totals
+        if qtotals is not None:
+            table["qpower"] = qtotals
+        return table
+    
+    def _append_vote_column(self, session: VotingSession, vote: VoteRecord) -> None:
+        """Append vote to the session's columnar store"""
+        columns = self.vote_columns.setdefault(session.session_id, VoteColumns())
+        option_idx = next(
+            (i for i, option in enumerate(session.vote_options) if option.id == vote.vote_option_id), -1
+        )
+        row = columns.append(vote.voter_address, option_idx, vote.voting_power, vote.timestamp.timestamp())
+        if option_idx < 0:
+            columns.deactivate(row)
+    
+    def _option_layout(self, session: VotingSession) -> Tuple[List[str], Dict[str, int]]:
+        """Option ids of a session and their tally indices"""
+        option_ids = [option.id for option in session.vote_options]
+        return option_ids, {option_id: i for i, option_id in enumerate(option_ids)}
+    
+    def _make_tally_fn(self, session: VotingSession) -> Callable[[List[VoteRecord]], Awaitable[VotingResult]]:
+        """Specialize the tally for a session, binding its mechanism and option layout once"""
+        strategy_func = self.voting_strategies.get(session.voting_mechanism)
+        if not strategy_func:
+            raise Exception(f"Unknown voting mechanism: {session.voting_mechanism}")
+        
+        return functools.partial(strategy_func, session, option_layout=self._option_layout(session))
+    
+    def _vote_arrays(
+        self,
+        session: VotingSession,
+        votes: List[VoteRecord],
+        option_layout: Optional[Tuple[List[str], Dict[str, int]]] = None
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Option ids plus option index and voting power arrays for votes on known options"""
+        option_ids, idx_of = option_layout or self._option_layout(session)
+        columns = self.vote_columns.get(session.session_id)
+        if columns is not None:
+            opts, powers = columns.tally_arrays()
+            return option_ids, opts, powers
+        
+        valid_votes = [vote for vote in votes if vote.vote_option_id in idx_of]
+        
+        opts = np.fromiter(
+            (idx_of[vote.vote_option_id] for vote in valid_votes), dtype=np.int32, count=len(valid_votes)
         )
+        powers = np.fromiter((vote.voting_power for vote in valid_votes), dtype=object, count=len(valid_votes))
+        return option_ids, opts, powers
     
     # Voting power calculation strategies
-    async def _token_balance_weight(self, address: str) -> float:
+    async def _token_balance_weight(self, address: str) -> int:
         """Hitung voting power berdasarkan token balance"""
         try:
-            balance = self.token_contract.functions.balanceOf(address).call()
-            return float(self.web3.from_wei(balance, 'ether'))
+            balance = (_BALANCE_SNAPSHOT.get() or {}).get("balanceOf", {}).get(address)
+            if balance is None:
+                balance = await asyncio.to_thread(self._call_uint256, "balanceOf", address)
+            return int(balance)
         except Exception as e:
-            print(f"Error getting token balance for {address}: {e}")
-            return 0.0
+            logger.warning("Error getting token balance for %s: %s", address, e)
+            return 0
     
-    async def _staked_tokens_weight(self, address: str) -> float:
+    async def _staked_tokens_weight(self, address: str) -> int:
         """Hitung voting power berdasarkan staked tokens"""
         try:
-            staked_balance = self.token_contract.functions.getStakedBalance(address).call()
-            return float(self.web3.from_wei(staked_balance, 'ether')) * 1.5  # 1.5x multiplier for staked tokens
+            staked_balance = (_BALANCE_SNAPSHOT.get() or {}).get("getStakedBalance", {}).get(address)
+            if staked_balance is None:
+                staked_balance = await asyncio.to_thread(self._call_uint256, "getStakedBalance", address)
+            return int(staked_balance) * 3 // 2  # 1.5x multiplier for staked tokens
         except Exception as e:
-            print(f"Error getting staked balance for {address}: {e}")
-            return 0.0
+            logger.warning("Error getting staked balance for %s: %s", address, e)
+            return 0
     
-    async def _liquidity_provision_weight(self, address: str) -> float:
+    async def _liquidity_provision_weight(self, address: str) -> int:
         """Hitung voting power berdasarkan liquidity provision"""
         # Implementation depends on liquidity pool contracts
-        return 0.0
+        return 0
     
-    async def _reputation_score_weight(self, address: str) -> float:
+    async def _reputation_score_weight(self, address: str) -> int:
         """Hitung voting power berdasarkan reputation score"""
         # Implementation depends on reputation system
-        return 0.0
+        return 0
     
-    async def _hybrid_weighting(self, address: str) -> float:
+    async def _hybrid_weighting(self, address: str) -> int:
         """Hitung voting power dengan hybrid weighting"""
-        token_weight = await self._token_balance_weight(address)
-        staked_weight = await self._staked_tokens_weight(address)
-        liquidity_weight = await self._liquidity_provision_weight(address)
-        reputation_weight = await self._reputation_score_weight(address)
+        # Issued concurrently so the provider sends the chain reads in one batch
+        token_weight, staked_weight, liquidity_weight, reputation_weight = await asyncio.gather(
+            self._token_balance_weight(address),
+            self._staked_tokens_weight(address),
+            self._liquidity_provision_weight(address),
+            self._reputation_score_weight(address)
+        )
         
-        # Weighted combination
+        # Weighted combination (40/30/20/10), in integer wei
         total_weight = (
-            token_weight * 0.4 +
-            staked_weight * 0.3 +
-            liquidity_weight * 0.2 +
-            reputation_weight * 0.1
-        )
+            token_weight * 40 +
+            staked_weight * 30 +
+            liquidity_weight * 20 +
+            reputation_weight * 10
+        ) // 100
         
         return total_weight
     
     # Helper methods
-    async def _calculate_voting_power(
-        self, address: str, strategy: VoteWeightStrategy, session_id: str
-    ) -> float:
-        """Hitung total voting power untuk address"""
-        base_power = await self.weight_strategies[strategy](address)
+    def _address_calldata(self, fn_name: str, address: str) -> bytes:
+        """Calldata for a token getter taking one address: selector plus left-padded address"""
+        return self._selectors[fn_name] + bytes(12) + bytes.fromhex(address[2:])
+    
+    def _call_uint256(self, fn_name: str, address: str) -> int:
+        """eth_call a token getter with prebuilt calldata and decode the uint256 result"""
+        return_data = self.web3.eth.call({
+            'to': self.token_contract_address,
+            'data': self._address_calldata(fn_name, address)
+        })
+        return int.from_bytes(return_data, 'big')
+    
+    def _batch_balances(
+        self, addresses: List[str], fn_name: str, block_identifier: Any = 'latest'
+    ) -> Dict[str, int]:
+        """Read a uint256 token getter for many addresses in one Multicall3 call"""
+        calls = [
+            (self.token_contract_address, self._address_calldata(fn_name, address))
+            for address in addresses
+        ]
+        results = self.multicall_contract.functions.tryAggregate(False, calls).call(
+            block_identifier=block_identifier
+        )
         
-        # Apply delegations
-        delegated_power = await self._get_delegated_power(address, session_id)
+        balances = {}
+        for address, (success, return_data) in zip(addresses, results):
+            if success and len(return_data) == 32:
+                balances[address] = int.from_bytes(return_data, 'big')
+        return balances
+    
+    async def _prefetch_balances(
+        self, addresses: List[str], session_id: Optional[str] = None
+    ) -> Dict[str, Dict[str, int]]:
+        """Snapshot balances and staked balances for all addresses of a calculation"""
+        unique_addresses = list(dict.fromkeys(addresses))
+        fn_names = ("balanceOf", "getStakedBalance")
+        if not unique_addresses:
+            return {fn_name: {} for fn_name in fn_names}
         
-        # Apply any active delegations from this address
-        delegated_away = await self._get_delegated_away_power(address, session_id)
+        # Sessions past their start read the balances frozen at start from Redis
+        if session_id is not None:
+            snapshot = await self._read_power_snapshot(session_id, unique_addresses)
+            if snapshot is not None:
+                return snapshot
         
-        final_power = base_power + delegated_power - delegated_away
-        return max(0, final_power)
+        # Both multicalls run concurrently and leave in the same provider batch
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._batch_balances, unique_addresses, fn_name) for fn_name in fn_names),
+            return_exceptions=True
+        )
+        
+        snapshot = {}
+        for fn_name, result in zip(fn_names, results):
+            if isinstance(result, Exception):
+                # Weight strategies fall back to individual calls for missing entries
+                logger.warning("Error prefetching %s balances: %s", fn_name, result)
+                result = {}
+            snapshot[fn_name] = result
+        return snapshot
+    
+    def _schedule_power_snapshot(self, session: VotingSession) -> None:
+        """Schedule the balance snapshot of a session for its start time"""
+        task = self._snapshot_tasks.get(session.session_id)
+        if task is None or task.done():
+            self._snapshot_tasks[session.session_id] = asyncio.create_task(self._snapshot_voting_power(session))
     
-    async def _get_delegated_power(self, address: str, session_id: str) -> float:
+    async def _snapshot_voting_power(self, session: VotingSession) -> None:
+        """Freeze token balances of all holders at session start into Redis hashes"""
+        session_id = session.session_id
+        try:
+            if await self.redis_client.exists(f"power_snapshot:{session_id}"):
+                self._power_snapshot_sessions.add(session_id)
+                return
+            
+            delay = (session.start_time - datetime.now()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            block_number = await asyncio.to_thread(self._block_at, session.start_time.timestamp())
+            holders = sorted(await asyncio.to_thread(self._scan_token_holders, block_number))
+            
+            balances: Dict[str, Dict[str, int]] = {"balanceOf": {}, "getStakedBalance": {}}
+            for i in range(0, len(holders), self._snapshot_batch_size):
+                batch = holders[i:i + self._snapshot_batch_size]
+                results = await asyncio.gather(*(
+                    asyncio.to_thread(self._batch_balances, batch, fn_name, block_number)
+                    for fn_name in balances
+                ))
+                for fn_name, result in zip(balances, results):
+                    balances[fn_name].update(result)
+            
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, fn_name in (
+                    (f"power:{session_id}", "balanceOf"),
+                    (f"staked_power:{session_id}", "getStakedBalance")
+                ):
+                    mapping = {
+                        address.lower(): str(balance)
+                        for address, balance in balances[fn_name].items() if balance
+                    }
+                    if mapping:
+                        pipe.hset(key, mapping=mapping)
+                pipe.set(f"power_snapshot:{session_id}", block_number)
+                await pipe.execute()
+            
+            self._power_snapshot_sessions.add(session_id)
+            logger.info(
+                "Voting power snapshot for %s at block %s (%s holders)", session_id, block_number, len(holders)
+            )
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Error snapshotting voting power: %s", e)
+        finally:
+            self._snapshot_tasks.pop(session_id, None)
+    
+    def _block_at(self, timestamp: float) -> int:
+        """Number of the last block mined at or before timestamp, by binary search from the deploy block"""
+        latest = self.web3.eth.get_block("latest")
+        if latest["timestamp"] <= timestamp:
+            return latest["number"]
+        low, high = self._token_deploy_block, latest["number"]
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.web3.eth.get_block(mid)["timestamp"] <= timestamp:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+    
+    def _scan_token_holders(self, to_block: int) -> Set[str]:
+        """Collect token recipients from Transfer logs, resuming from the last scanned block"""
+        from_block = max(self._holders_scanned_to + 1, self._token_deploy_block)
+        for start in range(from_block, to_block + 1, self._log_chunk_size):
+            end = min(start + self._log_chunk_size - 1, to_block)
+            logs = self.web3.eth.get_logs({
+                'address': self.token_contract_address,
+                'fromBlock': start,
+                'toBlock': end,
+                'topics': [TRANSFER_TOPIC]
+            })
+            for log in logs:
+                if len(log['topics']) >= 3:
+                    self._known_holders.add(Web3.to_checksum_address(bytes(log['topics'][2])[-20:]))
+            self._holders_scanned_to = end
+        return set(self._known_holders)
+    
+    async def _read_power_snapshot(
+        self, session_id: str, addresses: List[str]
+    ) -> Optional[Dict[str, Dict[str, int]]]:
+        """Balances of addresses from the session snapshot, or None if it is not taken yet"""
+        if session_id not in self._power_snapshot_sessions:
+            return None
+        
+        try:
+            keys = [address.lower() for address in addresses]
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hmget(f"power:{session_id}", keys)
+                pipe.hmget(f"staked_power:{session_id}", keys)
+                balances, staked_balances = await pipe.execute()
+        except Exception as e:
+            logger.warning("Error reading voting power snapshot: %s", e)
+            return None
+        
+        # Addresses missing from the snapshot held nothing at session start
+        return {
+            "balanceOf": {address: int(value or 0) for address, value in zip(addresses, balances)},
+            "getStakedBalance": {address: int(value or 0) for address, value in zip(addresses, staked_balances)}
+        }
+    
+    def _delegation_addresses(self) -> List[str]:
+        """Addresses participating in any delegation"""
+        addresses = []
+        for delegator, delegations in self.delegations.items():
+            addresses.append(delegator)
+            addresses.extend(delegation.delegate_address for delegation in delegations)
+        return addresses
+    
+    async def _calculate_voting_power(
+        self, address: str, strategy: VoteWeightStrategy, session_id: str
+    ) -> int:
+        """Hitung total voting power untuk address (wei)"""
+        self._expire_delegations()
+        # Fetch every balance the delegation graph may need in one batch
+        snapshot_token = _BALANCE_SNAPSHOT.set(await self._prefetch_balances(
+            [address] + self._delegation_addresses(), session_id
+        ))
+        try:
+            base_power = await self.weight_strategies[strategy](address)
+            
+            # Apply delegations
+            delegated_power = await self._get_delegated_power(address, session_id)
+            
+            # Apply any active delegations from this address
+            delegated_away = await self._get_delegated_away_power(address, session_id)
+        finally:
+            _BALANCE_SNAPSHOT.reset(snapshot_token)
+        
+        return max(0, base_power + delegated_power - delegated_away)
+    
+    async def _get_delegated_power(self, address: str, session_id: str) -> int:
         """Dapatkan voting power yang didelegasikan ke address"""
-        total_delegated = 0.0
+        received, _ = await self._compute_all_delegated_power(session_id)
+        return received.get(address.lower(), 0)
+    
+    async def _compute_all_delegated_power(
+        self, session_id: str, alpha: Optional[float] = None
+    ) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Delegated power received and passed on by every address, from one pass over the graph
+        
+        Each delegation passes its percentage of the delegator's hybrid power plus what the
+        delegator received; the delegate gets that share scaled by alpha per hop. Addresses
+        on a delegation cycle pass nothing on. Only results for the configured alpha are
+        cached; an explicit alpha always recomputes.
+        """
+        use_cache = alpha is None
+        if use_cache:
+            alpha = self._delegation_alpha
+        cached = self._delegated_power.get(session_id) if use_cache else None
+        if (
+            cached is not None
+            and cached[0] == self._delegation_version
+            and time.time() - cached[1] < self._delegated_power_ttl
+        ):
+            return cached[2], cached[3]
         
+        version = self._delegation_version
+        now_ts = int(time.time())
+        nodes: Dict[str, int] = {}
+        addresses: List[str] = []
+        src, dst, pct = [], [], []
         for delegator, delegations in self.delegations.items():
             for delegation in delegations:
-                if (delegation.delegate_address.lower() == address.lower() and
-                    delegation.is_active and
-                    delegation.end_time > datetime.now()):
-                    
-                    delegator_power = await self._calculate_voting_power(
-                        delegator, VoteWeightStrategy.HYBRID_WEIGHTING, session_id
-                    )
-                    total_delegated += delegator_power * delegation.voting_power_percentage
+                if not (delegation.is_active and delegation.end_ts > now_ts):
+                    continue
+                for address in (delegator, delegation.delegate_address):
+                    if address.lower() not in nodes:
+                        nodes[address.lower()] = len(addresses)
+                        addresses.append(address)
+                src.append(nodes[delegator.lower()])
+                dst.append(nodes[delegation.delegate_address.lower()])
+                pct.append(delegation.voting_power_percentage)
+        
+        n = len(addresses)
+        incoming = [0] * n
+        outgoing = [0] * n
+        if src:
+            # CSR adjacency: out-edges of node u are indices/weights[indptr[u]:indptr[u + 1]]
+            src_arr = np.asarray(src, dtype=np.int64)
+            order = np.argsort(src_arr, kind="stable")
+            indices = np.asarray(dst, dtype=np.int64)[order]
+            weights = np.asarray(pct, dtype=np.float64)[order]
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src_arr, minlength=n), out=indptr[1:])
+            remaining = np.bincount(indices, minlength=n)
+            
+            delegators = np.flatnonzero(np.diff(indptr)).tolist()
+            hybrid = dict(zip(delegators, await asyncio.gather(
+                *(self._hybrid_weighting(addresses[u]) for u in delegators)
+            )))
+            
+            # Kahn's algorithm: an address passes power on once everything delegated to it is known
+            frontier = np.flatnonzero(remaining == 0).tolist()
+            while frontier:
+                next_frontier = []
+                for u in frontier:
+                    start, end = indptr[u], indptr[u + 1]
+                    if start == end:
+                        continue
+                    power = hybrid[u] + incoming[u]
+                    for v, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+                        passed_on = _scale_wei(power, w)
+                        outgoing[u] += passed_on
+                        incoming[v] += _scale_wei(passed_on, alpha)
+                        remaining[v] -= 1
+                        if remaining[v] == 0:
+                            next_frontier.append(v)
+                frontier = next_frontier
         
-        return total_delegated
+        received = {address.lower(): incoming[i] for i, address in enumerate(addresses) if incoming[i]}
+        passed_on = {address.lower(): outgoing[i] for i, address in enumerate(addresses) if outgoing[i]}
+        if use_cache:
+            self._delegated_power[session_id] = (version, time.time(), received, passed_on)
+        return received, passed_on
+    
+    def _expire_delegations(self) -> None:
+        """Deactivate delegations whose end time has passed and drop them from the delegate index"""
+        now_ts = int(time.time())
+        while self._delegation_expiry_heap and self._delegation_expiry_heap[0][0] <= now_ts:
+            _, _, delegation = heapq.heappop(self._delegation_expiry_heap)
+            delegation.is_active = False
+            self._delegation_version += 1
+            incoming = self.delegations_by_delegate.get(delegation.delegate_address.lower())
+            if incoming:
+                incoming[:] = [d for d in incoming if d is not delegation]
     
-    async def _get_delegated_away_power(self, address: str, session_id: str) -> float:
+    async def _get_delegated_away_power(self, address: str, session_id: str) -> int:
         """Dapatkan voting power yang didelegasikan dari address"""
-        total_delegated_away = 0.0
-        
-        if address in self.delegations:
-            for delegation in self.delegations[address]:
-                if (delegation.is_active and
-                    delegation.end_time > datetime.now()):
-                    
-                    delegator_power = await self._calculate_voting_power(
-                        address, VoteWeightStrategy.HYBRID_WEIGHTING, session_id
-                    )
-                    total_delegated_away += delegator_power * delegation.voting_power_percentage
-        
-        return total_delegated_away
+        _, passed_on = await self._compute_all_delegated_power(session_id)
+        return passed_on.get(address.lower(), 0)
     
     async def _calculate_voting_results(
         self, session: VotingSession, votes: List[VoteRecord]
     ) -> VotingResult:
         """Hitung hasil voting berdasarkan mekanisme yang dipilih"""
-        strategy_func = self.voting_strategies.get(session.voting_mechanism)
-        if not strategy_func:
-            raise Exception(f"Unknown voting mechanism: {session.voting_mechanism}")
+        tally_fn = self._tally_fns.get(session.session_id)
+        if tally_fn is None:
+            tally_fn = self._tally_fns[session.session_id] = self._make_tally_fn(session)
         
-        return await strategy_func(session, votes)
+        # Prefetch balances of all voters and delegation participants in one batch
+        snapshot_token = _BALANCE_SNAPSHOT.set(await self._prefetch_balances(
+            [vote.voter_address for vote in votes] + self._delegation_addresses(), session.session_id
+        ))
+        try:
+            return await tally_fn(votes)
+        finally:
+            _BALANCE_SNAPSHOT.reset(snapshot_token)
     
     def _evaluate_proposal_outcome(
         self, session: VotingSession, result: VotingResult
@@ -761,7 +1460,7 @@ class SmartContractVotingEngine:
             if not result.winning_option:
                 return False
             
-            winning_power = result.results_by_option[result.winning_option]["voting_power"]
+            winning_power = result.option_voting_power(result.winning_option)
             approval_rate = winning_power / result.total_voting_power if result.total_voting_power > 0 else 0
             
             return approval_rate >= session.minimum_approval
@@ -770,6 +1469,23 @@ class SmartContractVotingEngine:
     
     async def _get_total_eligible_voting_power(self, session: VotingSession) -> float:
         """Dapatkan total voting power yang eligible untuk sesi"""
+        key = f"eligible_power:{session.session_id}"
+        try:
+            cached = await self.redis_client.get(key)
+            if cached:
+                return float(cached)
+        except Exception as e:
+            logger.warning("Error reading eligible voting power cache: %s", e)
+        
+        total_power = await self._compute_total_eligible_voting_power(session)
+        try:
+            await self.redis_client.set(key, total_power, ex=self._eligible_power_ttl)
+        except Exception as e:
+            logger.warning("Error caching eligible voting power: %s", e)
+        return total_power
+    
+    async def _compute_total_eligible_voting_power(self, session: VotingSession) -> float:
+        """Hitung total voting power yang eligible dari chain"""
         # This would typically query the total token supply or eligible addresses
         # For now, return a mock value
         return 1000000.0
@@ -779,29 +1495,18 @@ class SmartContractVotingEngine:
     ) -> str:
         """Buat proposal di blockchain"""
         try:
-            account = Account.from_key(private_key)
-            
-            # Prepare transaction
-            transaction = self.governance_contract.functions.createProposal(
-                Web3.to_bytes(text=session.session_id),
-                session.metadata.get("description", ""),
-                int(session.voting_period.days * 24 * 60 * 60),  # Convert to seconds
-                [opt.label for opt in session.vote_options]
-            ).build_transaction({
-                'from': account.address,
-                'nonce': self.web3.eth.get_transaction_count(account.address),
-                'gas': 200000,
-                'gasPrice': self.web3.eth.gas_price
-            })
-            
-            # Sign and send transaction
-            signed_tx = self.web3.eth.account.sign_transaction(transaction, private_key)
-            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-            
-            return tx_hash.hex()
-            
+            return await self._send_tx(
+                self._create_proposal_fn(
+                    self._session_key(session.session_id),
+                    session.metadata.get("description", ""),
+                    session.voting_period_seconds,
+                    session.vote_option_labels
+                ),
+                200000,
+                private_key
+            )
         except Exception as e:
-            print(f"Error creating on-chain proposal: {e}")
+            logger.warning("Error creating on-chain proposal: %s", e)
             return ""
     
     async def _broadcast_vote_to_blockchain(
@@ -809,31 +1514,17 @@ class SmartContractVotingEngine:
     ) -> str:
         """Broadcast vote ke blockchain"""
         try:
-            account = Account.from_key(private_key)
-            
-            # Map vote option to uint8
-            vote_option_uint = self._map_vote_option_to_uint(vote.vote_option_id)
-            
-            # Prepare transaction
-            transaction = self.voting_contract.functions.castVote(
-                Web3.to_bytes(text=vote.session_id),
-                vote_option_uint,
-                int(vote.voting_power * 10**18)  # Convert to wei
-            ).build_transaction({
-                'from': account.address,
-                'nonce': self.web3.eth.get_transaction_count(account.address),
-                'gas': 100000,
-                'gasPrice': self.web3.eth.gas_price
-            })
-            
-            # Sign and send transaction
-            signed_tx = self.web3.eth.account.sign_transaction(transaction, private_key)
-            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-            
-            return tx_hash.hex()
-            
+            return await self._send_tx(
+                self._cast_vote_fn(
+                    self._session_key(vote.session_id),
+                    self._map_vote_option_to_uint(vote.vote_option_id),
+                    vote.voting_power
+                ),
+                100000,
+                private_key
+            )
         except Exception as e:
-            print(f"Error broadcasting vote to blockchain: {e}")
+            logger.warning("Error broadcasting vote to blockchain: %s", e)
             return ""
     
     async def _create_on_chain_delegation(
@@ -841,75 +1532,206 @@ class SmartContractVotingEngine:
     ) -> str:
         """Buat delegasi di blockchain"""
         try:
-            account = Account.from_key(private_key)
-            
-            # Map proposal types to uint8 array
-            proposal_types_uint = [0] * len(delegation.proposal_types)  # Simplified mapping
-            
-            # Prepare transaction
-            transaction = self.voting_contract.functions.delegateVote(
-                delegation.delegator_address,
-                delegation.delegate_address,
-                proposal_types_uint
-            ).build_transaction({
-                'from': account.address,
-                'nonce': self.web3.eth.get_transaction_count(account.address),
-                'gas': 150000,
-                'gasPrice': self.web3.eth.gas_price
-            })
-            
-            # Sign and send transaction
-            signed_tx = self.web3.eth.account.sign_transaction(transaction, private_key)
-            tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-            
-            return tx_hash.hex()
-            
+            return await self._send_tx(
+                self._delegate_vote_fn(
+                    delegation.delegator_address,
+                    delegation.delegate_address,
+                    delegation._proposal_types_uint
+                ),
+                150000,
+                private_key
+            )
         except Exception as e:
-            print(f"Error creating on-chain delegation: {e}")
+            logger.warning("Error creating on-chain delegation: %s", e)
             return ""
     
+    async def _send_tx(self, contract_call: Any, gas_limit: int, private_key: str) -> str:
+        """Build, sign and submit a contract call; returns the transaction hash"""
+        account = _account_from_key(private_key)
+        nonce, gas_price = await self._fetch_nonce_and_gas(account.address)
+        
+        # Build and submit from worker threads and sign on the signing pool, keeping the event loop free
+        transaction = await asyncio.to_thread(
+            contract_call.build_transaction, self._tx_params(account.address, gas_limit, nonce, gas_price)
+        )
+        raw_tx = await self._sign_tx(transaction, private_key)
+        tx_hash = await asyncio.to_thread(self.web3.eth.send_raw_transaction, raw_tx)
+        return tx_hash.hex()
+    
+    def _tx_params(self, sender: str, gas: int, nonce: int, gas_price: int) -> Dict[str, Any]:
+        """Transaction fields for one call"""
+        # Fresh dict per call: concurrent builds for one sender must not share nonce fields
+        return {'from': sender, 'gas': gas, 'nonce': nonce, 'gasPrice': gas_price}
+    
+    async def _fetch_nonce_and_gas(self, address: str) -> Tuple[int, int]:
+        """Nonce and gas price for a new transaction, sent as one JSON-RPC batch"""
+        # Issued concurrently from worker threads so the batching provider coalesces both calls
+        nonce, gas_price = await asyncio.gather(
+            asyncio.to_thread(self.web3.eth.get_transaction_count, address),
+            self._cached_gas_price()
+        )
+        return nonce, gas_price
+    
+    async def _cached_gas_price(self) -> int:
+        """Gas price, re-read from the node at most once per TTL"""
+        fetched_at, gas_price = self._gas_price_cache
+        if time.monotonic() - fetched_at < self._gas_price_ttl:
+            return gas_price
+        
+        gas_price = await asyncio.to_thread(lambda: self.web3.eth.gas_price)
+        self._gas_price_cache = (time.monotonic(), gas_price)
+        return gas_price
+    
+    async def _sign_tx(self, tx_dict: Dict[str, Any], private_key: str) -> bytes:
+        """Sign transaction on the signing process pool"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._sign_pool, _sign_worker, tx_dict, private_key
+        )
+    
+    def _session_key(self, session_id: str) -> bytes:
+        """On-chain proposal id of a session, encoded once"""
+        key = self._session_keys.get(session_id)
+        if key is None:
+            # Session ids are ASCII hex; the proposal id is their text bytes (not the decoded digest),
+            # so ids of proposals already on chain keep matching
+            key = self._session_keys[session_id] = session_id.encode("ascii")
+        return key
+    
     def _map_vote_option_to_uint(self, option_id: str) -> int:
         """Map vote option ID ke uint8"""
-        # Simple mapping based on option ID
-        if option_id == "yes":
-            return 1
-        elif option_id == "no":
-            return 2
-        elif option_id == "abstain":
-            return 3
-        elif option_id == "veto":
-            return 4
-        else:
-            return 0
+        return _VOTE_OPTION_UINT.get(option_id, 0)
     
     def _generate_session_id(self, proposal_id: str, title: str) -> str:
         """Generate unique session ID"""
-        content = f"{proposal_id}:{title}:{time.time()}"
-        return hashlib.sha256(content.encode()).hexdigest()
+        content = f"{proposal_id}:{title}:{time.time_ns()}"
+        # 16-byte digest: 32 hex characters, which also fit the bytes32 on-chain proposal id
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
     
     async def _load_active_sessions(self) -> None:
         """Load active voting sessions"""
-        # Implementation depends on storage mechanism
-        pass
+        keys = [key async for key in self.redis_client.scan_iter(match="voting_session:*")]
+        if not keys:
+            return
+        
+        # All sessions in one round trip, then all their vote lists in another
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(key)
+            raw_sessions = await pipe.execute()
+        
+        sessions = [self._session_from_json(raw) for raw in raw_sessions if raw]
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for session in sessions:
+                pipe.lrange(f"votes:{session.session_id}", 0, -1)
+            raw_vote_lists = await pipe.execute()
+        
+        for session, raw_votes in zip(sessions, raw_vote_lists):
+            session_id = session.session_id
+            votes = [self._vote_from_json(raw) for raw in raw_votes]
+            self.active_sessions[session_id] = session
+            self.vote_records[session_id] = votes
+            self.vote_index[session_id] = {vote.voter_address.lower(): vote for vote in votes}
+            for vote in votes:
+                self._append_vote_column(session, vote)
+            self._tally_fns[session_id] = self._make_tally_fn(session)
+            self._schedule_expiry(session_id, session.end_time.timestamp())
+            self._schedule_power_snapshot(session)
+    
+    async def _persist_session(self, session: VotingSession) -> None:
+        """Simpan sesi voting ke Redis"""
+        try:
+            await self.redis_client.set(f"voting_session:{session.session_id}", self._session_to_json(session))
+        except Exception as e:
+            logger.warning("Error persisting voting session: %s", e)
+    
+    async def _persist_vote(self, vote: VoteRecord) -> None:
+        """Append vote ke daftar vote sesi di Redis"""
+        try:
+            await self.redis_client.rpush(f"votes:{vote.session_id}", self._vote_to_json(vote))
+        except Exception as e:
+            logger.warning("Error persisting vote: %s", e)
+    
+    @staticmethod
+    def _session_to_json(session: VotingSession) -> bytes:
+        """Serialize voting session for Redis"""
+        # orjson handles the dataclass, nested options, enums and naive datetimes itself
+        return orjson.dumps(session, default=str)
+    
+    @staticmethod
+    def _session_from_json(raw: bytes) -> VotingSession:
+        """Rebuild voting session from its Redis form"""
+        data = orjson.loads(raw)
+        data["start_time"] = datetime.fromisoformat(data["start_time"])
+        data["end_time"] = datetime.fromisoformat(data["end_time"])
+        data["vote_options"] = [VoteOption(**option) for option in data["vote_options"]]
+        data["voting_mechanism"] = VotingMechanism(data["voting_mechanism"])
+        data["vote_weight_strategy"] = VoteWeightStrategy(data["vote_weight_strategy"])
+        return VotingSession(**data)
+    
+    @staticmethod
+    def _vote_to_json(vote: VoteRecord) -> bytes:
+        """Serialize vote record for Redis"""
+        # Wei amounts overflow orjson's 64-bit integers, so voting power is stored as a decimal string
+        return orjson.dumps(dict(vars(vote), voting_power=str(vote.voting_power)), default=str)
+    
+    @staticmethod
+    def _vote_from_json(raw: bytes) -> VoteRecord:
+        """Rebuild vote record from its Redis form"""
+        data = orjson.loads(raw)
+        data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+        data["voting_power"] = int(data["voting_power"])
+        return VoteRecord(**data)
+    
+    def _schedule_expiry(self, session_id: str, deadline: float) -> None:
+        """Queue a session for finalization and wake the monitor if it is now the earliest deadline"""
+        heapq.heappush(self._expiry_heap, (deadline, session_id))
+        if self._expiry_heap[0][1] == session_id:
+            self._expiry_wakeup.set()
     
     async def _voting_monitoring_loop(self) -> None:
-        """Monitoring loop untuk voting sessions"""
+        """Monitoring loop untuk voting sessions, tidur sampai deadline berikutnya"""
         while True:
             try:
-                await self._process_active_sessions()
-                await asyncio.sleep(300)  # Check every 5 minutes
+                self._expiry_wakeup.clear()
+                if not self._expiry_heap:
+                    await self._expiry_wakeup.wait()
+                    continue
+                
+                deadline, session_id = self._expiry_heap[0]
+                delay = deadline - time.time()
+                if delay > 0:
+                    # asyncio.timeout rather than wait_for: on 3.11 wait_for drops a cancel that
+                    # lands just after a wake-up, which left shutdown waiting on this loop forever
+                    try:
+                        async with asyncio.timeout(delay):
+                            await self._expiry_wakeup.wait()
+                    except TimeoutError:
+                        pass
+                    continue
+                
+                # Auto-finalize every session that is due, concurrently
+                now_ts = time.time()
+                expired = set()
+                while self._expiry_heap and self._expiry_heap[0][0] <= now_ts:
+                    _, session_id = heapq.heappop(self._expiry_heap)
+                    if session_id in self.active_sessions:
+                        expired.add(session_id)
+                
+                await asyncio.gather(
+                    *(self._finalize_with_limit(session_id) for session_id in expired),
+                    return_exceptions=True
+                )
+                for session_id in expired:
+                    if session_id in self.active_sessions:
+                        self._schedule_expiry(session_id, time.time() + self._finalize_retry_delay)
             except Exception as e:
-                print(f"Voting monitoring error: {e}")
+                logger.warning("Voting monitoring error: %s", e)
                 await asyncio.sleep(60)
     
-    async def _process_active_sessions(self) -> None:
-        """Process active voting sessions"""
-        now = datetime.now()
-        for session_id in list(self.active_sessions.keys()):
-            session = self.active_sessions[session_id]
-            if now > session.end_time:
-                # Auto-finalize session
-                await self._finalize_voting_session(session_id)
+    async def _finalize_with_limit(self, session_id: str) -> None:
+        """Finalize a session while holding a slot of the finalization semaphore"""
+        async with self._finalize_semaphore:
+            await self._finalize_voting_session(session_id)
     
     async def _finalize_voting_session(self, session_id: str) -> None:
         """Finalisasi sesi voting"""
@@ -919,19 +1741,35 @@ class SmartContractVotingEngine:
             
             if result["success"]:
                 # Store final results
-                session = self.active_sessions[session_id]
-                result_data = result["results"]
+                passed, participation, winner = itemgetter(
+                    "is_passed", "participation_rate", "winning_option"
+                )(result["results"])
                 
-                print(f"✅ Voting session finalized: {session_id}")
-                print(f"   Passed: {result_data['is_passed']}")
-                print(f"   Participation: {result_data['participation_rate']:.2%}")
-                print(f"   Winning option: {result_data['winning_option']}")
+                logger.info(
+                    "Voting session finalized: %s (passed: %s, participation: %.2f%%, winning option: %s)",
+                    session_id, passed, participation * 100, winner
+                )
                 
                 # Remove from active sessions
                 del self.active_sessions[session_id]
+                self._tally_fns.pop(session_id, None)
+                self._session_keys.pop(session_id, None)
+                self._delegated_power.pop(session_id, None)
+                self.vote_records.pop(session_id, None)
+                self.vote_index.pop(session_id, None)
+                self.vote_columns.pop(session_id, None)
+                self._power_snapshot_sessions.discard(session_id)
+                snapshot_task = self._snapshot_tasks.pop(session_id, None)
+                if snapshot_task is not None:
+                    snapshot_task.cancel()
+                await self.redis_client.delete(*(
+                    f"{prefix}:{session_id}" for prefix in (
+                        "voting_session", "votes", "power", "staked_power", "power_snapshot", "eligible_power"
+                    )
+                ))
                 
         except Exception as e:
-            print(f"Error finalizing voting session: {e}")
+            logger.warning("Error finalizing voting session: %s", e)
 
 
 # Example usage and testing
@@ -944,7 +1782,8 @@ async def test_smart_contract_voting():
         web3_provider="https://mainnet.infura.io/v3/YOUR_PROJECT_ID",
         governance_contract_address="0x...",
         voting_contract_address="0x...",
-        token_contract_address="0x..."
+        token_contract_address="0x...",
+        token_deploy_block=0
     )
     
     # Initialize system
@@ -985,29 +1824,34 @@ async def test_smart_contract_voting():
             ("0x4444444444444444444444444444444444444444", "yes", "private_key_4"),
         ]
         
-        for voter_address, vote_option, private_key in voters:
-            vote_result = await voting_engine.cast_vote(
+        # Votes from different voters are independent; let their signing and RPCs overlap
+        vote_results = await asyncio.gather(*(
+            voting_engine.cast_vote(
                 voter_address=voter_address,
                 session_id=session_id,
                 vote_option_id=vote_option,
                 private_key=private_key,
                 conviction_multiplier=1.0
             )
-            
+            for voter_address, vote_option, private_key in voters
+        ))
+        
+        for (voter_address, vote_option, _), vote_result in zip(voters, vote_results):
             if vote_result["success"]:
-                print(f"✅ Vote cast: {voter_address} -> {vote_option}")
+                if __debug__:  # per-vote progress; skipped under python -O
+                    print(f"✅ Vote cast: {voter_address} -> {vote_option}")
             else:
                 print(f"❌ Vote failed: {vote_result['error']}")
         
         # Get voting results
         results = await voting_engine.get_voting_results(session_id)
-        print(f"📊 Voting Results: {json.dumps(results, indent=2, default=str)}")
+        print(f"📊 Voting Results: {orjson.dumps(results, option=orjson.OPT_INDENT_2, default=str).decode()}")
         
         # Test delegation
         delegation_result = await voting_engine.delegate_voting_power(
             delegator_address="0x5555555555555555555555555555555555555555",
             delegate_address="0x1111111111111111111111111111111111111111",
-            proposal_types=["parameter_change", "treasury_spending"],
+            proposal_types=["parameter_change", "treasury_spend"],
             voting_power_percentage=0.8,
             private_key="private_key_5"
         )
@@ -31,14 +31,15 @@ proposal_dict = proposal.to_dict()
 print('Proposal dict keys:', list(proposal_dict.keys()))
 print('Required fields check:')
 required_fields = ['proposal_id', 'title', 'description', 'proposer', 'category', 'status', 'created_at', 'voting_start_time', 'voting_end_time']
+missing = [field for field in required_fields if field not in proposal_dict]
+if missing:
+    print(f'  ✗ Missing: {missing}')
+else:
+    print('  ✓ All required fields present')
 for field in required_fields:
-    print(f'  {field}: {"✓" if field in proposal_dict else "✗"}')
     if field in proposal_dict:
-        print(f'    type: {type(proposal_dict[field])}')
-        if isinstance(proposal_dict[field], str):
-            print(f'    value: {proposal_dict[field][:50]}')
-        else:
-            print(f'    value: {proposal_dict[field]}')
+        value = proposal_dict[field]
+        print(f'  {field}: {type(value).__name__} = {str(value)[:50]}')
 
 # Test from_dict
 print('\nTesting from_dict...')
@@ -4,17 +4,20 @@ Mengimplementasikan content delivery network dengan intelligent caching dan opti
 """
 
 import asyncio
+import bisect
+import concurrent.futures
+import functools
 import logging
 import time
 import hashlib
 import json
-import aiofiles
 from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
 import aiohttp
-from collections import deque
+import orjson
+from collections import Counter, OrderedDict, deque
 
 # Handle redis import conflict
 try:
@@ -27,14 +30,235 @@ except ImportError:
 
 from collections import defaultdict
 import mimetypes
+import numpy as np
 import gzip
+import struct
+import zlib
 import brotli
 import os
 
+# zstd is optional; without it compression sticks to brotli/gzip
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fixed-size access log records; the ring length is a power of two so wrapping is a mask
+ACCESS_LOG_DTYPE = np.dtype([
+    ("ts", np.float64), ("key_hash", np.uint64), ("size", np.uint32), ("hit", np.uint8)
+])
+ACCESS_LOG_SIZE = 8192
+
+
+def _read_file(path: str) -> bytes:
+    """Read a whole file; run via asyncio.to_thread so open and read cost one executor hop"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write_file(path: str, content: bytes) -> None:
+    """Write a whole file; run via asyncio.to_thread so open and write cost one executor hop"""
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def _monotonic_ns_to_datetime(monotonic_ns: int) -> datetime:
+    """Convert a time.monotonic_ns() reading to wall-clock time, for reporting only"""
+    return datetime.fromtimestamp(time.time() - (time.monotonic_ns() - monotonic_ns) / 1e9)
+
+
+def _remove_entry_files(entry: "CacheEntry") -> None:
+    """Delete a cache entry's file and any encoding variant files"""
+    for path in {entry.file_path, *(path for path, _ in entry.variants.values())}:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _hash_cache_key(file_path: str, params: Optional[Dict]) -> str:
+    """Hash file path and parameters into a cache key"""
+    key_string = file_path
+    if params:
+        key_string += json.dumps(params, sort_keys=True)
+    # Keys only need to be unique, not collision-resistant against attackers; a 16-byte
+    # BLAKE2b digest is faster than SHA-256 and gives 32-character keys
+    return hashlib.blake2b(key_string.encode(), digest_size=16).hexdigest()
+
+
+# Content types of the extensions a CDN serves most; anything else goes through mimetypes once
+_EXT_CONTENT_TYPES = {
+    '.html': 'text/html', '.htm': 'text/html', '.css': 'text/css',
+    '.js': 'text/javascript', '.mjs': 'text/javascript', '.json': 'application/json',
+    '.map': 'application/json', '.xml': 'application/xml', '.txt': 'text/plain',
+    '.csv': 'text/csv', '.svg': 'image/svg+xml', '.wasm': 'application/wasm',
+    '.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif',
+    '.webp': 'image/webp', '.ico': 'image/vnd.microsoft.icon',
+    '.woff': 'font/woff', '.woff2': 'font/woff2', '.ttf': 'font/ttf', '.otf': 'font/otf',
+    '.mp4': 'video/mp4', '.webm': 'video/webm', '.mp3': 'audio/mpeg',
+    '.pdf': 'application/pdf', '.zip': 'application/zip',
+    '.gz': 'application/gzip', '.br': 'application/x-brotli',
+}
+
+_COMPRESSED_TYPE_PREFIXES = (
+    'image/', 'video/', 'audio/', 'application/zip', 'application/gzip',
+    'application/x-brotli', 'application/pdf'
+)
+_BROTLI_TYPE_PREFIXES = (
+    'text/', 'application/javascript', 'application/json', 'application/xml', 'application/css'
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _content_type_for_extension(ext: str) -> str:
+    """Content type for a lowercase file extension"""
+    content_type = _EXT_CONTENT_TYPES.get(ext) or mimetypes.guess_type(f"file{ext}")[0]
+    return content_type or 'application/octet-stream'
+
+
+def _guess_content_type(path: str) -> str:
+    """Content type of a file path or URL, by extension"""
+    return _content_type_for_extension(os.path.splitext(path)[1].lower())
+
+
+@functools.lru_cache(maxsize=256)
+def _is_compressed_type(content_type: str) -> bool:
+    """Check if content type is already compressed"""
+    return content_type.startswith(_COMPRESSED_TYPE_PREFIXES)
+
+
+@functools.lru_cache(maxsize=256)
+def _is_brotli_friendly_type(content_type: str) -> bool:
+    """Check if content type should use brotli compression"""
+    return content_type.startswith(_BROTLI_TYPE_PREFIXES)
+
+
+def _brotli_compress(content: bytes, quality: int, chunk_size: int) -> bytes:
+    """Brotli-compress content, streaming it in chunk_size pieces when it is larger than one chunk"""
+    if len(content) <= chunk_size:
+        return brotli.compress(content, quality=quality)
+    
+    compressor = brotli.Compressor(quality=quality)
+    view = memoryview(content)
+    parts = [compressor.process(view[i:i + chunk_size]) for i in range(0, len(content), chunk_size)]
+    parts.append(compressor.finish())
+    return b"".join(parts)
+
+
+def _gzip_compress(content: bytes, level: int, chunk_size: int) -> bytes:
+    """Gzip-compress content, streaming it in chunk_size pieces when it is larger than one chunk"""
+    if len(content) <= chunk_size:
+        return gzip.compress(content, compresslevel=level)
+    
+    # wbits=31 writes a gzip header and trailer, matching gzip.compress output
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    view = memoryview(content)
+    parts = [compressor.compress(view[i:i + chunk_size]) for i in range(0, len(content), chunk_size)]
+    parts.append(compressor.flush())
+    return b"".join(parts)
+
+
+def _parse_accept_encoding(headers: Optional[Dict]) -> Optional[Dict[str, float]]:
+    """Parse the request's Accept-Encoding header into {coding: q-value}; None if it is absent"""
+    accept_encoding = None
+    for name, value in (headers or {}).items():
+        if name.lower() == 'accept-encoding':
+            accept_encoding = value
+            break
+    
+    if accept_encoding is None:
+        return None
+    
+    qvalues = {}
+    for token in accept_encoding.split(','):
+        coding, _, params = token.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        qvalue = 1.0
+        params = params.replace(' ', '').lower()
+        if params.startswith('q='):
+            try:
+                qvalue = float(params[2:])
+            except ValueError:
+                qvalue = 0.0
+        qvalues[coding] = qvalue
+    return qvalues
+
+
+def _encoding_qvalue(qvalues: Optional[Dict[str, float]], encoding: str) -> float:
+    """q-value the client gives a content coding; a request without Accept-Encoding gets identity"""
+    if qvalues is None:
+        return 0.0
+    return qvalues.get(encoding, qvalues.get('*', 0.0))
+
+
+def _accepts_encoding(headers: Optional[Dict], encoding: str) -> bool:
+    """Check whether the request's Accept-Encoding header allows the given content coding"""
+    return _encoding_qvalue(_parse_accept_encoding(headers), encoding) > 0
+
+
+def _response_head(content_type: str, content_length: int, etag: str,
+                   content_encoding: Optional[str]) -> bytes:
+    """HTTP/1.1 200 response head for a payload served straight to a stream"""
+    lines = [
+        "HTTP/1.1 200 OK",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {content_length}",
+        f"ETag: {etag}",
+        "Vary: Accept-Encoding",
+    ]
+    if content_encoding:
+        lines.append(f"Content-Encoding: {content_encoding}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+# Payloads above _PARALLEL_GZIP_THRESHOLD are gzipped in _PARALLEL_CHUNK_SIZE pieces on a threadpool
+_PARALLEL_CHUNK_SIZE = 1 << 20
+_PARALLEL_GZIP_THRESHOLD = 4 * _PARALLEL_CHUNK_SIZE
+_DEFLATE_WINDOW = 32 * 1024
+
+
+def _zstd_compress(content: bytes, level: int) -> bytes:
+    """Zstd-compress content on all cores; compressors aren't thread-safe, so one per call"""
+    return zstd.ZstdCompressor(level=level, threads=-1).compress(content)
+
+
+def _deflate_chunk(content: bytes, start: int, end: int, level: int) -> bytes:
+    """
+    Raw-deflate content[start:end] as one piece of a larger stream
+    
+    The previous 32KB primes the compressor so matches can reach back across the chunk
+    boundary, and every chunk but the last ends on a sync flush, so the pieces concatenate
+    into one valid deflate stream.
+    """
+    view = memoryview(content)
+    if start:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15,
+                                      zdict=view[max(0, start - _DEFLATE_WINDOW):start])
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    last = end >= len(content)
+    return compressor.compress(view[start:end]) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _gzip_member(deflated: List[bytes], crc: int, size: int, level: int) -> bytes:
+    """Wrap raw deflate pieces in a single gzip member header and trailer"""
+    xfl = b'\x02' if level == 9 else b'\x04' if level == 1 else b'\x00'
+    header = b'\x1f\x8b\x08\x00\x00\x00\x00\x00' + xfl + b'\xff'
+    return b"".join([header, *deflated, struct.pack('<II', crc, size & 0xFFFFFFFF)])
+
+
+@functools.lru_cache(maxsize=65536)
+def _cached_cache_key(file_path: str, params_key: Tuple) -> str:
+    """Memoized cache key for sorted (name, type name, value) parameter items"""
+    return _hash_cache_key(file_path, {name: value for name, _, value in params_key})
+
+
 @dataclass
 class CDNConfig:
     """CDN Configuration"""
@@ -46,17 +270,22 @@ class CDNConfig:
     # Compression settings
     enable_gzip: bool = True
     enable_brotli: bool = True
+    enable_zstd: bool = True  # zstd for clients that accept it, stored as a cache variant
+    zstd_level: int = 6  # Real-time compress_content level; cached variants use the maximum ratio
     compression_threshold: int = 1024  # 1KB
     
     # Performance settings
     max_file_size: int = 100 * 1024 * 1024  # 100MB
     chunk_size: int = 64 * 1024  # 64KB chunks
+    hot_cache_size: int = 256 * 1024 * 1024  # 256MB of cached bytes pinned in memory
+    hot_access_threshold: int = 10  # Hits before an entry's bytes are pinned
     
     # Storage settings
     storage_path: str = "./cdn_cache"
     enable_persistent_cache: bool = True
     
     # Network settings
+    origin_url: Optional[str] = None  # Base URL to fetch files missing from the local file system
     timeout: int = 30
     max_retries: int = 3
     retry_delay: float = 1.0
@@ -74,14 +303,44 @@ class CacheEntry:
     file_path: str
     content_type: str
     file_size: int
-    created_at: datetime
-    last_accessed: datetime
+    created_at: int  # time.time_ns(), comparable across processes
+    last_accessed: int  # time.monotonic_ns(), only compared within this process
     access_count: int = 0
     etag: str = ""
     compression_type: Optional[str] = None
     compressed_size: Optional[int] = None
+    variants: Dict[str, Tuple[str, int]] = field(default_factory=dict)  # encoding -> (file_path, size)
+    source_path: str = ""  # Origin path the entry was cached from
+    
+    @property
+    def stored_size(self) -> int:
+        """Bytes on disk for this entry, including any extra encoding variants"""
+        return self.file_size + sum(
+            size for path, size in self.variants.values() if path != self.file_path
+        )
+    
+    def select_variant(self, headers: Optional[Dict]) -> Optional[Tuple[str, str, int]]:
+        """
+        Pick the stored encoding the client prefers
+        
+        Returns:
+            Tuple of (encoding, file_path, size), atau None jika tidak ada variant yang diterima
+        """
+        qvalues = _parse_accept_encoding(headers)
+        best = None
+        for encoding, (path, size) in self.variants.items():
+            qvalue = _encoding_qvalue(qvalues, encoding)
+            if qvalue > 0 and (best is None or (-qvalue, size) < best[0]):
+                best = ((-qvalue, size), encoding, path, size)
+        if best is not None:
+            return best[1:]
+        
+        # Entries cached without variants only hold their primary encoding
+        if self.compression_type and not self.variants and _encoding_qvalue(qvalues, self.compression_type) > 0:
+            return self.compression_type, self.file_path, self.file_size
+        return None
 
-@dataclass
+@dataclass(slots=True)
 class CDNMetrics:
     """CDN performance metrics"""
     cache_hits: int = 0
@@ -91,9 +350,14 @@ class CDNMetrics:
     bytes_served: int = 0
     bytes_saved_by_compression: int = 0
     compression_ratio: float = 0.0
-    average_response_time: float = 0.0
-    edge_server_hits: Dict[str, int] = field(default_factory=dict)
-    popular_files: Dict[str, int] = field(default_factory=dict)
+    total_response_time_ns: int = 0  # Summed per request; the average is derived on read
+    edge_server_hits: Dict[str, int] = field(default_factory=Counter)
+    popular_files: Dict[str, int] = field(default_factory=Counter)
+    
+    @property
+    def average_response_time(self) -> float:
+        """Average response time in seconds"""
+        return self.total_response_time_ns / max(self.total_requests, 1) / 1e9
 
 class FileCompressor:
     """File compression dengan gzip dan brotli"""
@@ -103,13 +367,35 @@ class FileCompressor:
         self.compression_stats = {
             'gzip_compressed': 0,
             'brotli_compressed': 0,
+            'zstd_compressed': 0,
             'compression_saved_bytes': 0
         }
+        # zlib releases the GIL, so chunks of one large payload compress on all cores
+        self._compress_pool = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count())
     
-    async def compress_content(self, content: bytes, content_type: str) -> Tuple[bytes, str]:
+    async def _gzip(self, content: bytes, level: int) -> bytes:
+        """Gzip content in a worker thread, splitting large payloads across the compress pool"""
+        if len(content) <= _PARALLEL_GZIP_THRESHOLD:
+            return await asyncio.to_thread(_gzip_compress, content, level, self.config.chunk_size)
+        
+        loop = asyncio.get_running_loop()
+        bounds = [(start, min(start + _PARALLEL_CHUNK_SIZE, len(content)))
+                  for start in range(0, len(content), _PARALLEL_CHUNK_SIZE)]
+        crc, *deflated = await asyncio.gather(
+            loop.run_in_executor(self._compress_pool, zlib.crc32, content),
+            *(loop.run_in_executor(self._compress_pool, _deflate_chunk, content, start, end, level)
+              for start, end in bounds)
+        )
+        return _gzip_member(deflated, crc, len(content), level)
+    
+    async def compress_content(self, content: bytes, content_type: str,
+                               headers: Dict = None) -> Tuple[bytes, str]:
         """
         Compress content based on type and size
         
+        Clients whose Accept-Encoding lists zstd get multithreaded zstd, which costs far less
+        CPU than brotli for similar savings; everyone else gets brotli or gzip.
+        
         Returns:
             Tuple of (compressed_content, compression_type)
         """
@@ -120,10 +406,22 @@ class FileCompressor:
         if self._is_already_compressed(content_type):
             return content, "none"
         
+        # Compression runs in a worker thread so large payloads don't block the event loop;
+        # brotli latency climbs steeply with quality, so payloads over 1MB use a lower one
+        chunk_size = self.config.chunk_size
+        
         try:
+            if self.config.enable_zstd and zstd is not None and (_parse_accept_encoding(headers) or {}).get('zstd', 0) > 0:
+                compressed = await asyncio.to_thread(_zstd_compress, content, self.config.zstd_level)
+                if len(compressed) < len(content) * 0.9:  # At least 10% reduction
+                    self.compression_stats['zstd_compressed'] += 1
+                    self.compression_stats['compression_saved_bytes'] += (len(content) - len(compressed))
+                    return compressed, "zstd"
+            
             # Try brotli first (better compression)
             if self.config.enable_brotli and self._should_compress_brotli(content_type):
-                compressed = brotli.compress(content, quality=6)
+                quality = 4 if len(content) > 1024 * 1024 else 6
+                compressed = await asyncio.to_thread(_brotli_compress, content, quality, chunk_size)
                 if len(compressed) < len(content) * 0.9:  # At least 10% reduction
                     self.compression_stats['brotli_compressed'] += 1
                     self.compression_stats['compression_saved_bytes'] += (len(content) - len(compressed))
@@ -131,7 +429,7 @@ class FileCompressor:
             
             # Fallback to gzip
             if self.config.enable_gzip:
-                compressed = gzip.compress(content, compresslevel=6)
+                compressed = await self._gzip(content, 6)
                 if len(compressed) < len(content) * 0.9:  # At least 10% reduction
                     self.compression_stats['gzip_compressed'] += 1
                     self.compression_stats['compression_saved_bytes'] += (len(content) - len(compressed))
@@ -143,109 +441,358 @@ class FileCompressor:
             logger.error(f"Compression error: {e}")
             return content, "none"
     
+    async def compress_variants(self, content: bytes, content_type: str) -> Dict[str, bytes]:
+        """
+        Compress content once per supported encoding at maximum ratio, for storing in the cache
+        
+        Cache writes are the cold path, so brotli runs at quality 11, gzip at level 9 and
+        zstd (when installed) at level 19; they run concurrently in worker threads.
+        
+        Returns:
+            Dictionary of encoding -> compressed bytes, only for encodings that save at least 10%
+        """
+        if len(content) < self.config.compression_threshold or self._is_already_compressed(content_type):
+            return {}
+        
+        chunk_size = self.config.chunk_size
+        jobs = {}
+        if self.config.enable_brotli and self._should_compress_brotli(content_type):
+            jobs["br"] = asyncio.to_thread(_brotli_compress, content, 11, chunk_size)
+        if self.config.enable_gzip:
+            jobs["gzip"] = self._gzip(content, 9)
+        if self.config.enable_zstd and zstd is not None:
+            jobs["zstd"] = asyncio.to_thread(_zstd_compress, content, 19)
+        
+        results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+        variants = {}
+        for encoding, compressed in zip(jobs, results):
+            if isinstance(compressed, Exception):
+                logger.error(f"Compression error ({encoding}): {compressed}")
+            elif len(compressed) < len(content) * 0.9:  # At least 10% reduction
+                variants[encoding] = compressed
+        
+        if "br" in variants:
+            self.compression_stats['brotli_compressed'] += 1
+        if "gzip" in variants:
+            self.compression_stats['gzip_compressed'] += 1
+        if "zstd" in variants:
+            self.compression_stats['zstd_compressed'] += 1
+        if variants:
+            self.compression_stats['compression_saved_bytes'] += len(content) - min(map(len, variants.values()))
+        return variants
+    
     def _is_already_compressed(self, content_type: str) -> bool:
         """Check if content type is already compressed"""
-        compressed_types = [
-            'image/',
-            'video/',
-            'audio/',
-            'application/zip',
-            'application/gzip',
-            'application/x-brotli',
-            'application/pdf'
-        ]
-        return any(content_type.startswith(ct) for ct in compressed_types)
+        return _is_compressed_type(content_type)
     
     def _should_compress_brotli(self, content_type: str) -> bool:
         """Check if content type should use brotli compression"""
-        brotli_friendly_types = [
-            'text/',
-            'application/javascript',
-            'application/json',
-            'application/xml',
-            'application/css'
-        ]
-        return any(content_type.startswith(ct) for ct in brotli_friendly_types)
+        return _is_brotli_friendly_type(content_type)
     
     async def decompress_content(self, content: bytes, compression_type: str) -> bytes:
         """Decompress content"""
         try:
             if compression_type == "br":
-                return brotli.decompress(content)
+                return await asyncio.to_thread(brotli.decompress, content)
             elif compression_type == "gzip":
-                return gzip.decompress(content)
+                return await asyncio.to_thread(gzip.decompress, content)
+            elif compression_type == "zstd" and zstd is not None:
+                return await asyncio.to_thread(zstd.ZstdDecompressor().decompress, content)
             else:
                 return content
         except Exception as e:
             logger.error(f"Decompression error: {e}")
             return content
 
+class FrequencySketch:
+    """
+    TinyLFU frequency estimator: a 4-row count-min sketch behind a doorkeeper bloom filter
+    
+    A key's first sighting only sets its doorkeeper bits, so one-off requests never reach
+    the sketch. Counters are halved every sample_size increments so old popularity fades.
+    """
+    
+    def __init__(self, width_bits: int = 18, doorkeeper_bits: int = 20, sample_size: int = None):
+        self.width_mask = (1 << width_bits) - 1
+        self.doorkeeper_mask = (1 << doorkeeper_bits) - 1
+        self.counters = np.zeros((4, 1 << width_bits), dtype=np.uint8)
+        self.doorkeeper = np.zeros(1 << doorkeeper_bits, dtype=bool)
+        self.sample_size = sample_size or 10 * (1 << width_bits)
+        self.additions = 0
+        self._rows = np.arange(4)
+    
+    @staticmethod
+    def _hashes(key: str) -> np.ndarray:
+        """Four independent 32-bit hashes of the key"""
+        return np.frombuffer(hashlib.blake2b(key.encode(), digest_size=16).digest(), dtype=np.uint32)
+    
+    def increment(self, key: str):
+        """Record one access to key"""
+        hashes = self._hashes(key)
+        doorkeeper_idx = hashes & self.doorkeeper_mask
+        if not self.doorkeeper[doorkeeper_idx].all():
+            self.doorkeeper[doorkeeper_idx] = True
+        else:
+            idx = hashes & self.width_mask
+            counts = self.counters[self._rows, idx]
+            self.counters[self._rows, idx] = np.minimum(counts, 254) + 1
+        
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+    
+    def estimate(self, key: str) -> int:
+        """Estimated access frequency of key"""
+        hashes = self._hashes(key)
+        if not self.doorkeeper[hashes & self.doorkeeper_mask].all():
+            return 0
+        return int(self.counters[self._rows, hashes & self.width_mask].min()) + 1
+    
+    def reset(self):
+        """Age the sketch by halving every counter and clearing the doorkeeper"""
+        self.counters >>= 1
+        self.doorkeeper[:] = False
+        self.additions //= 2
+
 class CacheManager:
     """Intelligent cache management dengan LRU dan TTL"""
     
     def __init__(self, config: CDNConfig, redis_client: Optional[redis.Redis] = None):
         self.config = config
         self.redis_client = redis_client
-        self.cache_entries: Dict[str, CacheEntry] = {}
-        self.access_log: deque = deque(maxlen=10000)
+        # Insertion order is recency order: hits move to the end, eviction pops from the front
+        self.cache_entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        # Sorted (source_path, cache_key) pairs, so prefix invalidation is a range lookup
+        self._path_index: List[Tuple[str, str]] = []
+        # Bytes of frequently hit cache files, keyed by cache file path, in LRU order
+        self._hot: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._hot_bytes = 0
+        self.access_log = np.zeros(ACCESS_LOG_SIZE, dtype=ACCESS_LOG_DTYPE)
+        self._log_idx = 0
+        self._log_count = 0
+        # TinyLFU admission: a new entry only displaces an LRU victim that is less popular
+        self.frequency_sketch = FrequencySketch()
         self.cache_size = 0
         self.max_cache_size = 2 * 1024 * 1024 * 1024  # 2GB limit
         
         # Ensure cache directory exists
         Path(self.config.storage_path).mkdir(parents=True, exist_ok=True)
+        self._shard_dirs: set = set()
+    
+    def _cache_file_path(self, cache_key: str, suffix: str = "cache") -> str:
+        """
+        Path of a cache file, sharded two levels deep by the key's first four characters
+        
+        Keeps directories small (at most 256 x 256 shards), so lookups and removals stay
+        fast with millions of cached files.
+        """
+        shard_dir = os.path.join(self.config.storage_path, cache_key[:2], cache_key[2:4])
+        if shard_dir not in self._shard_dirs:
+            os.makedirs(shard_dir, exist_ok=True)
+            self._shard_dirs.add(shard_dir)
+        return os.path.join(shard_dir, f"{cache_key}.{suffix}")
     
     def _generate_cache_key(self, file_path: str, params: Dict = None) -> str:
         """Generate cache key dari file path dan parameters"""
-        key_string = file_path
-        if params:
-            key_string += json.dumps(params, sort_keys=True)
-        return hashlib.sha256(key_string.encode()).hexdigest()
+        if not params:
+            return _cached_cache_key(file_path, ())
+        try:
+            # Values are tagged with their type: 1, 1.0 and True hash alike and would share
+            # one memoized key, although they serialize to different cache keys
+            return _cached_cache_key(
+                file_path, tuple((name, type(value).__qualname__, value) for name, value in sorted(params.items()))
+            )
+        except TypeError:
+            # Unhashable or unorderable parameter values: hash without memoizing
+            return _hash_cache_key(file_path, params)
     
     async def get_cached_file(self, cache_key: str) -> Optional[CacheEntry]:
         """Get cached file jika tersedia"""
         
         # Check memory cache
-        if cache_key in self.cache_entries:
-            entry = self.cache_entries[cache_key]
-            entry.last_accessed = datetime.now()
-            entry.access_count += 1
-            
-            # Check if file still exists
-            if os.path.exists(entry.file_path):
-                return entry
-            else:
-                # Remove from cache if file doesn't exist
-                del self.cache_entries[cache_key]
-                self.cache_size -= entry.file_size
+        entry = self._get_memory_entry(cache_key)
         
         # Check Redis cache jika tersedia
-        if self.redis_client:
+        if entry is None and self.redis_client:
             try:
                 cached_data = await self.redis_client.get(f"cdn:{cache_key}")
-                if cached_data:
-                    entry_data = json.loads(cached_data)
-                    entry = CacheEntry(**entry_data)
-                    
-                    # Restore to memory cache
-                    if os.path.exists(entry.file_path):
-                        self.cache_entries[cache_key] = entry
-                        self.cache_size += entry.file_size
-                        return entry
+                entry = self._restore_entry(cache_key, cached_data)
+            except Exception as e:
+                logger.error(f"Redis cache get error: {e}")
+        
+        self._record_access(cache_key, entry.file_size if entry else 0, entry is not None)
+        return entry
+    
+    async def get_cached_files(self, cache_keys: List[str]) -> Dict[str, Optional[CacheEntry]]:
+        """Get several cached files, fetching memory misses from Redis in one round trip"""
+        results = {cache_key: self._get_memory_entry(cache_key) for cache_key in cache_keys}
+        
+        missing = [cache_key for cache_key, entry in results.items() if entry is None]
+        if missing and self.redis_client:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for cache_key in missing:
+                        pipe.get(f"cdn:{cache_key}")
+                    cached_rows = await pipe.execute()
+                for cache_key, cached_data in zip(missing, cached_rows):
+                    results[cache_key] = self._restore_entry(cache_key, cached_data)
             except Exception as e:
                 logger.error(f"Redis cache get error: {e}")
         
+        for cache_key, entry in results.items():
+            self._record_access(cache_key, entry.file_size if entry else 0, entry is not None)
+        return results
+    
+    def _record_access(self, cache_key: str, size: int, hit: bool):
+        """Write one access record into the preallocated ring, overwriting the oldest"""
+        rec = self.access_log[self._log_idx]
+        rec['ts'] = time.time()
+        try:
+            rec['key_hash'] = int(cache_key[:16], 16)
+        except ValueError:
+            # Keys not produced by _generate_cache_key aren't hex
+            rec['key_hash'] = hash(cache_key) & 0xFFFFFFFFFFFFFFFF
+        rec['size'] = size
+        rec['hit'] = hit
+        self._log_idx = (self._log_idx + 1) & (ACCESS_LOG_SIZE - 1)
+        self._log_count += 1
+        self.frequency_sketch.increment(cache_key)
+    
+    def get_access_log(self) -> np.ndarray:
+        """Get recorded accesses, oldest first"""
+        if self._log_count < ACCESS_LOG_SIZE:
+            return self.access_log[:self._log_idx].copy()
+        return np.roll(self.access_log, -self._log_idx)
+    
+    def _get_memory_entry(self, cache_key: str) -> Optional[CacheEntry]:
+        """
+        Get cached file from the memory cache
+        
+        The cache file isn't stat()ed here; a file removed behind the cache surfaces as
+        FileNotFoundError when it is read, and the caller drops the entry then.
+        """
+        entry = self.cache_entries.get(cache_key)
+        if entry is None:
+            return None
+        
+        entry.last_accessed = time.monotonic_ns()
+        entry.access_count += 1
+        self.cache_entries.move_to_end(cache_key)
+        return entry
+    
+    def _add_entry(self, entry: CacheEntry):
+        """Add an entry as most recently used, replacing any entry under the same key"""
+        self.remove_entry(entry.key)
+        self.cache_entries[entry.key] = entry
+        self.cache_size += entry.stored_size
+        if entry.source_path:
+            bisect.insort(self._path_index, (entry.source_path, entry.key))
+    
+    def remove_entry(self, cache_key: str) -> Optional[CacheEntry]:
+        """Drop an entry from the memory cache and its indexes; its files are left alone"""
+        entry = self.cache_entries.pop(cache_key, None)
+        if entry is None:
+            return None
+        
+        self.cache_size -= entry.stored_size
+        for path in {entry.file_path, *(path for path, _ in entry.variants.values())}:
+            self._unpin_content(path)
+        if entry.source_path:
+            i = bisect.bisect_left(self._path_index, (entry.source_path, cache_key))
+            if i < len(self._path_index) and self._path_index[i] == (entry.source_path, cache_key):
+                del self._path_index[i]
+        return entry
+    
+    async def read_content(self, entry: CacheEntry, path: str) -> bytes:
+        """Read a cache file of entry, serving it from memory once the entry is hot"""
+        content = self._hot.get(path)
+        if content is not None:
+            self._hot.move_to_end(path)
+            return content
+        
+        content = await asyncio.to_thread(_read_file, path)
+        if entry.access_count >= self.config.hot_access_threshold:
+            self.pin_content(path, content)
+        return content
+    
+    def pin_content(self, path: str, content: bytes):
+        """Keep a cache file's bytes in memory, evicting the least recently used pinned files"""
+        if len(content) > self.config.hot_cache_size:
+            return
+        
+        self._unpin_content(path)
+        self._hot[path] = content
+        self._hot_bytes += len(content)
+        while self._hot_bytes > self.config.hot_cache_size:
+            _, evicted = self._hot.popitem(last=False)
+            self._hot_bytes -= len(evicted)
+    
+    def _unpin_content(self, path: str):
+        """Drop a cache file's pinned bytes, if any"""
+        content = self._hot.pop(path, None)
+        if content is not None:
+            self._hot_bytes -= len(content)
+    
+    def keys_with_prefix(self, prefix: str) -> List[str]:
+        """Cache keys of entries whose source path starts with prefix"""
+        start = bisect.bisect_left(self._path_index, (prefix,))
+        end = bisect.bisect_left(self._path_index, (prefix + "\U0010ffff",))
+        return [cache_key for _, cache_key in self._path_index[start:end]]
+    
+    def _restore_entry(self, cache_key: str, cached_data: Optional[bytes]) -> Optional[CacheEntry]:
+        """Restore a Redis cache entry into the memory cache if its file still exists"""
+        if not cached_data:
+            return None
+        
+        entry_data = orjson.loads(cached_data)
+        if isinstance(entry_data['created_at'], str):
+            # Entries written before timestamps became integers
+            entry_data['created_at'] = int(datetime.fromisoformat(entry_data['created_at']).timestamp() * 1e9)
+        entry_data['last_accessed'] = time.monotonic_ns()
+        entry_data['variants'] = {
+            encoding: tuple(variant) for encoding, variant in entry_data.get('variants', {}).items()
+        }
+        entry = CacheEntry(**entry_data)
+        
+        # Restore to memory cache only if every encoding it can serve is still on disk
+        paths = {entry.file_path, *(path for path, _ in entry.variants.values())}
+        if all(os.path.exists(path) for path in paths):
+            self._add_entry(entry)
+            return entry
         return None
     
+    async def delete_redis_entries(self, cache_keys: List[str]):
+        """Delete Redis cache entries in one pipelined round trip"""
+        if not self.redis_client or not cache_keys:
+            return
+        
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for cache_key in cache_keys:
+                    pipe.delete(f"cdn:{cache_key}")
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error removing Redis cache: {e}")
+    
     async def cache_file(self, cache_key: str, file_path: str, content_type: str, 
-                        compressed_content: bytes, compression_type: str) -> CacheEntry:
-        """Cache file dengan metadata"""
+                        compressed_content: bytes, compression_type: str,
+                        variants: Dict[str, bytes] = None) -> CacheEntry:
+        """Cache file dengan metadata, plus any extra precompressed encoding variants"""
         
         # Create cache file path
-        cache_file_path = os.path.join(self.config.storage_path, f"{cache_key}.cache")
+        cache_file_path = self._cache_file_path(cache_key)
         
-        # Write compressed content to cache
-        async with aiofiles.open(cache_file_path, 'wb') as f:
-            await f.write(compressed_content)
+        # Write compressed content to cache; the primary encoding lives in the main cache file
+        stored_variants = {}
+        writes = [asyncio.to_thread(_write_file, cache_file_path, compressed_content)]
+        for encoding, content in (variants or {}).items():
+            if encoding == compression_type:
+                stored_variants[encoding] = (cache_file_path, len(content))
+                continue
+            variant_path = self._cache_file_path(cache_key, f"{encoding}.cache")
+            stored_variants[encoding] = (variant_path, len(content))
+            writes.append(asyncio.to_thread(_write_file, variant_path, content))
+        await asyncio.gather(*writes)
         
         # Create cache entry
         entry = CacheEntry(
@@ -253,17 +800,18 @@ class CacheManager:
             file_path=cache_file_path,
             content_type=content_type,
             file_size=len(compressed_content),
-            created_at=datetime.now(),
-            last_accessed=datetime.now(),
+            created_at=time.time_ns(),
+            last_accessed=time.monotonic_ns(),
             access_count=1,
             etag=f'"{cache_key}"',
             compression_type=compression_type if compression_type != "none" else None,
-            compressed_size=len(compressed_content) if compression_type != "none" else None
+            compressed_size=len(compressed_content) if compression_type != "none" else None,
+            variants=stored_variants,
+            source_path=file_path
         )
         
         # Add to memory cache
-        self.cache_entries[cache_key] = entry
-        self.cache_size += entry.file_size
+        self._add_entry(entry)
         
         # Cache in Redis jika tersedia
         if self.redis_client:
@@ -273,62 +821,61 @@ class CacheManager:
                     'file_path': entry.file_path,
                     'content_type': entry.content_type,
                     'file_size': entry.file_size,
-                    'created_at': entry.created_at.isoformat(),
+                    'created_at': entry.created_at,
                     'etag': entry.etag,
                     'compression_type': entry.compression_type,
-                    'compressed_size': entry.compressed_size
+                    'compressed_size': entry.compressed_size,
+                    'variants': entry.variants,
+                    'source_path': entry.source_path
                 }
                 await self.redis_client.setex(
                     f"cdn:{cache_key}",
                     self.config.cache_ttl,
-                    json.dumps(entry_data)
+                    orjson.dumps(entry_data)
                 )
             except Exception as e:
                 logger.error(f"Redis cache set error: {e}")
         
         # Check cache size and evict jika perlu
-        await self._evict_if_necessary()
+        await self._evict_if_necessary(candidate_key=cache_key)
         
         return entry
     
-    async def _evict_if_necessary(self):
-        """Evict cache entries jika cache terlalu besar"""
+    async def _evict_if_necessary(self, candidate_key: str = None):
+        """
+        Evict cache entries jika cache terlalu besar
+        
+        candidate_key is a newly cached entry; it is only admitted over an LRU victim
+        with a lower estimated frequency, otherwise the candidate itself is evicted.
+        """
         if self.cache_size <= self.max_cache_size:
             return
         
-        # Sort by last accessed time (LRU)
-        sorted_entries = sorted(
-            self.cache_entries.items(),
-            key=lambda x: x[1].last_accessed
-        )
-        
-        # Evict oldest entries
-        evicted_count = 0
-        for cache_key, entry in sorted_entries:
-            if self.cache_size <= self.max_cache_size * 0.8:  # Target 80% capacity
-                break
+        # Evict least recently used entries
+        evicted_keys = []
+        while self.cache_entries and self.cache_size > self.max_cache_size * 0.8:  # Target 80% capacity
+            victim_key = next(iter(self.cache_entries))
+            if (candidate_key and victim_key != candidate_key and candidate_key in self.cache_entries
+                    and self.frequency_sketch.estimate(candidate_key) <= self.frequency_sketch.estimate(victim_key)):
+                victim_key = candidate_key
+            if victim_key == candidate_key:
+                candidate_key = None
             
             # Remove from cache
-            del self.cache_entries[cache_key]
-            self.cache_size -= entry.file_size
+            cache_key, entry = victim_key, self.remove_entry(victim_key)
             
             # Remove cache file
             try:
-                if os.path.exists(entry.file_path):
-                    os.remove(entry.file_path)
+                _remove_entry_files(entry)
             except Exception as e:
                 logger.error(f"Error removing cache file: {e}")
             
-            # Remove from Redis
-            if self.redis_client:
-                try:
-                    await self.redis_client.delete(f"cdn:{cache_key}")
-                except Exception as e:
-                    logger.error(f"Error removing Redis cache: {e}")
-            
-            evicted_count += 1
+            evicted_keys.append(cache_key)
+        
+        # Remove from Redis
+        await self.delete_redis_entries(evicted_keys)
         
-        logger.info(f"Evicted {evicted_count} cache entries")
+        logger.info(f"Evicted {len(evicted_keys)} cache entries")
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
@@ -372,13 +919,17 @@ class CDNManager:
         self.metrics = CDNMetrics()
         self.edge_servers: Dict[str, EdgeServer] = {}
         self.redis_client: Optional[redis.Redis] = None
+        # Cache fills in progress, so concurrent misses for one key share a single load
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # One pooled session for all origin fetches, opened in start()
+        self._http: Optional[aiohttp.ClientSession] = None
         
         # Initialize Redis connection untuk distributed caching
         if self.config.enable_persistent_cache:
-            self.redis_client = aioredis.from_url(
+            # Entries are stored as orjson bytes, so skip decoding replies to str
+            self.redis_client = redis.from_url(
                 "redis://localhost:6379/2",  # Use different DB for CDN
-                encoding="utf-8",
-                decode_responses=True
+                decode_responses=False
             )
             self.cache_manager.redis_client = self.redis_client
     
@@ -395,6 +946,11 @@ class CDNManager:
             for server in default_servers:
                 self.add_edge_server(server)
             
+            self._http = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.config.timeout),
+                connector=aiohttp.TCPConnector(limit=200, ttl_dns_cache=300, keepalive_timeout=60)
+            )
+            
             logger.info("CDN Manager started successfully")
             
         except Exception as e:
@@ -404,6 +960,8 @@ class CDNManager:
     async def stop(self):
         """Stop CDN manager"""
         try:
+            if self._http:
+                await self._http.close()
             if self.redis_client:
                 await self.redis_client.close()
             logger.info("CDN Manager stopped")
@@ -444,7 +1002,7 @@ class CDNManager:
             Dictionary dengan content dan metadata
         """
         
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         self.metrics.total_requests += 1
         
         try:
@@ -454,28 +1012,36 @@ class CDNManager:
             # Check cache
             cached_entry = await self.cache_manager.get_cached_file(cache_key)
             
+            if cached_entry:
+                # Serve the stored encoding the client prefers as-is; only decompress
+                # for clients that accept none of them
+                variant = cached_entry.select_variant(headers)
+                try:
+                    if variant:
+                        content_encoding, variant_path, _ = variant
+                        content = await self.cache_manager.read_content(cached_entry, variant_path)
+                    else:
+                        content_encoding = None
+                        content = await self.cache_manager.read_content(cached_entry, cached_entry.file_path)
+                except FileNotFoundError:
+                    # Cache file was removed behind the cache; drop the entry and refill it below
+                    self.cache_manager.remove_entry(cache_key)
+                    cached_entry = None
+            
             if cached_entry:
                 self.metrics.cache_hits += 1
                 
-                # Read cached content
-                async with aiofiles.open(cached_entry.file_path, 'rb') as f:
-                    content = await f.read()
-                
-                # Decompress jika perlu
-                if cached_entry.compression_type:
+                if not variant and cached_entry.compression_type:
                     content = await self.compressor.decompress_content(
                         content, cached_entry.compression_type
                     )
                 
-                response_time = time.time() - start_time
-                self.metrics.average_response_time = (
-                    (self.metrics.average_response_time * (self.metrics.total_requests - 1) + response_time) 
-                    / self.metrics.total_requests
-                )
+                response_time = self._record_response(start_ns, file_path)
                 
                 return {
                     'content': content,
                     'content_type': cached_entry.content_type,
+                    'content_encoding': content_encoding,
                     'etag': cached_entry.etag,
                     'cache_hit': True,
                     'compression': cached_entry.compression_type,
@@ -488,46 +1054,40 @@ class CDNManager:
             # Get optimal edge server
             edge_server = self.get_optimal_edge_server(client_region)
             if edge_server:
-                self.metrics.edge_server_hits[edge_server.server_id] = \
-                    self.metrics.edge_server_hits.get(edge_server.server_id, 0) + 1
+                self.metrics.edge_server_hits[edge_server.server_id] += 1
             
-            # Load content dari origin atau file system
-            content, content_type = await self._load_content(file_path)
+            # Only the first concurrent miss for a key fills the cache; the rest await it
+            fill = self._inflight.get(cache_key)
+            if fill is None:
+                fill = asyncio.ensure_future(self._fill_cache(cache_key, file_path))
+                self._inflight[cache_key] = fill
+                fill.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+            filled = await asyncio.shield(fill)
             
-            if content is None:
+            if filled is None:
                 return None
             
-            # Compress content
-            compressed_content, compression_type = await self.compressor.compress_content(
-                content, content_type
-            )
-            
-            # Cache the content
-            cache_entry = await self.cache_manager.cache_file(
-                cache_key, file_path, content_type, compressed_content, compression_type
-            )
+            cache_entry, content, variants = filled
             
             # Update metrics
             self.metrics.bytes_served += len(content)
-            if compression_type != "none":
-                self.metrics.bytes_saved_by_compression += (len(content) - len(compressed_content))
+            if cache_entry.compression_type:
+                self.metrics.bytes_saved_by_compression += (len(content) - cache_entry.compressed_size)
+            response_time = self._record_response(start_ns, file_path)
             
-            # Track popular files
-            self.metrics.popular_files[file_path] = \
-                self.metrics.popular_files.get(file_path, 0) + 1
-            
-            response_time = time.time() - start_time
-            self.metrics.average_response_time = (
-                (self.metrics.average_response_time * (self.metrics.total_requests - 1) + response_time) 
-                / self.metrics.total_requests
-            )
+            content_encoding = None
+            variant = cache_entry.select_variant(headers)
+            if variant:
+                content_encoding = variant[0]
+                content = variants[content_encoding]
             
             return {
-                'content': compressed_content if compression_type != "none" else content,
-                'content_type': content_type,
+                'content': content,
+                'content_type': cache_entry.content_type,
+                'content_encoding': content_encoding,
                 'etag': cache_entry.etag,
                 'cache_hit': False,
-                'compression': compression_type,
+                'compression': cache_entry.compression_type or "none",
                 'response_time': response_time
             }
             
@@ -535,34 +1095,180 @@ class CDNManager:
             logger.error(f"Error serving content: {e}")
             return None
     
+    def _record_response(self, start_ns: int, file_path: str) -> float:
+        """
+        Record a served request's response time and file popularity
+        
+        Returns:
+            Response time in seconds
+        """
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        self.metrics.total_response_time_ns += elapsed_ns
+        self.metrics.popular_files[file_path] += 1
+        return elapsed_ns / 1e9
+    
+    async def prewarm_popular_files(self, top_n: int = 100) -> int:
+        """
+        Pin the cached bytes of the most requested files in memory
+        
+        Returns:
+            Number of cache files pinned
+        """
+        popular = self.metrics.popular_files.most_common(top_n)
+        pinned = 0
+        
+        for file_path, _ in popular:
+            entry = self.cache_manager.cache_entries.get(self.cache_manager._generate_cache_key(file_path))
+            if entry is None:
+                continue
+            
+            paths = list({entry.file_path, *(path for path, _ in entry.variants.values())})
+            for path, content in zip(paths, await asyncio.gather(
+                *(asyncio.to_thread(_read_file, path) for path in paths), return_exceptions=True
+            )):
+                if not isinstance(content, Exception):
+                    self.cache_manager.pin_content(path, content)
+                    pinned += 1
+        
+        return pinned
+    
+    async def _fill_cache(self, cache_key: str, 
+                          file_path: str) -> Optional[Tuple[CacheEntry, bytes, Dict[str, bytes]]]:
+        """
+        Load, compress and cache content for a missed key
+        
+        Returns:
+            Tuple of (cache_entry, original_content, variants), atau None jika content tidak ditemukan
+        """
+        
+        # Load content dari origin atau file system
+        content, content_type = await self._load_content(file_path)
+        
+        if content is None:
+            return None
+        
+        # Compress content once per encoding; the smallest variant is the primary one
+        variants = await self.compressor.compress_variants(content, content_type)
+        if variants:
+            compression_type = min(variants, key=lambda encoding: len(variants[encoding]))
+            compressed_content = variants[compression_type]
+        else:
+            compressed_content, compression_type = content, "none"
+        
+        # Cache the content
+        cache_entry = await self.cache_manager.cache_file(
+            cache_key, file_path, content_type, compressed_content, compression_type,
+            variants=variants
+        )
+        return cache_entry, content, variants
+    
+    async def serve_content_sendfile(self, file_path: str, writer: asyncio.StreamWriter,
+                                     params: Dict = None, headers: Dict = None) -> int:
+        """
+        Serve content as an HTTP/1.1 response, sending the cache file body with zero-copy sendfile
+        
+        The stored variant is resolved before anything is written, so the response head
+        carries its Content-Encoding. Nothing is written when the content is not found.
+        
+        Returns:
+            Number of body bytes written to the stream (0 jika content tidak ditemukan)
+        """
+        
+        start_ns = time.perf_counter_ns()
+        cache_key = self.cache_manager._generate_cache_key(file_path, params)
+        cached_entry = await self.cache_manager.get_cached_file(cache_key)
+        
+        variant = cached_entry.select_variant(headers) if cached_entry else None
+        if cached_entry is None or (cached_entry.compression_type and variant is None):
+            # Cache miss or an encoding the client can't take; fall back to the buffered path
+            return await self._write_buffered(file_path, writer, params, headers)
+        
+        # The cached bytes go from the page cache to the socket without a Python copy
+        content_encoding, path, size = variant or (None, cached_entry.file_path, cached_entry.file_size)
+        loop = asyncio.get_running_loop()
+        try:
+            cache_file = await asyncio.to_thread(open, path, 'rb')
+        except FileNotFoundError:
+            # Cache file was removed behind the cache; drop the entry everywhere so the
+            # buffered path refills it instead of restoring it from Redis
+            self.cache_manager.remove_entry(cache_key)
+            await self.cache_manager.delete_redis_entries([cache_key])
+            return await self._write_buffered(file_path, writer, params, headers)
+        
+        self.metrics.total_requests += 1
+        self.metrics.cache_hits += 1
+        writer.write(_response_head(cached_entry.content_type, size, cached_entry.etag, content_encoding))
+        try:
+            await writer.drain()
+            sent = await loop.sendfile(writer.transport, cache_file, count=size)
+        finally:
+            cache_file.close()
+        
+        self.metrics.bytes_served += sent
+        self._record_response(start_ns, file_path)
+        return sent
+    
+    async def _write_buffered(self, file_path: str, writer: asyncio.StreamWriter,
+                              params: Optional[Dict], headers: Optional[Dict]) -> int:
+        """Serve content through serve_content and write it as an HTTP/1.1 response"""
+        result = await self.serve_content(file_path, params=params, headers=headers)
+        if result is None:
+            return 0
+        writer.write(_response_head(result['content_type'], len(result['content']),
+                                    result['etag'], result['content_encoding']))
+        writer.write(result['content'])
+        await writer.drain()
+        return len(result['content'])
+    
     async def _load_content(self, file_path: str) -> Tuple[Optional[bytes], str]:
         """Load content dari file system atau origin"""
         
         try:
             # Try to load from local file system
-            if os.path.exists(file_path):
-                async with aiofiles.open(file_path, 'rb') as f:
-                    content = await f.read()
-                
-                # Detect content type
-                content_type, _ = mimetypes.guess_type(file_path)
-                content_type = content_type or 'application/octet-stream'
-                
-                return content, content_type
+            try:
+                content = await asyncio.to_thread(_read_file, file_path)
+            except FileNotFoundError:
+                # If not found locally, fetch from origin server
+                if self.config.origin_url and self._http:
+                    return await self._fetch_origin(f"{self.config.origin_url.rstrip('/')}/{file_path.lstrip('/')}")
+                logger.warning(f"File not found: {file_path}")
+                return None, ""
             
-            # If not found locally, could fetch from origin server
-            # This would be implemented based on your origin server setup
-            logger.warning(f"File not found: {file_path}")
-            return None, ""
+            # Detect content type
+            content_type = _guess_content_type(file_path)
+            
+            return content, content_type
             
         except Exception as e:
             logger.error(f"Error loading content: {e}")
-            return entry
+            return None, ""
+    
+    async def _fetch_origin(self, url: str) -> Tuple[Optional[bytes], str]:
+        """Fetch content dari origin server over the shared connection pool"""
+        for attempt in range(self.config.max_retries):
+            try:
+                async with self._http.get(url) as response:
+                    if response.status == 404:
+                        logger.warning(f"File not found at origin: {url}")
+                        return None, ""
+                    response.raise_for_status()
+                    content = await response.read()
+                    if 'Content-Type' in response.headers:
+                        content_type = response.content_type
+                    else:
+                        content_type = _guess_content_type(url)
+                    return content, content_type
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Origin fetch failed ({attempt + 1}/{self.config.max_retries}): {url}: {e}")
+                if attempt + 1 < self.config.max_retries:
+                    await asyncio.sleep(self.config.retry_delay * (attempt + 1))
+        
+        return None, ""
     
     def get_file_stats(self, file_path: str) -> Optional[Dict[str, Any]]:
         """Get file statistics"""
-        cache_key = self._generate_cache_key(file_path)
-        entry = self.cache_entries.get(cache_key)
+        cache_key = self.cache_manager._generate_cache_key(file_path)
+        entry = self.cache_manager.cache_entries.get(cache_key)
         
         if entry:
             return {
@@ -571,8 +1277,8 @@ class CDNManager:
                 'compressed_size': entry.compressed_size,
                 'compression_ratio': (entry.file_size - (entry.compressed_size or entry.file_size)) / entry.file_size if entry.compressed_size else 0,
                 'access_count': entry.access_count,
-                'last_accessed': entry.last_accessed,
-                'created_at': entry.created_at,
+                'last_accessed': _monotonic_ns_to_datetime(entry.last_accessed).isoformat(),
+                'created_at': datetime.fromtimestamp(entry.created_at / 1e9).isoformat(),
                 'compression_type': entry.compression_type
             }
         return None
@@ -582,16 +1288,10 @@ class CDNManager:
         
         if file_path:
             cache_key = self.cache_manager._generate_cache_key(file_path)
-            if cache_key in self.cache_manager.cache_entries:
-                entry = self.cache_manager.cache_entries[cache_key]
-                
+            entry = self.cache_manager.remove_entry(cache_key)
+            if entry:
                 # Remove cache file
-                if os.path.exists(entry.file_path):
-                    os.remove(entry.file_path)
-                
-                # Remove from cache
-                del self.cache_manager.cache_entries[cache_key]
-                self.cache_manager.cache_size -= entry.file_size
+                _remove_entry_files(entry)
                 
                 # Remove from Redis
                 if self.redis_client:
@@ -601,14 +1301,20 @@ class CDNManager:
                 logger.info(f"Invalidated cache for: {file_path}")
         
         elif pattern:
-            # Invalidate by pattern (more complex implementation)
-            keys_to_remove = []
-            for cache_key, entry in self.cache_manager.cache_entries.items():
-                if pattern in entry.file_path:
-                    keys_to_remove.append(cache_key)
+            # Invalidate every entry whose source path starts with pattern
+            keys_to_remove = self.cache_manager.keys_with_prefix(pattern)
             
             for cache_key in keys_to_remove:
-                await self.invalidate_cache(entry.file_path)
+                entry = self.cache_manager.remove_entry(cache_key)
+                
+                # Remove cache file
+                _remove_entry_files(entry)
+                
+                self.metrics.cache_evictions += 1
+            
+            # Remove from Redis
+            await self.cache_manager.delete_redis_entries(keys_to_remove)
+            logger.info(f"Invalidated {len(keys_to_remove)} cache entries matching: {pattern}")
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get comprehensive CDN metrics"""
@@ -644,8 +1350,7 @@ class CDNManager:
                 for server_id, server in self.edge_servers.items()
             },
             'cache_stats': self.cache_manager.get_cache_stats(),
-            'popular_files': dict(sorted(self.metrics.popular_files.items(), 
-                                       key=lambda x: x[1], reverse=True)[:10]),
+            'popular_files': dict(self.metrics.popular_files.most_common(10)),
             'generated_at': datetime.now().isoformat()
         }
 
@@ -691,8 +1396,7 @@ if __name__ == "__main__":
             ]
             
             for filename, content, content_type in test_files:
-                async with aiofiles.open(filename, 'w') as f:
-                    await f.write(content)
+                await asyncio.to_thread(_write_file, filename, content.encode())
                 
                 # Serve content
                 result = await cdn.serve_content(filename)
@@ -8,11 +8,17 @@ import logging
 import time
 import json
 import hashlib
+import functools
+import math
+import re
 from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import date, datetime, time as dtime, timedelta
+from decimal import Decimal
+from uuid import UUID
 from contextlib import asynccontextmanager
 import asyncpg
+import orjson
 
 try:
     import redis.asyncio as redis
@@ -30,6 +36,103 @@ import aiofiles
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Regex dikompilasi sekali di level modul (dipakai di hot path setiap query)
+_WS_RE = re.compile(r'\s+')
+_PARAM_RE = re.compile(r'\$\d+|%s|\?')
+_POSITIONAL_PARAM_RE = re.compile(r'\$\d+')
+_STRING_LITERAL_RE = re.compile(r"'[^']*'")
+_NUMBER_RE = re.compile(r'\d+')
+
+
+def _short_hash(data: bytes) -> str:
+    """Hash pendek untuk cache key (BLAKE2b 64-bit, jauh lebih murah dari MD5 untuk input kecil)"""
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _tag_param(value: Any) -> List[Any]:
+    """Pasangan [nama tipe, nilai] sehingga 1 / '1' dan datetime / string ISO-nya tidak bentrok"""
+    type_name = type(value).__qualname__
+    if isinstance(value, (list, tuple)):
+        return [type_name, [_tag_param(item) for item in value]]
+    if isinstance(value, dict):
+        return [type_name, [[_tag_param(k), _tag_param(v)] for k, v in value.items()]]
+    if value is None or isinstance(value, str) or (isinstance(value, int) and -2**63 <= value < 2**64):
+        return [type_name, value]
+    # orjson menolak int di luar 64-bit tanpa memanggil default; repr juga membedakan nan/inf
+    return [type_name, repr(value)]
+
+
+def _encode_params(params: Tuple) -> bytes:
+    """Encode parameters secara kanonik; setiap nilai di-tag dengan tipenya"""
+    return orjson.dumps([_tag_param(param) for param in params])
+
+
+# Tipe non-JSON di hasil query: (tipe, nama tag, encode, decode); subclass ikut (asyncpg punya UUID sendiri),
+# jadi datetime harus dicek sebelum date
+_CACHED_TYPES = (
+    (datetime, "datetime", datetime.isoformat, datetime.fromisoformat),
+    (date, "date", date.isoformat, date.fromisoformat),
+    (dtime, "time", dtime.isoformat, dtime.fromisoformat),
+    (timedelta, "timedelta", lambda v: [v.days, v.seconds, v.microseconds], lambda v: timedelta(*v)),
+    (Decimal, "Decimal", str, Decimal),
+    (UUID, "UUID", str, UUID),
+    (bytes, "bytes", bytes.hex, bytes.fromhex),
+)
+
+
+def _encode_cached_value(value: Any) -> Any:
+    """Ubah hasil query ke struktur JSON; nilai non-JSON menjadi {"__type__": nama, "value": ...}"""
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if isinstance(value, int):
+        # orjson menolak int di luar 64-bit
+        return value if -2**63 <= value < 2**64 else {"__type__": "int", "value": str(value)}
+    if isinstance(value, float):
+        # orjson menulis nan/inf sebagai null
+        return value if math.isfinite(value) else {"__type__": "float", "value": repr(value)}
+    if isinstance(value, list):
+        return [_encode_cached_value(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__type__": "tuple", "value": [_encode_cached_value(item) for item in value]}
+    if isinstance(value, dict):
+        if "__type__" in value:
+            # Dict yang kebetulan punya key "__type__" tidak boleh terbaca sebagai tag
+            return {"__type__": "dict", "value": [[k, _encode_cached_value(v)] for k, v in value.items()]}
+        return {k: _encode_cached_value(v) for k, v in value.items()}
+    for cls, type_name, encode, _ in _CACHED_TYPES:
+        if isinstance(value, cls):
+            return {"__type__": type_name, "value": encode(value)}
+    raise TypeError(f"Type is not cacheable: {type(value).__qualname__}")
+
+
+def _decode_cached_value(value: Any) -> Any:
+    """Kebalikan _encode_cached_value; tag yang tidak dikenal memunculkan KeyError"""
+    if isinstance(value, list):
+        return [_decode_cached_value(item) for item in value]
+    if isinstance(value, dict):
+        type_name = value.get("__type__")
+        if type_name is None:
+            return {k: _decode_cached_value(v) for k, v in value.items()}
+        return _CACHED_DECODERS[type_name](value["value"])
+    return value
+
+
+_CACHED_DECODERS = {
+    "int": int,
+    "float": float,
+    "tuple": lambda items: tuple(_decode_cached_value(item) for item in items),
+    "dict": lambda items: {k: _decode_cached_value(v) for k, v in items},
+    **{type_name: decode for _, type_name, _, decode in _CACHED_TYPES},
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def _hash_normalized(query: str) -> Tuple[str, str]:
+    """Normalize query dan hitung hash-nya; di-cache karena query literal berulang terus"""
+    # Collapse whitespace, lowercase, lalu seragamkan placeholder
+    normalized = _PARAM_RE.sub('?', _WS_RE.sub(' ', query.strip()).lower())
+    return normalized, _short_hash(normalized.encode())
+
 @dataclass
 class DatabaseConfig:
     """Database configuration"""
@@ -177,8 +280,9 @@ class QueryCache:
         
     def _generate_cache_key(self, query: str, params: Tuple) -> str:
         """Generate cache key dari query dan parameters"""
-        query_hash = hashlib.md5(query.encode()).hexdigest()
-        params_hash = hashlib.md5(str(params).encode()).hexdigest()
+        # Query hash disimpan sebagai segmen terpisah agar invalidate() bisa match per query
+        query_hash = _short_hash(query.encode())
+        params_hash = _short_hash(_encode_params(params))
         return f"query_cache:{query_hash}:{params_hash}"
     
     async def get(self, query: str, params: Tuple = ()) -> Optional[Any]:
@@ -186,13 +290,14 @@ class QueryCache:
         if not self.redis:
             return None
         
-        cache_key = self._generate_cache_key(query, params)
-        
         try:
+            cache_key = self._generate_cache_key(query, params)
             cached_result = await self.redis.get(cache_key)
             if cached_result:
+                # orjson dengan tag tipe, bukan pickle: data dari Redis tidak boleh bisa menjalankan kode
+                result = _decode_cached_value(orjson.loads(cached_result))
                 self.cache_hits += 1
-                return json.loads(cached_result)
+                return result
             else:
                 self.cache_misses += 1
                 return None
@@ -205,14 +310,14 @@ class QueryCache:
         if not self.redis or result is None:
             return
         
-        cache_key = self._generate_cache_key(query, params)
         ttl = ttl or self.default_ttl
         
         try:
+            cache_key = self._generate_cache_key(query, params)
             await self.redis.setex(
                 cache_key, 
                 ttl, 
-                json.dumps(result, default=str)
+                orjson.dumps(_encode_cached_value(result))
             )
         except Exception as e:
             logger.error(f"Cache set error: {e}")
@@ -225,7 +330,7 @@ class QueryCache:
         try:
             if query_pattern:
                 # Invalidate specific pattern
-                pattern = f"query_cache:*{hashlib.md5(query_pattern.encode()).hexdigest()}*"
+                pattern = f"query_cache:{_short_hash(query_pattern.encode())}:*"
                 keys = await self.redis.keys(pattern)
                 if keys:
                     await self.redis.delete(*keys)
@@ -263,28 +368,20 @@ class QueryOptimizer:
     
     def _normalize_query(self, query: str) -> str:
         """Normalize query untuk consistent hashing"""
-        # Remove extra whitespace and normalize
-        normalized = ' '.join(query.strip().split())
-        # Convert to lowercase
-        normalized = normalized.lower()
-        # Remove specific values (keep placeholders)
-        import re
-        normalized = re.sub(r'\$\d+|%s|\?', '?', normalized)
-        return normalized
+        return _hash_normalized(query)[0]
     
     def _generate_query_hash(self, query: str) -> str:
         """Generate hash untuk query"""
-        normalized_query = self._normalize_query(query)
-        return hashlib.md5(normalized_query.encode()).hexdigest()
+        return _hash_normalized(query)[1]
     
     def record_query_execution(self, query: str, execution_time: float, params: Tuple = ()):
         """Record query execution metrics"""
-        query_hash = self._generate_query_hash(query)
+        normalized_query, query_hash = _hash_normalized(query)
         
         if query_hash not in self.query_metrics:
             self.query_metrics[query_hash] = QueryMetrics(
                 query_hash=query_hash,
-                query_text=self._normalize_query(query)[:200]  # Truncate for storage
+                query_text=normalized_query[:200]  # Truncate for storage
             )
         
         self.query_metrics[query_hash].update(execution_time)
@@ -376,10 +473,10 @@ class DatabaseOptimizer:
             
             # Initialize Redis untuk caching jika di-enable
             if self.config.enable_caching:
-                self.redis_client = aioredis.from_url(
+                # Cached results are orjson bytes, so skip decoding replies to str
+                self.redis_client = redis.from_url(
                     "redis://localhost:6379/1",  # Use different DB for cache
-                    encoding="utf-8",
-                    decode_responses=True
+                    decode_responses=False
                 )
                 self.cache = QueryCache(self.redis_client, self.config.cache_ttl)
             
@@ -412,7 +509,6 @@ class DatabaseOptimizer:
             Query result
         """
         start_time = time.time()
-        query_hash = self.query_optimizer._generate_query_hash(query)
         
         try:
             # Check cache first
@@ -426,7 +522,7 @@ class DatabaseOptimizer:
             async with self.connection_pool.acquire_connection() as connection:
                 result = await connection.fetch(query, *params)
                 
-                # Convert to list of dicts for serialization
+                # Convert to list of dicts; the same list is returned and cached
                 result_list = [dict(row) for row in result]
                 
                 # Cache the result
@@ -626,10 +722,9 @@ class SlowQueryAnalyzer:
     def _extract_query_pattern(self, query: str) -> str:
         """Extract query pattern untuk grouping"""
         # Remove specific values, keep structure
-        import re
-        pattern = re.sub(r'\$\d+', '?', query)
-        pattern = re.sub(r"'[^']*'", '?', pattern)
-        pattern = re.sub(r'\d+', '?', pattern)
+        pattern = _POSITIONAL_PARAM_RE.sub('?', query)
+        pattern = _STRING_LITERAL_RE.sub('?', pattern)
+        pattern = _NUMBER_RE.sub('?', pattern)
         return pattern.strip()
     
     def get_slow_query_report(self, limit: int = 10) -> List[Dict[str, Any]]:
@@ -7,6 +7,7 @@ import asyncio
 import json
 import sys
 import os
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
@@ -24,6 +25,11 @@ except ImportError:
     except ImportError:
         redis = None
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 from cdn_manager import (
     CDNConfig, CacheEntry, CDNMetrics, FileCompressor,
     CacheManager, CDNManager, EdgeServer
@@ -75,7 +81,7 @@ class TestCacheEntry:
     
     def test_cache_entry_creation(self):
         """Test CacheEntry creation"""
-        now = datetime.now()
+        now = time.time_ns()
         entry = CacheEntry(
             key="test_key",
             file_path="/path/to/file.jpg",
@@ -169,6 +175,55 @@ class TestFileCompressor:
         assert compressor.compression_stats['brotli_compressed'] == 1
         assert compressor.compression_stats['compression_saved_bytes'] > 0
     
+    @pytest.mark.asyncio
+    async def test_compress_large_content_streams_in_chunks(self, compressor):
+        """Test content larger than one chunk round-trips through streaming compression"""
+        large_content = b"Streaming compression test content for SANGKURIANG. " * 5000
+        assert len(large_content) > compressor.config.chunk_size
+        
+        compressed, compression_type = await compressor.compress_content(large_content, "application/javascript")
+        assert compression_type == "br"
+        assert brotli.decompress(compressed) == large_content
+        
+        compressor.config.enable_brotli = False
+        compressed, compression_type = await compressor.compress_content(large_content, "application/javascript")
+        assert compression_type == "gzip"
+        assert gzip.decompress(compressed) == large_content
+    
+    @pytest.mark.asyncio
+    async def test_parallel_gzip_is_single_member(self, compressor):
+        """Test payloads gzipped in parallel chunks form one valid gzip member"""
+        from cdn_manager import _PARALLEL_GZIP_THRESHOLD
+        import zlib
+        
+        large_content = b"".join(b"block %d of the SANGKURIANG bundle; " % i for i in range(200000))
+        assert len(large_content) > _PARALLEL_GZIP_THRESHOLD
+        
+        compressed = await compressor._gzip(large_content, 9)
+        
+        decompressor = zlib.decompressobj(31)
+        assert decompressor.decompress(compressed) == large_content
+        assert decompressor.eof and decompressor.unused_data == b""
+        assert gzip.decompress(compressed) == large_content
+    
+    @pytest.mark.asyncio
+    async def test_compress_with_zstd_when_accepted(self, compressor):
+        """Test zstd is used only for clients that advertise it"""
+        zstd = pytest.importorskip("zstandard")
+        text_content = b"This is a test content that should be compressed with zstd. " * 100
+        
+        compressed, compression_type = await compressor.compress_content(
+            text_content, "text/plain", headers={"Accept-Encoding": "gzip, br, zstd"}
+        )
+        assert compression_type == "zstd"
+        assert zstd.ZstdDecompressor().decompress(compressed) == text_content
+        assert await compressor.decompress_content(compressed, "zstd") == text_content
+        
+        _, compression_type = await compressor.compress_content(
+            text_content, "text/plain", headers={"Accept-Encoding": "gzip, br"}
+        )
+        assert compression_type == "br"
+    
     @pytest.mark.asyncio
     async def test_no_compression_for_already_compressed_types(self, compressor):
         """Test no compression for already compressed content types"""
@@ -229,6 +284,15 @@ class TestFileCompressor:
         assert compressor._should_compress_brotli("application/xml") == True
         assert compressor._should_compress_brotli("image/jpeg") == False
 
+    def test_guess_content_type(self):
+        """Test extension lookup for known, mixed-case and unknown extensions"""
+        from cdn_manager import _guess_content_type
+        
+        assert _guess_content_type("/static/app.js") == "text/javascript"
+        assert _guess_content_type("/static/LOGO.PNG") == "image/png"
+        assert _guess_content_type("/docs/report.docx").startswith("application/")
+        assert _guess_content_type("/bin/blob") == "application/octet-stream"
+
 class TestCacheManager:
     """Test CacheManager class"""
     
@@ -266,13 +330,31 @@ class TestCacheManager:
         key3 = cache_manager._generate_cache_key(file_path, {"size": "small"})
         assert key1 != key3
     
+    def test_generate_cache_key_distinguishes_equal_values_of_other_types(self, cache_manager):
+        """Test 1, True and 1.0 give different keys although they compare equal"""
+        keys = [cache_manager._generate_cache_key("/path/to/file.jpg", {"v": value}) for value in (1, True, 1.0)]
+        
+        assert len(set(keys)) == 3
+        assert keys[0] == cache_manager._generate_cache_key("/path/to/file.jpg", {"v": 1})
+    
+    def test_generate_cache_key_unhashable_params(self, cache_manager):
+        """Test cache key generation with list and dict parameter values"""
+        file_path = "/path/to/file.jpg"
+        params = {"sizes": [1, 2], "crop": {"x": 0}}
+        
+        key1 = cache_manager._generate_cache_key(file_path, params)
+        key2 = cache_manager._generate_cache_key(file_path, {"crop": {"x": 0}, "sizes": [1, 2]})
+        
+        assert key1 == key2
+        assert key1 != cache_manager._generate_cache_key(file_path)
+    
     @pytest.mark.asyncio
     async def test_get_cached_file_hit(self, cache_manager):
         """Test getting cached file with hit"""
         cache_key = "test_key"
         
         # Create cache entry with valid file path
-        original_time = datetime.now()
+        original_time = time.monotonic_ns()
         cache_entry = CacheEntry(
             key=cache_key,
             file_path="./test_cache/test_file.cache",  # Valid path in test_cache
@@ -293,6 +375,63 @@ class TestCacheManager:
             assert result.access_count == 1  # Should increment access count
             assert result.last_accessed >= original_time
     
+    @pytest.mark.asyncio
+    async def test_get_cached_file_restores_from_redis(self, cache_manager, redis_client):
+        """Test Redis entries are restored with integer timestamps"""
+        redis_client.get.return_value = json.dumps({
+            'key': "redis_key",
+            'file_path': "./test_cache/redis_key.cache",
+            'content_type': "text/css",
+            'file_size': 2048,
+            'created_at': "2024-01-01T00:00:00",  # Written before timestamps were integers
+            'etag': '"redis_key"',
+            'compression_type': None,
+            'compressed_size': None
+        })
+        
+        with patch('os.path.exists', return_value=True):
+            result = await cache_manager.get_cached_file("redis_key")
+        
+        assert result.created_at == int(datetime(2024, 1, 1).timestamp() * 1e9)
+        assert result.last_accessed <= time.monotonic_ns()
+        assert cache_manager.cache_size == 2048
+    
+    @pytest.mark.asyncio
+    async def test_redis_entry_round_trip(self, cache_manager, redis_client, tmp_path):
+        """Test entries written to Redis as orjson bytes restore to the same entry"""
+        cache_manager.config.storage_path = str(tmp_path)
+        entry = await cache_manager.cache_file(
+            "round_trip", "/static/app.js", "application/javascript", b"compressed", "br",
+            variants={"br": b"compressed", "gzip": b"gzipped bytes"}
+        )
+        
+        stored = redis_client.setex.call_args[0][2]
+        assert isinstance(stored, bytes)
+        
+        cache_manager.remove_entry("round_trip")
+        restored = cache_manager._restore_entry("round_trip", stored)
+        
+        assert restored.variants == entry.variants
+        assert restored.created_at == entry.created_at
+        assert restored.source_path == "/static/app.js"
+        assert cache_manager.cache_size == entry.stored_size
+    
+    @pytest.mark.asyncio
+    async def test_restore_skips_entry_with_missing_variant(self, cache_manager, redis_client, tmp_path):
+        """Test a Redis entry is not restored when one of its variant files is gone"""
+        cache_manager.config.storage_path = str(tmp_path)
+        entry = await cache_manager.cache_file(
+            "partial", "/static/app.js", "application/javascript", b"compressed", "br",
+            variants={"br": b"compressed", "gzip": b"gzipped bytes"}
+        )
+        stored = redis_client.setex.call_args[0][2]
+        cache_manager.remove_entry("partial")
+        os.remove(entry.variants["gzip"][0])
+        
+        assert cache_manager._restore_entry("partial", stored) is None
+        assert "partial" not in cache_manager.cache_entries
+        assert cache_manager.cache_size == 0
+    
     @pytest.mark.asyncio
     async def test_get_cached_file_miss(self, cache_manager):
         """Test getting cached file with miss"""
@@ -312,16 +451,9 @@ class TestCacheManager:
         cache_key = "test_cache_key"
         
         # Mock file operations
-        with patch('aiofiles.open') as mock_open:
-            mock_file = AsyncMock()
-            mock_file.write = AsyncMock(return_value=None)
-            mock_context = AsyncMock()
-            mock_context.__aenter__ = AsyncMock(return_value=mock_file)
-            mock_context.__aexit__ = AsyncMock(return_value=None)
-            mock_open.return_value = mock_context
-            
-            # Mock os.path operations
-            with patch('os.path.join', return_value=f"./test_cache/{cache_key}.cache"):
+        with patch('cdn_manager._write_file') as mock_write:
+            # Mock cache file path resolution
+            with patch.object(cache_manager, '_cache_file_path', return_value=f"./test_cache/{cache_key}.cache"):
                 with patch('os.path.exists', return_value=True):
                     result = await cache_manager.cache_file(cache_key, file_path, content_type, compressed_content, compression_type)
                     
@@ -329,6 +461,122 @@ class TestCacheManager:
                     assert result.key == cache_key
                     assert result.content_type == content_type
                     assert result.file_size == len(compressed_content)
+                    mock_write.assert_called_once_with(f"./test_cache/{cache_key}.cache", compressed_content)
+    
+    @pytest.mark.asyncio
+    async def test_evict_least_recently_used(self, cache_manager, redis_client):
+        """Test eviction removes least recently used entries first"""
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        redis_client.pipeline = MagicMock()
+        redis_client.pipeline.return_value.__aenter__.return_value = pipe
+        cache_manager.max_cache_size = 4096
+        for i in range(4):
+            cache_key = f"key_{i}"
+            cache_manager.cache_entries[cache_key] = CacheEntry(
+                key=cache_key,
+                file_path=f"./test_cache/missing_{i}.cache",
+                content_type="image/jpeg",
+                file_size=1024,
+                created_at=time.time_ns(),
+                last_accessed=time.monotonic_ns()
+            )
+            cache_manager.cache_size += 1024
+        
+        # Touch key_0 so key_1 becomes the least recently used
+        with patch('os.path.exists', return_value=True):
+            await cache_manager.get_cached_file("key_0")
+        
+        cache_manager.cache_size += 1024  # Push over the limit
+        await cache_manager._evict_if_necessary()
+        
+        assert list(cache_manager.cache_entries) == ["key_3", "key_0"]
+        assert cache_manager.cache_size == 3072
+        # Evicted keys are removed from Redis in a single pipelined round trip
+        pipe.delete.assert_any_call("cdn:key_1")
+        pipe.delete.assert_any_call("cdn:key_2")
+        pipe.execute.assert_awaited_once()
+        redis_client.delete.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_tinylfu_admission(self, cache_manager):
+        """Test a one-off entry can't displace a more popular LRU victim"""
+        cache_manager.redis_client = None
+        cache_manager.max_cache_size = 1536
+        for cache_key in ("popular", "one_off"):
+            cache_manager.cache_entries[cache_key] = CacheEntry(
+                key=cache_key,
+                file_path=f"./test_cache/{cache_key}.cache",
+                content_type="text/css",
+                file_size=1024,
+                created_at=time.time_ns(),
+                last_accessed=time.monotonic_ns()
+            )
+            cache_manager.cache_size += 1024
+        for _ in range(5):
+            cache_manager.frequency_sketch.increment("popular")
+        cache_manager.frequency_sketch.increment("one_off")
+        
+        await cache_manager._evict_if_necessary(candidate_key="one_off")
+        
+        assert list(cache_manager.cache_entries) == ["popular"]
+        assert cache_manager.cache_size == 1024
+    
+    def test_frequency_sketch(self):
+        """Test frequency estimates, doorkeeper filtering and aging"""
+        from cdn_manager import FrequencySketch
+        
+        sketch = FrequencySketch(width_bits=10, doorkeeper_bits=12, sample_size=100)
+        assert sketch.estimate("hot") == 0
+        
+        sketch.increment("cold")
+        for _ in range(9):
+            sketch.increment("hot")
+        assert sketch.estimate("cold") == 1
+        assert sketch.estimate("hot") == 9
+        
+        sketch.reset()
+        assert sketch.estimate("cold") == 0
+        assert sketch.estimate("hot") == 0
+        sketch.increment("hot")
+        assert sketch.estimate("hot") == 5
+    
+    @pytest.mark.asyncio
+    async def test_get_cached_files_batches_redis_lookups(self, cache_manager, redis_client):
+        """Test memory misses are fetched from Redis in one pipeline"""
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[None, None])
+        redis_client.pipeline = MagicMock()
+        redis_client.pipeline.return_value.__aenter__.return_value = pipe
+        
+        results = await cache_manager.get_cached_files(["key_a", "key_b"])
+        
+        assert results == {"key_a": None, "key_b": None}
+        assert pipe.get.call_count == 2
+        pipe.execute.assert_awaited_once()
+        redis_client.get.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_access_log_ring_buffer(self, cache_manager):
+        """Test lookups are recorded in the fixed-size access log ring"""
+        from cdn_manager import ACCESS_LOG_SIZE
+        
+        cache_manager.redis_client = None
+        cache_key = cache_manager._generate_cache_key("/static/app.js")
+        await cache_manager.get_cached_file(cache_key)
+        
+        log = cache_manager.get_access_log()
+        assert len(log) == 1
+        assert log[0]['key_hash'] == int(cache_key[:16], 16)
+        assert log[0]['hit'] == 0
+        
+        for _ in range(ACCESS_LOG_SIZE + 5):
+            cache_manager._record_access(cache_key, 1024, True)
+        
+        log = cache_manager.get_access_log()
+        assert len(log) == ACCESS_LOG_SIZE
+        assert log['hit'].all()
+        assert (log['ts'][1:] >= log['ts'][:-1]).all()
     
     @pytest.mark.asyncio
     async def test_get_file_stats(self, cache_manager):
@@ -341,8 +589,8 @@ class TestCacheManager:
                 file_path=f"/path/to/file_{i}.jpg",
                 content_type="image/jpeg",
                 file_size=1024 * (i + 1),
-                created_at=datetime.now(),
-                last_accessed=datetime.now(),
+                created_at=time.time_ns(),
+                last_accessed=time.monotonic_ns(),
                 access_count=i
             )
             cache_manager.cache_entries[cache_key] = cache_entry
@@ -359,11 +607,315 @@ class TestCacheManager:
 
 # Tambahan test untuk komponen yang belum diimplementasikan
 class TestCDNManager:
-    """Test CDNManager class (placeholder)"""
+    """Test CDNManager class"""
     
-    def test_placeholder(self):
-        """Placeholder test"""
-        assert True
+    @pytest.fixture
+    def cdn_manager(self, tmp_path):
+        config = CDNConfig(storage_path=str(tmp_path / "cache"), enable_persistent_cache=False)
+        os.makedirs(config.storage_path, exist_ok=True)
+        return CDNManager(config)
+    
+    @pytest.mark.asyncio
+    async def test_serve_cache_hit_keeps_accepted_encoding(self, cdn_manager, tmp_path):
+        """Test cache hits return stored compressed bytes unless the client can't accept them"""
+        original_content = b"body { margin: 0; padding: 0; } " * 200
+        source = tmp_path / "style.css"
+        source.write_bytes(original_content)
+        
+        miss = await cdn_manager.serve_content(str(source), headers={"Accept-Encoding": "gzip, br"})
+        assert miss['cache_hit'] is False
+        assert miss['content_encoding'] == "br"
+        
+        hit = await cdn_manager.serve_content(str(source), headers={"Accept-Encoding": "gzip, br"})
+        assert hit['cache_hit'] is True
+        assert hit['content_encoding'] == "br"
+        assert brotli.decompress(hit['content']) == original_content
+        
+        identity = await cdn_manager.serve_content(str(source), headers={"Accept-Encoding": "identity"})
+        assert identity['cache_hit'] is True
+        assert identity['content_encoding'] is None
+        assert identity['content'] == original_content
+        
+        no_header = await cdn_manager.serve_content(str(source))
+        assert no_header['content_encoding'] is None
+        assert no_header['content'] == original_content
+
+    @pytest.mark.asyncio
+    async def test_hot_entries_served_from_memory(self, cdn_manager, tmp_path):
+        """Test entries past the access threshold are pinned and served without file reads"""
+        cdn_manager.config.hot_access_threshold = 2
+        source = tmp_path / "hot.js"
+        source.write_bytes(b"export const hot = true; " * 100)
+        headers = {"Accept-Encoding": "br"}
+        
+        await cdn_manager.serve_content(str(source), headers=headers)  # Miss
+        await cdn_manager.serve_content(str(source), headers=headers)  # Hit, pins
+        assert cdn_manager.cache_manager._hot_bytes > 0
+        
+        with patch('cdn_manager._read_file') as read_file:
+            result = await cdn_manager.serve_content(str(source), headers=headers)
+        read_file.assert_not_called()
+        assert result['cache_hit'] is True
+        
+        await cdn_manager.invalidate_cache(str(source))
+        assert cdn_manager.cache_manager._hot_bytes == 0
+    
+    @pytest.mark.asyncio
+    async def test_prewarm_popular_files(self, cdn_manager, tmp_path):
+        """Test prewarming pins every variant of the popular files"""
+        source = tmp_path / "popular.css"
+        source.write_bytes(b".popular { display: block; } " * 100)
+        await cdn_manager.serve_content(str(source))
+        
+        pinned = await cdn_manager.prewarm_popular_files()
+        
+        entry = next(iter(cdn_manager.cache_manager.cache_entries.values()))
+        assert pinned == len(entry.variants)
+        assert cdn_manager.cache_manager._hot_bytes == entry.stored_size
+    
+    @pytest.mark.asyncio
+    async def test_fetch_missing_file_from_origin(self, cdn_manager):
+        """Test files missing locally are fetched from the origin over the shared session"""
+        from aiohttp import web
+        
+        requests = []
+        
+        async def handle(request):
+            requests.append(request.path)
+            if request.path == "/assets/site.css":
+                return web.Response(body=b"main { width: 100%; } " * 100, content_type="text/css")
+            return web.Response(status=404)
+        
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        
+        cdn_manager.config.origin_url = f"http://127.0.0.1:{port}"
+        await cdn_manager.start()
+        try:
+            result = await cdn_manager.serve_content("/assets/site.css", headers={"Accept-Encoding": "identity"})
+            missing = await cdn_manager.serve_content("/assets/missing.css")
+        finally:
+            await cdn_manager.stop()
+            await runner.cleanup()
+        
+        assert result['content'] == b"main { width: 100%; } " * 100
+        assert result['content_type'] == "text/css"
+        assert missing is None
+        assert requests == ["/assets/site.css", "/assets/missing.css"]
+    
+    @pytest.mark.asyncio
+    async def test_cache_files_are_sharded_and_refilled_when_removed(self, cdn_manager, tmp_path):
+        """Test cache files land in two-level shard dirs and a removed file is refilled"""
+        source = tmp_path / "page.html"
+        source.write_bytes(b"<p>SANGKURIANG</p> " * 100)
+        
+        await cdn_manager.serve_content(str(source))
+        cache_key, entry = next(iter(cdn_manager.cache_manager.cache_entries.items()))
+        storage_path = cdn_manager.config.storage_path
+        assert entry.file_path == os.path.join(storage_path, cache_key[:2], cache_key[2:4], f"{cache_key}.cache")
+        
+        for path, _ in entry.variants.values():
+            os.remove(path)
+        result = await cdn_manager.serve_content(str(source))
+        
+        assert result['cache_hit'] is False
+        assert cdn_manager.metrics.cache_misses == 2
+        assert all(os.path.exists(path) for path, _ in entry.variants.values())
+    
+    @pytest.mark.asyncio
+    async def test_load_content_error_returns_none(self, cdn_manager, tmp_path):
+        """Test unreadable paths return (None, "") instead of raising from the handler"""
+        content, content_type = await cdn_manager._load_content(str(tmp_path))  # A directory
+        
+        assert content is None
+        assert content_type == ""
+    
+    def test_get_file_stats(self, cdn_manager):
+        """Test file statistics are read from the cache manager"""
+        cache_key = cdn_manager.cache_manager._generate_cache_key("/static/app.css")
+        cdn_manager.cache_manager._add_entry(CacheEntry(
+            key=cache_key,
+            file_path="/tmp/app.css.cache",
+            content_type="text/css",
+            file_size=2048,
+            created_at=time.time_ns(),
+            last_accessed=time.monotonic_ns(),
+            access_count=3,
+            compression_type="br",
+            compressed_size=512
+        ))
+        
+        stats = cdn_manager.get_file_stats("/static/app.css")
+        
+        assert stats['cache_key'] == cache_key
+        assert stats['access_count'] == 3
+        assert stats['compression_ratio'] == 0.75
+        assert cdn_manager.get_file_stats("/static/missing.css") is None
+    
+    @pytest.mark.asyncio
+    async def test_metrics_counters(self, cdn_manager, tmp_path):
+        """Test per-request counters, derived average and popular files"""
+        source = tmp_path / "counted.css"
+        source.write_bytes(b".counted { color: blue; } " * 100)
+        
+        for _ in range(3):
+            await cdn_manager.serve_content(str(source))
+        
+        metrics = cdn_manager.metrics
+        assert (metrics.total_requests, metrics.cache_hits, metrics.cache_misses) == (3, 2, 1)
+        assert metrics.popular_files[str(source)] == 3
+        assert metrics.average_response_time == metrics.total_response_time_ns / 3 / 1e9
+        assert sum(metrics.edge_server_hits.values()) == 0  # No edge servers registered
+        
+        report = cdn_manager.get_metrics()
+        assert report['popular_files'] == {str(source): 3}
+        assert report['cache_metrics']['hit_rate_percent'] == round(2 / 3 * 100, 2)
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_cache_by_prefix(self, cdn_manager, tmp_path):
+        """Test pattern invalidation removes only entries under the path prefix"""
+        (tmp_path / "static").mkdir()
+        (tmp_path / "media").mkdir()
+        sources = [tmp_path / "static" / "a.css", tmp_path / "static" / "b.css", tmp_path / "media" / "c.css"]
+        for source in sources:
+            source.write_bytes(b"h1 { color: red; } " * 100)
+            await cdn_manager.serve_content(str(source))
+        
+        await cdn_manager.invalidate_cache(pattern=str(tmp_path / "static"))
+        
+        cache_manager = cdn_manager.cache_manager
+        assert [entry.source_path for entry in cache_manager.cache_entries.values()] == [str(sources[2])]
+        assert cache_manager.keys_with_prefix(str(tmp_path)) == list(cache_manager.cache_entries)
+        assert cache_manager.cache_size == sum(e.stored_size for e in cache_manager.cache_entries.values())
+        assert cdn_manager.metrics.cache_evictions == 2
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_load_once(self, cdn_manager, tmp_path):
+        """Test concurrent misses for one key share a single load and cache write"""
+        original_content = b"{\"proposal\": \"SANGKURIANG\"} " * 200
+        source = tmp_path / "data.json"
+        source.write_bytes(original_content)
+        
+        with patch.object(cdn_manager, '_load_content', wraps=cdn_manager._load_content) as load:
+            results = await asyncio.gather(*[
+                cdn_manager.serve_content(str(source), headers={"Accept-Encoding": encoding})
+                for encoding in ("br", "gzip", "identity")
+            ])
+        
+        assert load.call_count == 1
+        assert [r['content_encoding'] for r in results] == ["br", "gzip", None]
+        assert results[2]['content'] == original_content
+        assert cdn_manager.metrics.cache_misses == 3
+        assert not cdn_manager._inflight
+    
+    @pytest.mark.asyncio
+    async def test_serve_content_sendfile(self, cdn_manager, tmp_path):
+        """Test cached content is written to a stream via sendfile after a response head"""
+        original_content = b"console.log('SANGKURIANG'); " * 200
+        source = tmp_path / "app.js"
+        source.write_bytes(original_content)
+        headers = {"Accept-Encoding": "br"}
+        sent_sizes = []
+        
+        async def handle(reader, writer):
+            sent_sizes.append(await cdn_manager.serve_content_sendfile(str(source), writer, headers=headers))
+            writer.close()
+        
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            payloads = []
+            for _ in range(2):  # First request fills the cache, second uses sendfile
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                payloads.append(await reader.read())
+                writer.close()
+        
+        assert payloads[0] == payloads[1]
+        head, _, body = payloads[1].partition(b"\r\n\r\n")
+        head_lines = head.split(b"\r\n")
+        assert head_lines[0] == b"HTTP/1.1 200 OK"
+        assert b"Content-Encoding: br" in head_lines
+        assert f"Content-Length: {len(body)}".encode() in head_lines
+        assert brotli.decompress(body) == original_content
+        assert sent_sizes[0] == sent_sizes[1] == len(body)
+        assert cdn_manager.metrics.cache_hits == 1
+        assert cdn_manager.metrics.popular_files[str(source)] == 2
+
+    @pytest.mark.asyncio
+    async def test_serve_content_sendfile_refills_removed_cache_file(self, cdn_manager, tmp_path):
+        """Test a cache file removed behind the cache drops the entry from memory and Redis and is refilled"""
+        original_content = b"console.log('SANGKURIANG'); " * 200
+        source = tmp_path / "app.js"
+        source.write_bytes(original_content)
+        headers = {"Accept-Encoding": "br"}
+        await cdn_manager.serve_content(str(source), headers=headers)
+        cache_key, entry = next(iter(cdn_manager.cache_manager.cache_entries.items()))
+        br_path = entry.variants["br"][0]
+        os.remove(br_path)
+        cdn_manager.cache_manager.delete_redis_entries = AsyncMock()
+        
+        async def handle(reader, writer):
+            await cdn_manager.serve_content_sendfile(str(source), writer, headers=headers)
+            writer.close()
+        
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            payload = await reader.read()
+            writer.close()
+        
+        _, _, body = payload.partition(b"\r\n\r\n")
+        assert brotli.decompress(body) == original_content
+        cdn_manager.cache_manager.delete_redis_entries.assert_awaited_once_with([cache_key])
+        assert os.path.exists(br_path)
+        assert cdn_manager.cache_manager.cache_entries[cache_key] is not entry
+
+    @pytest.mark.asyncio
+    async def test_serve_picks_preferred_variant(self, cdn_manager, tmp_path):
+        """Test brotli, gzip and (when installed) zstd variants are stored once and chosen per Accept-Encoding"""
+        original_content = b"<html><body>Selamat datang di SANGKURIANG</body></html> " * 200
+        source = tmp_path / "index.html"
+        source.write_bytes(original_content)
+        
+        await cdn_manager.serve_content(str(source))
+        entry = next(iter(cdn_manager.cache_manager.cache_entries.values()))
+        assert set(entry.variants) == {"br", "gzip"} | ({"zstd"} if zstandard else set())
+        assert cdn_manager.cache_manager.cache_size == entry.stored_size
+        
+        gzip_only = await cdn_manager.serve_content(str(source), headers={"Accept-Encoding": "gzip"})
+        assert gzip_only['content_encoding'] == "gzip"
+        assert gzip.decompress(gzip_only['content']) == original_content
+        
+        weighted = await cdn_manager.serve_content(
+            str(source), headers={"accept-encoding": "br;q=0.5, gzip;q=0.8"}
+        )
+        assert weighted['content_encoding'] == "gzip"
+        
+        await cdn_manager.invalidate_cache(str(source))
+        assert cdn_manager.cache_manager.cache_size == 0
+        assert not any(os.path.exists(path) for path, _ in entry.variants.values())
+
+    @pytest.mark.asyncio
+    async def test_serve_zstd_variant(self, cdn_manager, tmp_path):
+        """Test clients that accept zstd get the stored zstd variant"""
+        zstd = pytest.importorskip("zstandard")
+        original_content = b"const proposals = ['SANGKURIANG'];\n" * 200
+        source = tmp_path / "proposals.js"
+        source.write_bytes(original_content)
+        
+        miss = await cdn_manager.serve_content(str(source), headers={"Accept-Encoding": "zstd"})
+        hit = await cdn_manager.serve_content(str(source), headers={"Accept-Encoding": "zstd"})
+        
+        assert miss['content_encoding'] == hit['content_encoding'] == "zstd"
+        assert hit['cache_hit'] is True
+        assert zstd.ZstdDecompressor().decompress(hit['content']) == original_content
+        assert cdn_manager.compressor.compression_stats['zstd_compressed'] == 1
 
 class TestEdgeServer:
     """Test EdgeServer class (placeholder)"""
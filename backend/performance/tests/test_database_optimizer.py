@@ -10,7 +10,10 @@ import os
 from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime, timedelta
 import json
+import fnmatch
+import pickle
 import time
+import orjson
 
 try:
     import redis.asyncio as redis
@@ -269,6 +272,44 @@ class TestQueryCache:
         key3 = cache._generate_cache_key(query, (456,))
         assert key1 != key3
     
+    def test_generate_cache_key_param_types(self, cache):
+        """Test params that only differ by type get different keys"""
+        from decimal import Decimal
+        query = "SELECT * FROM users WHERE id = $1 AND org = $2"
+        
+        assert cache._generate_cache_key(query, (1, 2)) != cache._generate_cache_key(query, ("1", "2"))
+        assert cache._generate_cache_key(query, (1,)) != cache._generate_cache_key(query, (True,))
+        assert cache._generate_cache_key(query, (Decimal("1.5"),)) != cache._generate_cache_key(query, ("1.5",))
+        assert cache._generate_cache_key(query, (b"ab",)) == cache._generate_cache_key(query, (b"ab",))
+    
+    def test_generate_cache_key_big_ints_and_str_like_types(self, cache):
+        """Test ints beyond 64 bits encode and datetime/UUID don't collide with their strings"""
+        import uuid
+        query = "SELECT * FROM votes WHERE power = $1"
+        
+        big = 10**30
+        assert cache._generate_cache_key(query, (big,)) == cache._generate_cache_key(query, (big,))
+        assert cache._generate_cache_key(query, (big,)) != cache._generate_cache_key(query, (str(big),))
+        assert cache._generate_cache_key(query, ([big],)) != cache._generate_cache_key(query, ([big + 1],))
+        
+        moment = datetime(2024, 1, 1, 12, 30)
+        assert cache._generate_cache_key(query, (moment,)) != cache._generate_cache_key(query, (moment.isoformat(),))
+        token = uuid.UUID(int=1)
+        assert cache._generate_cache_key(query, (token,)) != cache._generate_cache_key(query, (str(token),))
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_pattern_matches_query_keys(self, cache, redis_client):
+        """Test invalidation pattern targets keys of the same query"""
+        query = "SELECT * FROM users WHERE id = $1"
+        key = cache._generate_cache_key(query, (123,))
+        redis_client.keys = AsyncMock(return_value=[])
+        
+        await cache.invalidate(query)
+        
+        pattern = redis_client.keys.call_args[0][0]
+        assert fnmatch.fnmatchcase(key, pattern)
+        assert not fnmatch.fnmatchcase(cache._generate_cache_key("SELECT 1", (123,)), pattern)
+    
     @pytest.mark.asyncio
     async def test_cache_get_hit(self, cache):
         """Test cache get with hit"""
@@ -276,7 +317,7 @@ class TestQueryCache:
         params = (123,)
         expected_result = [{"id": 123, "name": "John"}]
         
-        cache.redis.get = AsyncMock(return_value=json.dumps(expected_result))
+        cache.redis.get = AsyncMock(return_value=orjson.dumps(expected_result))
         
         result = await cache.get(query, params)
         
@@ -331,6 +372,43 @@ class TestQueryCache:
         
         # Cache hits should remain 0 since we're only setting, not getting
         assert cache.cache_hits == 0
+        
+        redis_client.get = AsyncMock(return_value=call_args[0][2])
+        assert await cache.get(query, params) == result
+    
+    @pytest.mark.asyncio
+    async def test_cache_set_round_trip(self, cache, redis_client):
+        """Test cached rows keep their native types"""
+        from decimal import Decimal
+        store = {}
+        
+        async def setex(key, ttl, value):
+            store[key] = value
+        
+        redis_client.setex = AsyncMock(side_effect=setex)
+        redis_client.get = AsyncMock(side_effect=lambda key: store.get(key))
+        
+        from uuid import UUID
+        rows = [{
+            "id": 1, "balance": Decimal("2.50"), "created_at": datetime(2024, 1, 2, 3, 4, 5),
+            "owner": UUID(int=7), "opened_on": datetime(2024, 1, 2).date(), "lock_period": timedelta(days=30),
+            "signature": b"\x00\xff", "supply": 10**30, "ratio": float("inf"), "flags": (True, None),
+            "meta": {"__type__": "Decimal", "value": "1"},
+        }]
+        await cache.set("SELECT * FROM accounts", (1,), rows)
+        
+        assert isinstance(next(iter(store.values())), bytes)
+        restored = await cache.get("SELECT * FROM accounts", (1,))
+        assert restored == rows
+        assert [type(value) for value in restored[0].values()] == [type(value) for value in rows[0].values()]
+    
+    @pytest.mark.asyncio
+    async def test_cache_get_ignores_pickled_payloads(self, cache):
+        """Test bytes that are not the orjson cache format are never unpickled"""
+        cache.redis.get = AsyncMock(return_value=pickle.dumps([{"id": 1}], protocol=5))
+        
+        assert await cache.get("SELECT * FROM users", (1,)) is None
+        assert cache.cache_hits == 0
     
     @pytest.mark.asyncio
     async def test_cache_set_with_custom_ttl(self, cache, redis_client):
@@ -378,11 +456,31 @@ class TestQueryCache:
 
 # Tambahan test untuk komponen yang belum diimplementasikan
 class TestQueryOptimizer:
-    """Test QueryOptimizer class (placeholder)"""
+    """Test QueryOptimizer class"""
     
-    def test_placeholder(self):
-        """Placeholder test"""
-        assert True
+    def test_normalize_query(self):
+        """Test whitespace, case and placeholder normalization"""
+        optimizer = QueryOptimizer()
+        
+        normalized = optimizer._normalize_query("  SELECT *\n  FROM users WHERE id = $1 AND x = %s ")
+        assert normalized == "select * from users where id = ? and x = ?"
+        assert optimizer._generate_query_hash("SELECT 1") == optimizer._generate_query_hash("select   1")
+    
+    def test_record_query_execution_reuses_hash(self):
+        """Test repeated executions share one metrics entry"""
+        from database_optimizer import _hash_normalized
+        optimizer = QueryOptimizer(slow_query_threshold=10.0)
+        query = "SELECT * FROM proposals WHERE id = $1"
+        
+        _hash_normalized.cache_clear()
+        optimizer.record_query_execution(query, 0.1)
+        optimizer.record_query_execution(query, 0.3)
+        
+        assert len(optimizer.query_metrics) == 1
+        metrics = next(iter(optimizer.query_metrics.values()))
+        assert metrics.execution_count == 2
+        assert metrics.query_text == "select * from proposals where id = ?"
+        assert _hash_normalized.cache_info().hits == 1
 
 class TestDatabaseOptimizer:
     """Test DatabaseOptimizer class (placeholder)"""
@@ -392,11 +490,20 @@ class TestDatabaseOptimizer:
         assert True
 
 class TestSlowQueryAnalyzer:
-    """Test SlowQueryAnalyzer class (placeholder)"""
+    """Test SlowQueryAnalyzer class"""
     
-    def test_placeholder(self):
-        """Placeholder test"""
-        assert True
+    def test_extract_query_pattern(self):
+        """Test literals and placeholders collapse into one pattern"""
+        analyzer = SlowQueryAnalyzer(threshold=0.5)
+        
+        pattern = analyzer._extract_query_pattern(" SELECT * FROM votes WHERE id = $1 AND name = 'x1' LIMIT 10 ")
+        assert pattern == "SELECT * FROM votes WHERE id = ? AND name = ? LIMIT ?"
+        
+        analyzer.add_slow_query("SELECT * FROM votes WHERE id = 5", 1.0)
+        analyzer.add_slow_query("SELECT * FROM votes WHERE id = 7", 2.0)
+        analyzer.add_slow_query("SELECT * FROM votes WHERE id = 9", 0.1)
+        assert list(analyzer.query_patterns) == ["SELECT * FROM votes WHERE id = ?"]
+        assert len(analyzer.slow_queries) == 2
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file